@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Processor algoritmaları micro-benchmark'ı
+
+Her pakette çalışan fonksiyonları gerçekçi pencere boyutları ve senaryo
+karışımlarıyla ölçer:
+
+- algorithms.calculate_smv_array, detect_fall, calculate_bpm, check_inactivity
+- business_logic.evaluate_measurement
+- pipeline: bir paketin tam yolu, algorithms.py ile (düşme + BPM + hareketsizlik + değerlendirme)
+- analyze_windows: processor'ın kullandığı vektörize yol (main.analyze_windows),
+  POOL_SIZE pencerelik tek batch; süre pencere başına verilir
+
+Her ölçüm için çağrı başına süre (timeit, en iyi tekrar ve medyan) ve çağrı
+başına en yüksek bellek ayırma (tracemalloc peak) raporlanır. Sonuçlar bir
+baseline dosyasına kaydedilip sonraki çalıştırmalarla karşılaştırılabilir;
+eşiği aşan gerileme varsa çıkış kodu 1'dir (deploy öncesi kontrol için).
+
+Süreler makineye bağlıdır: baseline'ı karşılaştırmanın yapılacağı makinede alın.
+
+Kullanım:
+    python scripts/bench_algorithms.py [--sizes 25,100,250,1000] [--mixes normal,fall,mixed]
+                                       [--only detect_fall] [--repeat 5] [--seed 42]
+                                       [--save baseline.json] [--compare baseline.json] [--threshold 15]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "processor"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from algorithms import calculate_bpm, calculate_smv_array, check_inactivity, detect_fall  # noqa: E402
+from main import analyze_windows  # noqa: E402
+from vectorized import accelerometer_arrays  # noqa: E402
+from shared.business_logic import evaluate_measurement  # noqa: E402
+
+WINDOW_SIZES = [25, 100, 250, 1000]
+
+# Senaryo karışımları: senaryo -> ağırlık. "mixed" simulator döngüsüne yakındır
+# (services/simulator/scenarios.py: 200 paketin ~%5'i taşikardi, ~%4'ü hareketsizlik, 1'i düşme)
+MIXES = {
+    "normal": {"normal": 1},
+    "fall": {"fall": 1},
+    "tachycardia": {"tachycardia": 1},
+    "inactivity": {"inactivity": 1},
+    "mixed": {"normal": 180, "tachycardia": 9, "inactivity": 9, "fall": 2},
+}
+
+# Her ölçümde dönülen farklı pencere sayısı (tek pencerenin cache'te kalmasını önler)
+POOL_SIZE = 64
+
+SETTINGS = {"bpm_lower_limit": 50, "bpm_upper_limit": 120, "max_inactivity_seconds": 900}
+
+
+def make_window(rng: random.Random, scenario: str, size: int, sampling_rate: int = 25):
+    """Senaryoya göre (accelerometer, ppg_raw) üretir; fazlar pencere boyutuna ölçeklenir."""
+    xs, ys, zs = [], [], []
+    for i in range(size):
+        if scenario == "fall":
+            phase = i * 5 // size  # free-fall, impact, 3x stillness
+            if phase == 0:
+                v = (rng.uniform(0.0, 0.2), rng.uniform(0.0, 0.2), rng.uniform(0.0, 0.3))
+            elif phase == 1:
+                v = (rng.uniform(2.0, 3.0), rng.uniform(1.5, 2.5), rng.uniform(1.0, 2.0))
+            else:
+                v = (rng.uniform(0.0, 0.1), rng.uniform(0.0, 0.1), rng.uniform(0.95, 1.05))
+        elif scenario == "inactivity":
+            v = (0.0, 0.0, 1.0)
+        else:
+            v = (0.05 + rng.uniform(-0.02, 0.02), 0.10 + rng.uniform(-0.02, 0.02), 0.98 + rng.uniform(-0.02, 0.02))
+        xs.append(v[0])
+        ys.append(v[1])
+        zs.append(v[2])
+
+    period = 2 if scenario == "tachycardia" else 5
+    offset = rng.randrange(sampling_rate)
+    ppg = [2000 + int(200 * math.sin((offset + i) / period)) + rng.randint(-5, 5) for i in range(size)]
+    return {"x": xs, "y": ys, "z": zs}, ppg
+
+
+def make_pool(rng: random.Random, mix: str, size: int):
+    scenarios = list(MIXES[mix])
+    weights = [MIXES[mix][s] for s in scenarios]
+    return [make_window(rng, rng.choices(scenarios, weights)[0], size) for _ in range(POOL_SIZE)]
+
+
+def make_evaluations(rng: random.Random, mix: str):
+    """evaluate_measurement girdileri: (heart_rate, inactivity_seconds, settings, is_fall)."""
+    cases = []
+    for _ in range(POOL_SIZE):
+        scenario = rng.choices(list(MIXES[mix]), [MIXES[mix][s] for s in MIXES[mix]])[0]
+        heart_rate = rng.randint(130, 180) if scenario == "tachycardia" else rng.randint(55, 100)
+        inactivity = rng.randint(600, 1800) if scenario == "inactivity" else 0
+        cases.append((heart_rate, inactivity, SETTINGS if rng.random() < 0.9 else None, scenario == "fall"))
+    return cases
+
+
+def pipeline(acc, ppg, now, last_movement):
+    """Tek paketin algorithms.py ile değerlendirilmesi."""
+    is_fall, _ = detect_fall(acc)
+    heart_rate = calculate_bpm(ppg)
+    inactivity, _ = check_inactivity(acc, now, last_movement)
+    return evaluate_measurement(heart_rate, inactivity, SETTINGS, is_fall)
+
+
+def cases(rng: random.Random, sizes, mixes):
+    """(isim, pencere boyutu, karışım, çağrılacak fonksiyonlar, çağrı başına pencere) üretir."""
+    now = 1_700_000_000.0
+    for mix in mixes:
+        evaluations = make_evaluations(rng, mix)
+        yield "evaluate_measurement", "-", mix, [
+            (lambda c=c: evaluate_measurement(*c)) for c in evaluations
+        ], 1
+        for size in sizes:
+            pool = make_pool(rng, mix, size)
+            yield "calculate_smv_array", size, mix, [(lambda a=a: calculate_smv_array(a)) for a, _ in pool], 1
+            yield "detect_fall", size, mix, [(lambda a=a: detect_fall(a)) for a, _ in pool], 1
+            yield "calculate_bpm", size, mix, [(lambda p=p: calculate_bpm(p)) for _, p in pool], 1
+            yield "check_inactivity", size, mix, [
+                (lambda a=a: check_inactivity(a, now, now - 300)) for a, _ in pool
+            ], 1
+            yield "pipeline", size, mix, [(lambda a=a, p=p: pipeline(a, p, now, now - 300)) for a, p in pool], 1
+            # Processor kuyruktan okuduğu pencereleri numpy dizilerine çevirip batch halinde işler
+            windows = [(accelerometer_arrays(a), np.asarray(p, dtype=np.int64)) for a, p in pool]
+            yield "analyze_windows", size, mix, [lambda w=windows: analyze_windows(w)], POOL_SIZE
+
+
+def measure(calls, repeat: int, per_call: int = 1):
+    """
+    Pencere başına süre (ns, en iyi ve medyan) ve çağrı başına tracemalloc peak (byte).
+    per_call: tek çağrının işlediği pencere sayısı (batch fonksiyonları için).
+    """
+    def run_all():
+        for call in calls:
+            call()
+
+    timer = timeit.Timer(run_all)
+    number, _ = timer.autorange()
+    runs = [t / (number * len(calls) * per_call) * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+
+    tracemalloc.start()
+    peaks = []
+    for call in calls:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        "ns_per_call": min(runs),
+        "ns_median": statistics.median(runs),
+        "peak_bytes": max(peaks),
+    }
+
+
+def compare(results, baseline, threshold: float) -> int:
+    """Baseline ile karşılaştırır; eşiği aşan gerileme sayısını döner."""
+    regressions = 0
+    print()
+    print(f"{'benchmark':<44} {'time Δ':>9} {'peak Δ':>9}")
+    for key, result in results.items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            print(f"{key:<44} {'new':>9}")
+            continue
+        time_delta = (result["ns_per_call"] / old["ns_per_call"] - 1) * 100
+        peak_delta = (result["peak_bytes"] / old["peak_bytes"] - 1) * 100 if old["peak_bytes"] else 0.0
+        flag = ""
+        if time_delta > threshold or peak_delta > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key:<44} {time_delta:>+8.1f}% {peak_delta:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, WINDOW_SIZES)), help="pencere boyutları (örnek sayısı)")
+    parser.add_argument("--mixes", default="normal,fall,mixed", help=f"senaryo karışımları ({','.join(MIXES)})")
+    parser.add_argument("--only", default=None, help="yalnızca adı bu metni içeren benchmark'lar")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", default=None, help="sonuçları bu baseline dosyasına yaz")
+    parser.add_argument("--compare", default=None, help="bu baseline dosyasıyla karşılaştır")
+    parser.add_argument("--threshold", type=float, default=15.0, help="gerileme eşiği (yüzde)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    mixes = [m for m in args.mixes.split(",") if m]
+    unknown = [m for m in mixes if m not in MIXES]
+    if unknown:
+        parser.error(f"unknown mix: {', '.join(unknown)}")
+
+    rng = random.Random(args.seed)
+    print(f"Python {platform.python_version()} on {platform.machine()}, "
+          f"{POOL_SIZE} windows per case, best of {args.repeat}")
+    print(f"{'benchmark':<44} {'ns/call':>10} {'median':>10} {'peak KiB':>9}")
+
+    results = {}
+    for name, size, mix, calls, per_call in cases(rng, sizes, mixes):
+        if args.only and args.only not in name:
+            continue
+        key = f"{name}[{size}/{mix}]"
+        result = measure(calls, args.repeat, per_call)
+        results[key] = result
+        print(f"{key:<44} {result['ns_per_call']:>10.0f} {result['ns_median']:>10.0f} {result['peak_bytes'] / 1024:>9.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{regressions} benchmark(s) regressed more than {args.threshold:g}%")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:g}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Socket.IO emit maliyeti benchmark'ı
+
+Aynı ölçüm akışını (her hasta için bir new_measurement) iki şekilde dağıtır ve
+bağlı istemci sayısına göre emit başına süreyi ve gönderilen paket sayısını ölçer:
+
+- global:  sio.emit('new_measurement', data)              -> her istemciye
+- rooms:   sio.emit(..., room=patient_rooms(patient_id))  -> yalnızca abonelere
+
+Her istemci tek bir hastaya abonedir (patient:{id} room'u). Ağ katmanı ölçülmez:
+engine.io gönderimi paketi sayıp dönen bir coroutine ile değiştirilir, yani sonuç
+sunucunun fan-out CPU maliyetidir.
+
+Kullanım:
+    python scripts/bench_socketio_emit.py [--clients 10,100,1000,5000] [--patients 100] [--emits 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import socketio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "core"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.socket_manager import patient_room, patient_rooms  # noqa: E402
+
+PAYLOAD = {
+    "patient_id": None,
+    "heart_rate": 72,
+    "inactivity_seconds": 12,
+    "status": "NORMAL",
+    "is_fall": False,
+    "measured_at": "2026-01-01T00:00:00+00:00",
+}
+
+
+async def build_server(clients: int, patients: int):
+    sio = socketio.AsyncServer(async_mode='asgi')
+    sent = {"packets": 0}
+
+    async def send_eio_packet(eio_sid, eio_pkt):
+        sent["packets"] += 1
+
+    sio._send_eio_packet = send_eio_packet
+
+    for i in range(clients):
+        sid = await sio.manager.connect(f"eio-{i}", "/")
+        await sio.enter_room(sid, patient_room(f"patient-{i % patients}"))
+    return sio, sent
+
+
+async def run(clients: int, patients: int, emits: int, mode: str):
+    sio, sent = await build_server(clients, patients)
+    start = time.perf_counter()
+    for i in range(emits):
+        patient_id = f"patient-{i % patients}"
+        data = dict(PAYLOAD, patient_id=patient_id)
+        if mode == "global":
+            await sio.emit('new_measurement', data)
+        else:
+            await sio.emit('new_measurement', data, room=patient_rooms(patient_id))
+    elapsed = time.perf_counter() - start
+    return elapsed / emits * 1e6, sent["packets"] / emits
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Socket.IO emit cost vs connected clients")
+    parser.add_argument("--clients", default="10,100,1000,5000", help="Comma separated client counts")
+    parser.add_argument("--patients", type=int, default=100, help="Distinct patients (clients are spread over them)")
+    parser.add_argument("--emits", type=int, default=200, help="Emits per measurement")
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'mode':>7} {'us/emit':>10} {'packets/emit':>13}")
+    for clients in [int(c) for c in args.clients.split(",")]:
+        results = {}
+        for mode in ("global", "rooms"):
+            results[mode] = await run(clients, args.patients, args.emits, mode)
+            us, packets = results[mode]
+            print(f"{clients:>8} {mode:>7} {us:>10.1f} {packets:>13.1f}")
+        speedup = results["global"][0] / results["rooms"][0] if results["rooms"][0] else float("inf")
+        print(f"{'':>8} {'':>7} rooms are {speedup:.1f}x cheaper per emit")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Uçtan uca yük testi: ingestion -> sensor_data_queue -> processor -> NOTIFY
+
+Binlerce sanal hastayı tek bir asyncio sürecinde simüle eder. Her hasta
+simulator senaryolarını (services/simulator/scenarios.py: normal, taşikardi,
+hareketsizlik, düşme) kendi fazıyla, --hz hızında ingestion'a gönderir.
+
+Ölçülenler:
+- ingest gecikmesi: POST /api/v1/ingest yanıt süresi (p50/p90/p99/max) ve hata sayıları
+- kuyruk gecikmesi: işlenmemiş satır sayısı ve en eski işlenmemiş satırın yaşı
+- processor throughput: bu testin hastaları için gelen measurement_updates NOTIFY'ları / saniye
+- düşme -> bildirim gecikmesi: başarıyla (2xx) gönderilen düşme penceresinin
+  isteğinin başlamasından "FALL DETECTED!" alert_updates NOTIFY'ının gelmesine kadar
+  geçen süre. Alarmı hiç gelmeyen düşmeler (ayar yok, algılanmadı...) beklenmez,
+  "undetected" olarak ayrıca raporlanır.
+
+Sanal hastalar test başında patients tablosuna eklenir ve sonunda silinir
+(ölçümleri ve alarmlarıyla birlikte, ON DELETE CASCADE); --keep ile bırakılır.
+Core, ingestion ve processor çalışıyor olmalıdır (ör. docker compose up).
+
+Gereksinimler: pip install httpx asyncpg
+
+Kullanım:
+    python scripts/load_test.py [--patients 1000] [--hz 1] [--duration 60]
+                                [--url http://localhost:8001] [--format json|binary]
+                                [--connections 200] [--dsn postgresql://...]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "simulator"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from scenarios import CYCLE_LENGTH, generate, scenario_for  # noqa: E402
+from shared.sensor_codec import SENSOR_FRAME_CONTENT_TYPE, encode_frame  # noqa: E402
+
+FALL_ALERT_MESSAGE = "FALL DETECTED!"
+# Kuyruk boşaldıktan sonra son bildirimler için beklenen süre (saniye)
+NOTIFY_GRACE = 1.0
+
+
+def default_dsn():
+    return "postgresql://{}:{}@{}:{}/{}".format(
+        os.getenv("DB_USER", "postgres"),
+        os.getenv("DB_PASSWORD", "secret"),
+        os.getenv("DB_HOST", "localhost"),
+        os.getenv("DB_PORT", "5432"),
+        os.getenv("DB_NAME", "cdtp_health"),
+    )
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    # Nearest-rank
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def describe_ms(values):
+    values = sorted(values)
+    if not values:
+        return "-"
+    return "p50={:.1f} p90={:.1f} p99={:.1f} max={:.1f} ms".format(
+        percentile(values, 50) * 1000,
+        percentile(values, 90) * 1000,
+        percentile(values, 99) * 1000,
+        values[-1] * 1000,
+    )
+
+
+class Stats:
+    def __init__(self, patient_ids):
+        self.patient_ids = set(patient_ids)
+        self.ingest_latencies = []
+        self.responses = Counter()
+        self.sent = 0
+        self.falls_sent = 0
+        self.processed = 0
+        # patient_id -> alarmı beklenen düşmelerin gönderim zamanları
+        self.pending_falls = {}
+        # 2xx yanıtından önce gelen alarmlar: patient_id -> geliş zamanı
+        self.early_alerts = {}
+        self.fall_latencies = []
+        self.falls_undetected = 0
+        self.max_backlog = 0
+        self.max_lag = 0.0
+
+    def on_measurement(self, _conn, _pid, _channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+        if data.get("patient_id") in self.patient_ids:
+            self.processed += 1
+
+    def on_alert(self, _conn, _pid, _channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+        if data.get("message") != FALL_ALERT_MESSAGE:
+            return
+        patient_id = data.get("patient_id")
+        if patient_id not in self.patient_ids:
+            return
+        now = time.perf_counter()
+        pending = self.pending_falls.pop(patient_id, None)
+        if pending:
+            # Alarm en son düşmeye aittir; öncekiler alarmsız kalmıştır
+            self.fall_latencies.append(now - pending[-1])
+            self.falls_undetected += len(pending) - 1
+        else:
+            self.early_alerts[patient_id] = now
+
+    def on_fall_sent(self, patient_id, started):
+        """Düşme penceresi 2xx ile kabul edildi."""
+        self.falls_sent += 1
+        alerted_at = self.early_alerts.pop(patient_id, None)
+        if alerted_at is not None:
+            self.fall_latencies.append(alerted_at - started)
+        else:
+            self.pending_falls.setdefault(patient_id, []).append(started)
+
+    def finish(self):
+        """Alarmı hiç gelmeyen düşmeleri sayar."""
+        self.falls_undetected += sum(len(pending) for pending in self.pending_falls.values())
+        self.pending_falls.clear()
+
+
+async def create_patients(conn, count):
+    rows = await conn.fetch(
+        "INSERT INTO patients (name) SELECT 'loadtest-' || i FROM generate_series(1, $1) AS i RETURNING id",
+        count,
+    )
+    return [str(row['id']) for row in rows]
+
+
+async def virtual_patient(client, args, patient_id, stats, stop_at):
+    interval = 1.0 / args.hz
+    # Hastalar aynı anda düşmesin: senaryo döngüsünde rastgele faz
+    counter = random.randrange(CYCLE_LENGTH)
+    next_at = time.perf_counter() + random.uniform(0, interval)
+
+    while True:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if time.perf_counter() >= stop_at:
+            return
+        next_at += interval
+        counter += 1
+
+        mode = scenario_for(counter)
+        data = generate(mode, counter, patient_id)
+        if args.format == "binary":
+            content = encode_frame(
+                patient_id, data["timestamp"], data["accelerometer"], data["gyroscope"], data["ppg_raw"]
+            )
+            headers = {"Content-Type": SENSOR_FRAME_CONTENT_TYPE}
+        else:
+            content = json.dumps(data).encode()
+            headers = {"Content-Type": "application/json"}
+
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/ingest", content=content, headers=headers)
+            stats.responses[response.status_code] += 1
+        except httpx.HTTPError as e:
+            stats.responses[type(e).__name__] += 1
+            continue
+        stats.sent += 1
+        stats.ingest_latencies.append(time.perf_counter() - started)
+        if mode == "FALL" and response.is_success:
+            stats.on_fall_sent(patient_id, started)
+
+
+async def monitor(pool, stats, args, started, stop_event):
+    last_processed = 0
+    last_sent = 0
+    last_time = time.perf_counter()
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), args.interval)
+        except asyncio.TimeoutError:
+            pass
+        row = await pool.fetchrow("""
+            SELECT COUNT(*) AS backlog,
+                   COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(created_at)), 0)::float AS lag
+            FROM sensor_data_queue
+            WHERE processed = FALSE
+        """)
+        stats.max_backlog = max(stats.max_backlog, row['backlog'])
+        stats.max_lag = max(stats.max_lag, row['lag'])
+
+        now = time.perf_counter()
+        elapsed = now - last_time
+        recent = stats.ingest_latencies[-1000:]
+        print("[{:6.1f}s] ingest {:7.1f} req/s  p95={:6.1f} ms | queue backlog={:<6} lag={:5.1f}s | processed {:7.1f}/s".format(
+            now - started,
+            (stats.sent - last_sent) / elapsed,
+            percentile(sorted(recent), 95) * 1000 if recent else 0.0,
+            row['backlog'],
+            row['lag'],
+            (stats.processed - last_processed) / elapsed,
+        ))
+        last_processed, last_sent, last_time = stats.processed, stats.sent, now
+
+
+async def run(args):
+    pool = await asyncpg.create_pool(args.dsn, min_size=1, max_size=2)
+    listener = await asyncpg.connect(args.dsn)
+
+    patient_ids = await create_patients(pool, args.patients)
+    stats = Stats(patient_ids)
+    await listener.add_listener("measurement_updates", stats.on_measurement)
+    await listener.add_listener("alert_updates", stats.on_alert)
+    print(f"Created {len(patient_ids)} virtual patients, sending {args.format} windows at {args.hz} Hz "
+          f"(~{len(patient_ids) * args.hz:.0f} req/s) for {args.duration}s")
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    stop_event = asyncio.Event()
+    started = time.perf_counter()
+    monitor_task = asyncio.create_task(monitor(pool, stats, args, started, stop_event))
+    try:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            stop_at = started + args.duration
+            await asyncio.gather(*(
+                virtual_patient(client, args, patient_id, stats, stop_at) for patient_id in patient_ids
+            ))
+        send_time = time.perf_counter() - started
+        processed_at_stop = stats.processed
+
+        # Processor'ın kuyruğu bitirmesini bekle
+        drain_started = time.perf_counter()
+        drained = False
+        while time.perf_counter() - drain_started < args.drain:
+            backlog = await pool.fetchval("SELECT COUNT(*) FROM sensor_data_queue WHERE processed = FALSE")
+            if backlog == 0:
+                drained = True
+                break
+            await asyncio.sleep(0.5)
+        drain_time = time.perf_counter() - drain_started
+        # Son commit'lerin NOTIFY'ları yolda olabilir
+        await asyncio.sleep(NOTIFY_GRACE)
+        stats.finish()
+    finally:
+        stop_event.set()
+        await monitor_task
+        await listener.close()
+        if args.keep:
+            print("Keeping virtual patients (name LIKE 'loadtest-%')")
+        else:
+            await pool.execute("DELETE FROM patients WHERE id = ANY($1::uuid[])", patient_ids)
+        await pool.close()
+
+    total_time = send_time + drain_time
+    errors = {status: count for status, count in stats.responses.items() if status != 200}
+    print()
+    print("=== Results ===")
+    print(f"Requests:          {stats.sent} in {send_time:.1f}s ({stats.sent / send_time:.1f} req/s), errors: {errors or 0}")
+    print(f"Ingest latency:    {describe_ms(stats.ingest_latencies)}")
+    drain_result = f"drained in {drain_time:.1f}s" if drained else f"NOT drained after {drain_time:.1f}s"
+    print(f"Queue:             max backlog {stats.max_backlog}, max lag {stats.max_lag:.1f}s, {drain_result}")
+    print(f"Processor:         {stats.processed} measurements "
+          f"({processed_at_stop / send_time:.1f}/s during load, {stats.processed / total_time:.1f}/s overall)")
+    print(f"Fall -> alert:     {len(stats.fall_latencies)}/{stats.falls_sent} detected, "
+          f"{stats.falls_undetected} undetected, {describe_ms(stats.fall_latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=1000, help="sanal hasta sayısı")
+    parser.add_argument("--hz", type=float, default=1.0, help="hasta başına pencere/saniye")
+    parser.add_argument("--duration", type=float, default=60.0, help="yük süresi (saniye)")
+    parser.add_argument("--drain", type=float, default=30.0, help="yük bittikten sonra kuyruğun boşalması için en fazla bekleme (saniye)")
+    parser.add_argument("--url", default=os.getenv("INGESTION_URL", "http://localhost:8001"), help="ingestion servisinin adresi")
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--connections", type=int, default=200, help="en fazla eşzamanlı HTTP bağlantısı")
+    parser.add_argument("--timeout", type=float, default=10.0, help="istek zaman aşımı (saniye)")
+    parser.add_argument("--interval", type=float, default=5.0, help="ara rapor aralığı (saniye)")
+    parser.add_argument("--dsn", default=default_dsn(), help="PostgreSQL bağlantısı (varsayılan: DB_* ortam değişkenleri)")
+    parser.add_argument("--keep", action="store_true", help="sanal hastaları silme")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Ayar cache'i yarış durumu testi
+
+settings_updates NOTIFY'ı yazan transaction commit edildikten sonra gelir. Commit'ten
+önce başlamış bir patient_settings okuması eski satırı döndürür; invalidation bu
+okuma sürerken gelirse eski eşikler SETTINGS_CACHE_TTL boyunca cache'te kalmamalıdır.
+
+Veritabanı gerekmez: okuma, invalidation gelene kadar bekleyen sahte bir bağlantıyla
+yapılır. Hem tek hasta (_get_settings) hem bulk (_get_settings_many) yolu denenir.
+
+Kullanım:
+    python scripts/verify_settings_cache_race.py
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from shared.measurement_service import MeasurementService  # noqa: E402
+from shared.settings_cache import MISSING, SettingsCache  # noqa: E402
+
+OLD = {"bpm_lower_limit": 50, "bpm_upper_limit": 120, "max_inactivity_seconds": 900}
+
+
+class SlowConnection:
+    """Sorgu DB'ye ulaştı (eski snapshot) ama sonuç, invalidation'dan sonra dönüyor."""
+
+    def __init__(self, patient_id: str):
+        self.patient_id = patient_id
+        self.query_started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def _row(self):
+        self.query_started.set()
+        await self.release.wait()
+        return {"patient_id": uuid.UUID(self.patient_id), **OLD}
+
+    async def fetchrow(self, query, *args):
+        return await self._row()
+
+    async def fetch(self, query, *args):
+        return [await self._row()]
+
+
+async def interleave(name: str, read) -> bool:
+    patient_id = str(uuid.uuid4())
+    cache = SettingsCache(ttl_seconds=300, max_size=100)
+    service = MeasurementService(None, settings_cache=cache)
+    conn = SlowConnection(patient_id)
+
+    # 1. Processor cache miss -> SELECT başlar (clinician henüz commit etmedi)
+    task = asyncio.create_task(read(service, conn, patient_id))
+    await conn.query_started.wait()
+    # 2. Clinician commit eder, NOTIFY settings_updates gelir
+    cache.on_notification(None, 0, "settings_updates", patient_id)
+    # 3. Eski satır döner ve cache'e yazılmaya çalışılır
+    conn.release.set()
+    await task
+
+    cached = cache.get(patient_id)
+    ok = cached is MISSING
+    print(f"{'OK  ' if ok else 'FAIL'} {name}: cache after interleaving = "
+          f"{'MISSING' if cached is MISSING else cached}")
+    return ok
+
+
+async def main():
+    results = [
+        await interleave("_get_settings", lambda s, c, pid: s._get_settings(c, pid)),
+        await interleave("_get_settings_many", lambda s, c, pid: s._get_settings_many(c, [pid])),
+    ]
+    if not all(results):
+        print("Stale settings were cached after an invalidation")
+        sys.exit(1)
+    print("Stale reads are not cached")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
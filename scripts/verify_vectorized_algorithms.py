@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Vektörize algoritma parity testi
+
+services/processor/vectorized.py'nin algorithms.py ile aynı sınıflandırmaları
+verdiğini rastgele ve senaryo bazlı pencerelerle doğrular. Processor'ın kullandığı
+yol (main.decode_row -> main.analyze_windows -> resolve_inactivity) da aynı
+pencerelerle karşılaştırılır.
+
+Kullanım:
+    python scripts/verify_vectorized_algorithms.py [--windows 2000] [--seed 42]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "processor"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from algorithms import detect_fall, calculate_bpm, check_inactivity  # noqa: E402
+from main import analyze_windows, decode_row  # noqa: E402
+from vectorized import (  # noqa: E402
+    accelerometer_arrays, stack_accelerometer, resolve_inactivity,
+    detect_fall_batch, calculate_bpm_batch, check_inactivity_batch
+)
+
+WINDOW_SIZES = [0, 1, 2, 3, 5, 10, 25, 100, 250]
+
+
+def random_window(rng: random.Random, size: int):
+    """Senaryo karışımından bir pencere üretir (acc, ppg)."""
+    scenario = rng.choice(["normal", "fall", "still", "noise", "impact", "boundary"])
+    xs, ys, zs = [], [], []
+    for i in range(size):
+        if scenario == "normal":
+            v = (0.05 + rng.uniform(-0.02, 0.02), 0.10 + rng.uniform(-0.02, 0.02), 0.98 + rng.uniform(-0.02, 0.02))
+        elif scenario == "fall":
+            phase = i * 3 // max(size, 1)
+            if phase == 0:
+                v = (rng.uniform(0, 0.2), rng.uniform(0, 0.2), rng.uniform(0, 0.3))
+            elif phase == 1:
+                v = (rng.uniform(2.0, 3.0), rng.uniform(1.5, 2.5), rng.uniform(1.0, 2.0))
+            else:
+                v = (rng.uniform(0, 0.1), rng.uniform(0, 0.1), rng.uniform(0.95, 1.05))
+        elif scenario == "still":
+            v = (0.0, 0.0, 1.0)
+        elif scenario == "impact":
+            v = (rng.uniform(-3, 3), rng.uniform(-3, 3), rng.uniform(-3, 3)) if rng.random() < 0.2 else (0.0, 0.0, 1.0)
+        elif scenario == "boundary":
+            # Eşiklere yakın değerler (0.9g, 1.08g, 1.1g, 2.5g)
+            v = (0.0, 0.0, rng.choice([0.5, 0.85, 0.9, 1.08, 1.1, 2.5, 4.0]) + rng.uniform(-1e-9, 1e-9))
+        else:
+            v = (rng.gauss(0, 1.5), rng.gauss(0, 1.5), rng.gauss(1, 1.5))
+        xs.append(v[0])
+        ys.append(v[1])
+        zs.append(v[2])
+    period = rng.choice([2, 3, 5, 8])
+    ppg = [2000 + int(200 * math.sin(i / period)) + rng.randint(-5, 5) for i in range(size)]
+    return {"x": xs, "y": ys, "z": zs}, ppg
+
+
+def compare(windows):
+    """Pencereleri hem tek tek hem de uzunluğa göre gruplanmış yığınlar halinde karşılaştırır."""
+    mismatches = 0
+    groups = {}
+    for idx, (acc, ppg, ts, last_ts) in enumerate(windows):
+        expected = (detect_fall(acc), calculate_bpm(ppg), check_inactivity(acc, ts, last_ts))
+
+        arr = accelerometer_arrays(acc)
+        is_fall, fall_type = detect_fall_batch(arr[0], arr[1], arr[2])
+        bpm = calculate_bpm_batch(np.asarray(ppg, dtype=np.int64).reshape(1, -1))
+        inactivity, is_moving = check_inactivity_batch(
+            arr[0], arr[1], arr[2], [ts], [last_ts if last_ts is not None else np.nan]
+        )
+        actual = (
+            (bool(is_fall[0]), str(fall_type[0])),
+            int(bpm[0]),
+            (int(inactivity[0]), bool(is_moving[0]))
+        )
+        if actual != expected:
+            mismatches += 1
+            print(f"❌ Window {idx}: expected {expected}, got {actual}")
+
+        groups.setdefault((arr.shape[1], len(ppg)), []).append((idx, arr, ppg, ts, last_ts, expected))
+
+    # 2-D yığınlar
+    for (acc_len, ppg_len), items in groups.items():
+        x, y, z = stack_accelerometer([item[1] for item in items])
+        ppg = np.array([item[2] for item in items], dtype=np.int64).reshape(len(items), ppg_len)
+        is_fall, fall_type = detect_fall_batch(x, y, z)
+        bpm = calculate_bpm_batch(ppg)
+        inactivity, is_moving = check_inactivity_batch(
+            x, y, z,
+            [item[3] for item in items],
+            [item[4] if item[4] is not None else np.nan for item in items]
+        )
+        for i, item in enumerate(items):
+            actual = (
+                (bool(is_fall[i]), str(fall_type[i])),
+                int(bpm[i]),
+                (int(inactivity[i]), bool(is_moving[i]))
+            )
+            if actual != item[5]:
+                mismatches += 1
+                print(f"❌ Batch window {item[0]} (len {acc_len}): expected {item[5]}, got {actual}")
+
+    return mismatches
+
+
+def compare_processor_path(windows):
+    """Pencereleri processor'ın yaptığı gibi kuyruk satırından çözüp tek batch'te değerlendirir."""
+    mismatches = 0
+    rows = [{"packed": None, "accelerometer": acc, "ppg_raw": ppg} for acc, ppg, _, _ in windows]
+    analyses = analyze_windows([decode_row(row) for row in rows])
+
+    for idx, ((acc, ppg, ts, last_ts), analysis) in enumerate(zip(windows, analyses)):
+        expected = (detect_fall(acc), calculate_bpm(ppg), check_inactivity(acc, ts, last_ts))
+        actual = (
+            (analysis["is_fall"], analysis["fall_type"]),
+            analysis["bpm"],
+            (resolve_inactivity(analysis["is_moving"], analysis["samples"], ts, last_ts), analysis["is_moving"])
+        )
+        if actual != expected:
+            mismatches += 1
+            print(f"❌ Processor window {idx}: expected {expected}, got {actual}")
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized algorithm parity check")
+    parser.add_argument("--windows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    windows = []
+    for _ in range(args.windows):
+        acc, ppg = random_window(rng, rng.choice(WINDOW_SIZES))
+        ts = 1_700_000_000.0 + rng.uniform(0, 10_000)
+        last_ts = rng.choice([None, ts - rng.uniform(0, 2000), ts + 5.0])
+        windows.append((acc, ppg, ts, last_ts))
+
+    # Eksenleri farklı uzunlukta olan pencereler (min uzunluğa kırpılmalı)
+    acc, ppg = random_window(rng, 30)
+    acc["y"] = acc["y"][:20]
+    windows.append((acc, ppg, 1_700_000_000.0, None))
+
+    # Boş ve tek ekseni boş pencereler, son hareket zamanı bilinirken (hareketsizlik 0 olmalı)
+    windows.append(({"x": [], "y": [], "z": []}, [], 2000.0, 1000.0))
+    acc, ppg = random_window(rng, 30)
+    acc["z"] = []
+    windows.append((acc, ppg, 2000.0, 1000.0))
+
+    mismatches = compare(windows) + compare_processor_path(windows)
+    print("=" * 50)
+    if mismatches:
+        print(f"❌ {mismatches} mismatches in {len(windows)} windows")
+        sys.exit(1)
+    print(f"✅ {len(windows)} windows: vectorized results match algorithms.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+WebSocket Yayıncısı (Fan-out)
+
+Bakıcıların /ws/vitals/{patient_id} bağlantılarına mesaj dağıtır. Her bağlantının
+sınırlı bir gönderim kuyruğu ve kendi gönderici task'ı vardır: mesaj bir kez
+serialize edilir, tüm kuyruklara beklemeden eklenir ve yavaş bir soket diğer
+bakıcıları bekletmez.
+
+Kuyruğu dolan bağlantıda en eski mesaj atılır (en güncel veri kalır). Üst üste
+WS_MAX_DROPPED mesaj kaçıran ya da tek bir gönderimi WS_SEND_TIMEOUT saniyeyi
+aşan bağlantı kapatılır; istemci yeniden bağlanarak güncel akışa döner.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket
+
+from shared.metrics import counter, gauge, histogram, registry
+
+SEND_QUEUE_SIZE = max(1, int(os.getenv("WS_SEND_QUEUE_SIZE", "64")))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+MAX_DROPPED = int(os.getenv("WS_MAX_DROPPED", "256"))
+
+# 1013 = Try Again Later
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+WS_CONNECTIONS = gauge("ws_connections", "Caregiver WebSocket connections on this instance")
+WS_SEND_SECONDS = histogram("ws_send_seconds", "Time to write one message to a caregiver WebSocket")
+WS_DROPPED = counter("ws_dropped_messages_total", "Messages dropped because a send queue was full")
+WS_SLOW_CLOSED = counter("ws_slow_consumers_closed_total", "Caregiver WebSockets closed as slow consumers")
+
+
+class ConnectionSender:
+    """Tek bir WebSocket için sınırlı kuyruk + gönderici task."""
+
+    def __init__(self, broadcaster: "Broadcaster", topic: str, websocket: WebSocket):
+        self.broadcaster = broadcaster
+        self.topic = topic
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.dropped = 0
+        # Canlı vital akışı tercihleri (bkz. app/vitals_stream.py)
+        self.rate: Optional[float] = None
+        self.delta = False
+        self.needs_keyframe = True
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, message: str):
+        """Mesajı beklemeden kuyruğa ekler; kuyruk doluysa en eski mesajı atar."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            WS_DROPPED.inc()
+            if self.dropped > MAX_DROPPED:
+                print(f"Slow WebSocket consumer on {self.topic}: {self.dropped} messages dropped, closing")
+                WS_SLOW_CLOSED.inc()
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return
+        self.queue.put_nowait(message)
+
+    async def _run(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                with WS_SEND_SECONDS.time():
+                    await asyncio.wait_for(self.websocket.send_text(message), SEND_TIMEOUT)
+                self.dropped = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"WebSocket send failed on {self.topic}: {e!r}")
+            WS_SLOW_CLOSED.inc()
+            self.close(SLOW_CONSUMER_CLOSE_CODE)
+
+    def close(self, code: int = 1000):
+        """Bağlantıyı yayından çıkarır ve soketi arka planda kapatır."""
+        self.broadcaster.unsubscribe(self.topic, self.websocket)
+        asyncio.create_task(self._close_socket(code))
+
+    def cancel(self):
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class Broadcaster:
+    """topic (patient_id) -> bağlı WebSocket'ler."""
+
+    def __init__(self):
+        self._topics: Dict[str, Dict[WebSocket, ConnectionSender]] = {}
+
+    def subscribe(self, topic: str, websocket: WebSocket) -> ConnectionSender:
+        senders = self._topics.setdefault(topic, {})
+        sender = senders.get(websocket)
+        if sender is None:
+            sender = senders[websocket] = ConnectionSender(self, topic, websocket)
+        return sender
+
+    def unsubscribe(self, topic: str, websocket: WebSocket):
+        senders = self._topics.get(topic)
+        if not senders:
+            return
+        sender = senders.pop(websocket, None)
+        if sender:
+            sender.cancel()
+        if not senders:
+            del self._topics[topic]
+
+    def senders(self, topic: str) -> List[ConnectionSender]:
+        return list(self._topics.get(topic, {}).values())
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._topics.get(topic))
+
+    def subscriber_count(self, topic: str = None) -> int:
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(senders) for senders in self._topics.values())
+
+    def publish(self, topic: str, message: str) -> int:
+        """Önceden serialize edilmiş mesajı topic'in tüm bağlantılarına dağıtır. Alıcı sayısını döner."""
+        senders = self._topics.get(topic)
+        if not senders:
+            return 0
+        for sender in list(senders.values()):
+            sender.offer(message)
+        return len(senders)
+
+    def publish_json(self, topic: str, payload: Any) -> int:
+        """Abone varsa payload'ı bir kez serialize edip dağıtır."""
+        if not self.has_subscribers(topic):
+            return 0
+        return self.publish(topic, json.dumps(payload, default=str))
+
+
+broadcaster = Broadcaster()
+registry.add_collector(lambda: WS_CONNECTIONS.set(broadcaster.subscriber_count()))
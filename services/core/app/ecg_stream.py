@@ -0,0 +1,166 @@
+"""
+EKG Aralık Okuma (Segment Birleştirme)
+
+ecg_segments tablosundaki segmentleri zaman sırasıyla okur, istenen aralığa
+kırpar ve ardışık segmentleri tek bir sürekli akış olarak birleştirir.
+Yanıt NDJSON'dır; her satır bir parça (chunk):
+
+    {"start": ISO, "sample_rate": 250, "step": 1, "continuous": false, "samples": [...]}
+
+- continuous=true: parça bir öncekinin hemen devamıdır (araya boşluk girmez).
+  false ise kayıtta boşluk vardır (veya örnekleme hızı değişmiştir).
+- ?max_points=N verilirse her `step` örnek tek bir (min, max) çiftine indirilir
+  ("min" / "max" dizileri); genel bakış grafikleri için aktarım N noktayla sınırlanır.
+
+Segmentler ECG_FETCH_BATCH'lik gruplar halinde okunur, böylece saatlerce
+süren kayıtlar belleğe toplu yüklenmez.
+"""
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from shared.database import db
+from shared.ecg_codec import decimate_min_max, decode_samples
+
+# Bir segmentin en uzun süresi: aralığın başını kesen segmentleri bulmak için geriye bakılır
+ECG_MAX_SEGMENT_MS = int(os.getenv("ECG_MAX_SEGMENT_MS", "600000"))
+# Tek istekte okunabilecek en uzun aralık
+ECG_MAX_RANGE_HOURS = float(os.getenv("ECG_MAX_RANGE_HOURS", "6"))
+ECG_FETCH_BATCH = 50
+
+
+async def iter_segments(patient_id: str, start: datetime, end: datetime) -> AsyncIterator[dict]:
+    """[start, end) ile kesişen segmentler, started_at sırasıyla."""
+    lower = start - timedelta(milliseconds=ECG_MAX_SEGMENT_MS)
+    last = None
+    while True:
+        args = [patient_id, lower, end, start, ECG_FETCH_BATCH]
+        keyset = ""
+        if last:
+            args += [last['started_at'], last['id']]
+            keyset = "AND (started_at, id) > ($6, $7)"
+        rows = await db.fetch_all(f"""
+            SELECT id, sample_rate, started_at, duration_ms, samples, samples_compressed
+            FROM ecg_segments
+            WHERE patient_id = $1 AND started_at >= $2 AND started_at < $3
+              AND started_at + duration_ms * INTERVAL '1 millisecond' > $4
+              {keyset}
+            ORDER BY started_at, id
+            LIMIT $5
+        """, *args)
+        for row in rows:
+            yield row
+        if len(rows) < ECG_FETCH_BATCH:
+            return
+        last = rows[-1]
+
+
+class EcgStitcher:
+    """Segmentleri aralığa kırpar, birleştirir ve NDJSON satırlarına çevirir."""
+
+    def __init__(self, start: datetime, end: datetime, max_points: Optional[int] = None):
+        self.start = start
+        self.end = end
+        self.max_points = max_points
+        self._rate: Optional[int] = None
+        self._step = 1
+        self._next_at: Optional[datetime] = None  # Son örnekten sonraki örneğin zamanı
+        self._pending: List[int] = []  # Henüz tamamlanmamış decimation bucket'ı
+        self._pending_at: Optional[datetime] = None
+        self._emitted = False  # Mevcut sürekli akıştan parça gönderildi mi
+
+    def _step_for(self, rate: int) -> int:
+        if not self.max_points:
+            return 1
+        expected = (self.end - self.start).total_seconds() * rate
+        return max(1, math.ceil(expected / self.max_points))
+
+    def _line(self, at: datetime, samples: List[int]) -> str:
+        item = {
+            "start": at.isoformat(),
+            "sample_rate": self._rate,
+            "step": self._step,
+            "continuous": self._emitted,
+        }
+        if self._step > 1:
+            item["min"], item["max"] = decimate_min_max(samples, self._step)
+        else:
+            item["samples"] = samples
+        self._emitted = True
+        return json.dumps(item) + "\n"
+
+    def add(self, segment) -> List[str]:
+        rate = segment['sample_rate']
+        period = 1.0 / rate
+        if segment['samples_compressed'] is not None:
+            samples = decode_samples(segment['samples_compressed'])
+        else:
+            samples = list(segment['samples'] or [])
+
+        started_at = segment['started_at']
+        offset = (self.start - started_at).total_seconds() * rate
+        first = max(0, math.ceil(offset - 1e-6))
+        last = min(len(samples), math.ceil((self.end - started_at).total_seconds() * rate - 1e-6))
+
+        lines = []
+        if rate == self._rate and self._next_at is not None:
+            # Önceki segmentle çakışan örnekler atlanır
+            lag = (self._next_at - started_at).total_seconds() * rate
+            first = max(first, round(lag))
+            at = started_at + timedelta(seconds=first * period)
+            if abs((at - self._next_at).total_seconds()) > period:
+                lines += self.finish()
+        else:
+            lines += self.finish()
+
+        if first >= last:
+            return lines
+
+        at = started_at + timedelta(seconds=first * period)
+        if self._rate is None:
+            self._rate = rate
+            self._step = self._step_for(rate)
+            self._emitted = False
+        chunk = samples[first:last]
+        self._next_at = at + timedelta(seconds=len(chunk) * period)
+
+        if self._step == 1:
+            lines.append(self._line(at, chunk))
+            return lines
+
+        if not self._pending:
+            self._pending_at = at
+        buffer = self._pending + chunk
+        full = len(buffer) - len(buffer) % self._step
+        if full:
+            lines.append(self._line(self._pending_at, buffer[:full]))
+            self._pending_at = self._pending_at + timedelta(seconds=full * period)
+        self._pending = buffer[full:]
+        return lines
+
+    def finish(self) -> List[str]:
+        """Mevcut sürekli akışı kapatır (yarım bucket dahil)."""
+        lines = []
+        if self._pending:
+            lines.append(self._line(self._pending_at, self._pending))
+        self._pending = []
+        self._pending_at = None
+        self._rate = None
+        self._next_at = None
+        return lines
+
+
+async def stream_ecg(patient_id: str, start: datetime, end: datetime,
+                     max_points: Optional[int] = None) -> AsyncIterator[str]:
+    stitcher = EcgStitcher(start, end, max_points)
+    try:
+        async for segment in iter_segments(patient_id, start, end):
+            for line in stitcher.add(segment):
+                yield line
+        for line in stitcher.finish():
+            yield line
+    except Exception as e:
+        # Yanıt başladıktan sonra HTTP hatası dönülemez; akış kesilir
+        print(f"ECG stream error: {e}")
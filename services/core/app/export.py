@@ -0,0 +1,208 @@
+"""
+Hasta Geçmişi Dışa Aktarımı (Streaming Export)
+
+Ölçüm, alarm ve EKG geçmişini parça parça (chunked) akıtır. Satırlar asyncpg
+server-side cursor'ı ile EXPORT_CHUNK_ROWS'luk gruplar halinde okunur ve her
+grup hemen gönderilir: bellek kullanımı aralığın büyüklüğünden bağımsızdır.
+Cursor yalnızca istemci okudukça ilerler (yavaş istemci sorguyu da yavaşlatır).
+
+Export'lar canlı endpoint'lerin kullandığı havuzdan ayrı, küçük bir bağlantı
+havuzu (EXPORT_POOL_SIZE) kullanır. Aynı anda en fazla EXPORT_MAX_CONCURRENT
+export çalışır; sırası gelmeyen istek EXPORT_QUEUE_TIMEOUT saniye bekler,
+ardından 503 + Retry-After döner.
+
+Formatlar:
+- csv: başlık satırı + satırlar
+- ndjson: satır başına bir JSON nesnesi
+- columnar: Parquet benzeri sütunsal NDJSON; ilk satır şema
+  ({"dataset", "columns"}), sonraki her satır bir row group
+  ({"rows": n, "columns": {"kolon": [değerler...]}})
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import asyncpg
+from fastapi import HTTPException
+
+from shared.database import create_pool
+from shared.ecg_codec import decode_samples
+from shared.metrics import acquire
+
+EXPORT_MAX_CONCURRENT = max(1, int(os.getenv("EXPORT_MAX_CONCURRENT", "2")))
+EXPORT_POOL_SIZE = max(1, int(os.getenv("EXPORT_POOL_SIZE", str(EXPORT_MAX_CONCURRENT))))
+EXPORT_QUEUE_TIMEOUT = float(os.getenv("EXPORT_QUEUE_TIMEOUT", "30"))
+EXPORT_CHUNK_ROWS = max(1, int(os.getenv("EXPORT_CHUNK_ROWS", "1000")))
+# EKG satırları binlerce örnek içerir; daha küçük gruplar halinde gönderilir
+ECG_CHUNK_SEGMENTS = 10
+
+# dataset -> (tablo, zaman kolonu, kolonlar)
+DATASETS = {
+    "measurements": (
+        "measurements", "measured_at",
+        ["id", "measured_at", "heart_rate", "inactivity_seconds", "status"],
+    ),
+    "alerts": (
+        "emergency_logs", "created_at",
+        ["id", "created_at", "message", "is_resolved"],
+    ),
+    "ecg": (
+        "ecg_segments", "started_at",
+        ["id", "started_at", "sample_rate", "duration_ms", "samples"],
+    ),
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "columnar": ("application/x-ndjson", "columns.ndjson"),
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _rows(dataset: str, records: List[asyncpg.Record]) -> List[Dict]:
+    columns = DATASETS[dataset][2]
+    rows = []
+    for record in records:
+        row = {column: _value(record[column]) for column in columns if column != "samples"}
+        if dataset == "ecg":
+            if record['samples_compressed'] is not None:
+                row["samples"] = decode_samples(record['samples_compressed'])
+            else:
+                row["samples"] = list(record['samples'] or [])
+        rows.append(row)
+    return rows
+
+
+def _encode(fmt: str, dataset: str, rows: List[Dict]) -> str:
+    columns = DATASETS[dataset][2]
+    if fmt == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows)
+    if fmt == "columnar":
+        return json.dumps({
+            "rows": len(rows),
+            "columns": {column: [row[column] for row in rows] for column in columns}
+        }) + "\n"
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            " ".join(map(str, row[column])) if column == "samples" else row[column]
+            for column in columns
+        ])
+    return buffer.getvalue()
+
+
+def _header(fmt: str, dataset: str) -> Optional[str]:
+    columns = DATASETS[dataset][2]
+    if fmt == "csv":
+        return ",".join(columns) + "\r\n"
+    if fmt == "columnar":
+        return json.dumps({"dataset": dataset, "columns": columns}) + "\n"
+    return None
+
+
+class ExportSlot:
+    """Alınan eşzamanlılık hakkı; birden fazla kez bırakılabilir."""
+
+    def __init__(self, semaphore: asyncio.Semaphore):
+        self._semaphore = semaphore
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._semaphore.release()
+
+
+class Exporter:
+    def __init__(self):
+        self.pool: Optional[asyncpg.Pool] = None
+        self._semaphore = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+    async def connect(self):
+        if not self.pool:
+            try:
+                # Uzun süren cursor okumaları: sorgu başına zaman aşımı yok
+                self.pool = await create_pool(
+                    "export", "cdtp-core-export",
+                    min_size=0, max_size=EXPORT_POOL_SIZE, command_timeout=0
+                )
+            except Exception as e:
+                print(f"Export pool connection failed: {e}")
+
+    async def disconnect(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def acquire(self) -> ExportSlot:
+        """Export hakkı bekler; kuyruk dolu kalırsa 503."""
+        if not self.pool:
+            raise HTTPException(status_code=503, detail="Database not ready")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), EXPORT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many exports in progress",
+                headers={"Retry-After": str(max(1, int(EXPORT_QUEUE_TIMEOUT)))}
+            )
+        return ExportSlot(self._semaphore)
+
+    async def stream(self, slot: ExportSlot, dataset: str, fmt: str, patient_id: str,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None) -> AsyncIterator[str]:
+        table, time_column, columns = DATASETS[dataset]
+        select = [column for column in columns if column != "samples"]
+        if dataset == "ecg":
+            select += ["samples", "samples_compressed"]
+
+        args: list = [patient_id]
+        conditions = ["patient_id = $1"]
+        if start:
+            args.append(start)
+            conditions.append(f"{time_column} >= ${len(args)}")
+        if end:
+            args.append(end)
+            conditions.append(f"{time_column} < ${len(args)}")
+        query = f"""
+            SELECT {', '.join(select)}
+            FROM {table}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {time_column}, id
+        """
+
+        chunk_rows = ECG_CHUNK_SEGMENTS if dataset == "ecg" else EXPORT_CHUNK_ROWS
+        try:
+            header = _header(fmt, dataset)
+            if header:
+                yield header
+            async with acquire(self.pool, "export") as conn:
+                # Server-side cursor'lar bir transaction içinde yaşar
+                async with conn.transaction(readonly=True):
+                    batch = []
+                    async for record in conn.cursor(query, *args, prefetch=chunk_rows):
+                        batch.append(record)
+                        if len(batch) >= chunk_rows:
+                            yield _encode(fmt, dataset, _rows(dataset, batch))
+                            batch = []
+                    if batch:
+                        yield _encode(fmt, dataset, _rows(dataset, batch))
+        except Exception as e:
+            # Yanıt başladıktan sonra HTTP hatası dönülemez; akış kesilir
+            print(f"Export error ({dataset}, {patient_id}): {e}")
+        finally:
+            slot.release()
+
+
+exporter = Exporter()
@@ -0,0 +1,106 @@
+"""
+Çoklu Instance Fan-out (CORE_FANOUT_MODE=postgres)
+
+Birden fazla core worker'ı (uvicorn --workers veya birden fazla container)
+çalıştığında Socket.IO istemcileri ve bakıcı WebSocket'leri farklı
+instance'lara dağılır. Bu modda:
+
+- Socket.IO, PostgreSQL LISTEN/NOTIFY üzerinden çalışan bir AsyncPubSubManager
+  kullanır: bir instance'ta yapılan emit diğer instance'lardaki room üyelerine
+  de ulaşır.
+- measurement_updates / alert_updates kanallarını yalnızca lider instance
+  dinler (pg_try_advisory_lock); her bildirim bir kez işlenir ve manager
+  üzerinden dağıtılır. Lider düşerse kilit bırakılır, diğerlerinden biri
+  devralır.
+- Bakıcı WebSocket mesajları (app/broadcaster.py) aynı kanal üzerinden
+  'ws_publish' mesajı olarak diğer instance'lara iletilir.
+
+Her instance tek bir LISTEN bağlantısı kullanır (bkz. socket_manager.pg_listener).
+NOTIFY payload'ları 8000 byte ile sınırlıdır; daha büyük mesajlar yalnızca yerel
+istemcilere iletilir.
+"""
+import asyncio
+import json
+import os
+from typing import Optional
+
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from shared.database import db
+from app.broadcaster import broadcaster
+
+FANOUT_MODE = os.getenv("CORE_FANOUT_MODE", "local")
+FANOUT_CHANNEL = os.getenv("CORE_FANOUT_CHANNEL", "core_fanout")
+# Lider seçimi için advisory lock anahtarı ve tekrar deneme aralığı (saniye)
+LEADER_LOCK_KEY = int(os.getenv("CORE_FANOUT_LOCK_KEY", "7265001"))
+LEADER_RETRY_INTERVAL = float(os.getenv("CORE_FANOUT_LEADER_RETRY", "5"))
+
+MAX_NOTIFY_BYTES = 7900
+
+
+class PostgresPubSubManager(AsyncPubSubManager):
+    """Socket.IO client manager backed by PostgreSQL NOTIFY."""
+
+    name = 'asyncpostgres'
+
+    def __init__(self, channel: str = FANOUT_CHANNEL, write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def _notify(self, message: dict):
+        payload = json.dumps(message, default=str)
+        if len(payload.encode()) > MAX_NOTIFY_BYTES:
+            print(f"Fan-out message too large for NOTIFY ({len(payload)} bytes), delivered locally only")
+            return
+        await db.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def _publish(self, data):
+        await self._notify(data)
+
+    async def _listen(self):
+        while True:
+            yield await self._queue.get()
+
+    def on_notification(self, conn, pid, channel, payload):
+        """LISTEN callback'i (pg_listener bağlantısı üzerinden)."""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get('method') == 'ws_publish':
+            if message.get('host_id') != self.host_id:
+                broadcaster.publish(message['topic'], message['message'])
+            return
+        self._queue.put_nowait(message)
+
+    async def publish_ws(self, topic: str, message: str):
+        """Serialize edilmiş WebSocket mesajını diğer instance'lara iletir."""
+        await self._notify({
+            'method': 'ws_publish',
+            'topic': topic,
+            'message': message,
+            'host_id': self.host_id,
+        })
+
+
+fanout_manager: Optional[PostgresPubSubManager] = (
+    PostgresPubSubManager() if FANOUT_MODE == "postgres" else None
+)
+
+
+async def publish_ws(topic: str, payload) -> int:
+    """
+    Bakıcı WebSocket'lerine mesaj gönderir: yerel bağlantılara doğrudan, çoklu
+    instance modunda diğer instance'lara NOTIFY ile. Yerel alıcı sayısını döner.
+    """
+    if fanout_manager is None:
+        return broadcaster.publish_json(topic, payload)
+    message = json.dumps(payload, default=str)
+    delivered = broadcaster.publish(topic, message)
+    await fanout_manager.publish_ws(topic, message)
+    return delivered
+
+
+async def try_acquire_leadership(conn) -> bool:
+    """Oturum seviyesinde advisory lock; bağlantı kapanınca kendiliğinden bırakılır."""
+    return await conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_KEY)
@@ -1,21 +1,27 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import socketio
 import os
 import json
-from typing import Dict, Set
+from typing import Dict
 from shared.database import db
-from app.socket_manager import sio, start_background_tasks, set_vitals_connections
+from shared.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from shared.tracing import tracer
+from app.socket_manager import (
+    SOCKETIO_CONNECTIONS, sio, start_background_tasks, join_initial_rooms, update_subscription
+)
+from app.broadcaster import broadcaster
+from app.export import exporter
+from app.vitals_stream import parse_rate, vitals_coalescer
 from app.routers import auth, measurements, sos, settings
 from app.routers import dashboard as dashboard_router
 from app.routers import patients as patients_router
 from app.routers import caregivers as caregivers_router
 from app.routers import sensor as sensor_router
 
-# WebSocket connection managers (defined early for socket_manager access)
-vitals_connections: Dict[str, Set[WebSocket]] = {}  # patient_id -> connected caregivers
+# WebSocket connection managers (caregiver connections live in app.broadcaster)
 patient_connections: Dict[str, WebSocket] = {}  # patient_id -> patient websocket
 
 # FastAPI App
@@ -28,23 +34,23 @@ fastapi_app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor"],
 )
 
 # Socket.IO - Wrap FastAPI app
 socket_app = socketio.ASGIApp(sio, fastapi_app)
 
-# vitals_connections is now defined at the top of the file
-
 # Database Events
 @fastapi_app.on_event("startup")
 async def startup():
     await db.connect()
+    await exporter.connect()
     await start_background_tasks()
-    # Share vitals_connections with socket_manager for WebSocket broadcasting
-    set_vitals_connections(vitals_connections)
+    vitals_coalescer.start()
 
 @fastapi_app.on_event("shutdown")
 async def shutdown():
+    await exporter.disconnect()
     await db.disconnect()
 
 @fastapi_app.get("/health")
@@ -52,6 +58,16 @@ async def health():
     """Health check endpoint for Docker"""
     return {"status": "healthy"}
 
+@fastapi_app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (bkz. shared/metrics.py)"""
+    return Response(await render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@fastapi_app.get("/debug/traces", include_in_schema=False)
+async def traces(limit: int = 50):
+    """Yavaş ve örneklenmiş pipeline trace'leri, en yenisi önce (bkz. shared/tracing.py)"""
+    return tracer.dump(max(1, min(limit, 1000)))
+
 # Static Files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
@@ -79,50 +95,81 @@ fastapi_app.include_router(sensor_router.router, prefix="/api", tags=["Sensor"])
 # Socket.IO Events
 @sio.event
 async def connect(sid, environ):
-    print(f"Client connected: {sid}")
+    rooms = await join_initial_rooms(sid, environ)
+    SOCKETIO_CONNECTIONS.inc()
+    print(f"Client connected: {sid} (rooms: {', '.join(rooms) or '-'})")
 
 @sio.event
 async def disconnect(sid):
+    SOCKETIO_CONNECTIONS.dec()
     print(f"Client disconnected: {sid}")
 
+@sio.event
+async def subscribe(sid, data):
+    """
+    Belirli hastaların event'lerine abone olur. Payload:
+    {"patient_ids": [...]} ve/veya {"caregiver_id": "..."}; {"all": true} tüm hastalar.
+    """
+    return await update_subscription(sid, data, join=True)
+
+@sio.event
+async def unsubscribe(sid, data):
+    """subscribe ile aynı payload; verilen room'lardan çıkar."""
+    return await update_subscription(sid, data, join=False)
+
 # ============ WEBSOCKET ENDPOINTS (Android Native) ============
 import asyncio
 
+PATIENT_ACK = json.dumps({"type": "ack", "received": True})
+
 
 @fastapi_app.websocket("/ws/vitals/{patient_id}")
 async def websocket_vitals(websocket: WebSocket, patient_id: str):
     """
     Bakıcılar bu endpoint'e bağlanarak hasta vital verilerini dinler.
     Socket.IO'dan gelen events bu bağlantılara forward edilir.
+    
+    Query: ?rate=<Hz> güncelleme hızı, ?encoding=delta yalnızca değişen alanlar
+    (bkz. app/vitals_stream.py).
     """
     await websocket.accept()
     
-    # Add to connections
-    if patient_id not in vitals_connections:
-        vitals_connections[patient_id] = set()
-    vitals_connections[patient_id].add(websocket)
+    # Add to connections (her bağlantının kendi gönderim kuyruğu var)
+    sender = broadcaster.subscribe(patient_id, websocket)
+    sender.rate = parse_rate(websocket.query_params.get("rate"))
+    sender.delta = websocket.query_params.get("encoding") == "delta"
+    
+    # Hastanın son durumu varsa beklemeden gönder
+    snapshot = vitals_coalescer.snapshot(patient_id)
+    if snapshot:
+        sender.offer(snapshot)
+        sender.needs_keyframe = False
     
-    print(f"Caregiver connected to vitals for patient: {patient_id}")
+    print(f"Caregiver connected to vitals for patient: {patient_id} ({sender.rate:g} Hz{', delta' if sender.delta else ''})")
     
     try:
         while True:
             # Keep connection alive, wait for close
             data = await websocket.receive_text()
-            # Echo back or handle commands
-            await websocket.send_text(json.dumps({"type": "ack", "data": data}))
+            # Echo back or handle commands (aynı kuyruktan, sıra korunur)
+            sender.offer(json.dumps({"type": "ack", "data": data}))
     except WebSocketDisconnect:
-        vitals_connections[patient_id].discard(websocket)
         print(f"Caregiver disconnected from vitals for patient: {patient_id}")
+    finally:
+        broadcaster.unsubscribe(patient_id, websocket)
+        vitals_coalescer.prune(patient_id)
 
 
 @fastapi_app.websocket("/ws/patient/{patient_id}")
 async def websocket_patient(websocket: WebSocket, patient_id: str):
     """
     Hastalar bu endpoint'e bağlanarak vital verilerini gönderir.
-    Gelen veriler bakıcılara broadcast edilir.
+    Gelen veriler birleştirilip bakıcılara VITALS_STREAM_HZ hızında iletilir;
+    kritik mesajlar beklemeden iletilir. ?ack=0 ile mesaj başına ack kapatılır.
     """
     await websocket.accept()
     patient_connections[patient_id] = websocket
+    send_ack = websocket.query_params.get("ack") not in ("0", "false")
     
     print(f"Patient connected: {patient_id}")
     
@@ -130,27 +177,17 @@ async def websocket_patient(websocket: WebSocket, patient_id: str):
         while True:
             data = await websocket.receive_text()
             parsed = json.loads(data)
+            if not isinstance(parsed, dict):
+                parsed = {"value": parsed}
             
-            # Broadcast to caregivers watching this patient
-            if patient_id in vitals_connections:
-                for caregiver_ws in vitals_connections[patient_id].copy():
-                    try:
-                        await caregiver_ws.send_text(json.dumps({
-                            "type": "vital_data",
-                            "patient_id": patient_id,
-                            "data": parsed
-                        }))
-                    except Exception:
-                        vitals_connections[patient_id].discard(caregiver_ws)
-            
-            # Also emit via Socket.IO for web clients
-            await sio.emit('vital_data', {
-                "patient_id": patient_id,
-                "data": parsed
-            })
+            # Son duruma birleştir (bakıcılara ve Socket.IO'ya throttle edilerek gider)
+            await vitals_coalescer.push(patient_id, parsed)
             
-            await websocket.send_text(json.dumps({"type": "ack", "received": True}))
+            if send_ack:
+                await websocket.send_text(PATIENT_ACK)
     except WebSocketDisconnect:
         if patient_id in patient_connections:
             del patient_connections[patient_id]
         print(f"Patient disconnected: {patient_id}")
+    finally:
+        vitals_coalescer.patient_disconnected(patient_id)
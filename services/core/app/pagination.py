@@ -0,0 +1,107 @@
+"""
+Keyset (Cursor) Sayfalama
+
+LIMIT/OFFSET yerine (zaman, id) ikilisiyle sayfalar: derin sayfalar da
+(patient_id, <zaman> DESC) index'i üzerinden sabit maliyetle okunur.
+
+Cursor opak bir string'dir (base64: yön|zaman|id). Sayfalar yeniden eskiye
+sıralıdır; "next" daha eski, "prev" daha yeni kayıtlara gider. Cursor'lar
+X-Next-Cursor / X-Prev-Cursor header'larında döner, gövde liste olarak kalır.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+from shared.database import db
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+
+def encode_cursor(direction: str, ts: datetime, row_id: int) -> str:
+    raw = f"{direction}|{ts.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime, int]:
+    """Hatalı cursor için 400 döner."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_keyset_page(
+    response: Response,
+    table: str,
+    columns: str,
+    time_column: str,
+    patient_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    offset: int = 0
+) -> List:
+    """
+    Bir hastanın kayıtlarından bir sayfa okur (yeniden eskiye) ve cursor
+    header'larını response'a yazar. `columns` id ve time_column'u içermelidir.
+    offset yalnızca cursor'sız (eski) istemciler içindir.
+    """
+    args: list = [patient_id]
+    conditions = ["patient_id = $1"]
+    if since:
+        args.append(since)
+        conditions.append(f"{time_column} >= ${len(args)}")
+    if until:
+        args.append(until)
+        conditions.append(f"{time_column} < ${len(args)}")
+
+    direction = "next"
+    if cursor:
+        direction, cursor_ts, cursor_id = decode_cursor(cursor)
+        args += [cursor_ts, cursor_id]
+        op = "<" if direction == "next" else ">"
+        # İlk koşul index'te aralık taraması sağlar, ikincisi aynı zamanlı kayıtları ayırır
+        conditions.append(f"{time_column} {op}= ${len(args) - 1}")
+        conditions.append(f"({time_column}, id) {op} (${len(args) - 1}, ${len(args)})")
+
+    order = "DESC" if direction == "next" else "ASC"
+    args.append(limit + 1)
+    query = f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {time_column} {order}, id {order}
+        LIMIT ${len(args)}
+    """
+    if offset and not cursor:
+        args.append(offset)
+        query += f" OFFSET ${len(args)}"
+
+    rows = await db.fetch_all(query, *args)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    if rows:
+        # Cursor'ın geldiği tarafta her zaman kayıt vardır
+        if direction == "next":
+            has_older, has_newer = has_more, bool(cursor or offset)
+        else:
+            has_older, has_newer = True, has_more
+
+        newest, oldest = rows[0], rows[-1]
+        if has_older:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor("next", oldest[time_column], oldest['id'])
+        if has_newer:
+            response.headers[PREV_CURSOR_HEADER] = encode_cursor("prev", newest[time_column], newest['id'])
+
+    return rows
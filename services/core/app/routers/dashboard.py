@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
+import uuid
+from fastapi import APIRouter, HTTPException, Query
 from shared.database import db
+from shared.settings_cache import settings_cache
 
 router = APIRouter()
 
@@ -67,6 +69,10 @@ async def update_settings(patient_id: str, settings: PatientSettingsUpdate):
     query = f"UPDATE patient_settings SET {', '.join(fields)} WHERE patient_id = ${idx}"
     
     await db.execute(query, *values)
+    
+    # Processor ve diğer Core instance'larının cache'ini geçersiz kıl
+    settings_cache.invalidate(patient_id)
+    await db.execute("SELECT pg_notify('settings_updates', $1)", patient_id)
     return {"success": True, "message": "Settings updated"}
 
 
@@ -109,43 +115,63 @@ async def get_patient_settings(patient_id: str):
         raise HTTPException(status_code=404, detail="Patient settings not found")
 
 
-@router.get("/patients/{patient_id}/status")
-async def get_patient_status(patient_id: str):
-    """Hastanın anlık durumunu getirir (son ölçüm + son alert)."""
-    # Son ölçüm
-    measurement_query = """
-        SELECT heart_rate, inactivity_seconds, status, measured_at
-        FROM measurements
-        WHERE patient_id = $1
-        ORDER BY measured_at DESC
-        LIMIT 1
-    """
-    measurement = await db.fetch_one(measurement_query, patient_id)
-    
-    # Son çözülmemiş alert
-    alert_query = """
-        SELECT id, message, created_at
-        FROM emergency_logs
-        WHERE patient_id = $1 AND is_resolved = FALSE
-        ORDER BY created_at DESC
-        LIMIT 1
-    """
-    alert = await db.fetch_one(alert_query, patient_id)
-    
+def _latest_status(patient_id: str, row) -> dict:
+    """patient_latest satırını status yanıtına çevirir."""
     result = {
         "patient_id": patient_id,
         "last_measurement": None,
         "active_alert": None
     }
-    
-    if measurement:
-        m = dict(measurement)
-        m['measured_at'] = m['measured_at'].isoformat()
-        result['last_measurement'] = m
-    
-    if alert:
-        a = dict(alert)
-        a['created_at'] = a['created_at'].isoformat()
-        result['active_alert'] = a
-    
+    if row and row['measured_at']:
+        result['last_measurement'] = {
+            "heart_rate": row['heart_rate'],
+            "inactivity_seconds": row['inactivity_seconds'],
+            "status": row['status'],
+            "measured_at": row['measured_at'].isoformat()
+        }
+    if row and row['alert_id']:
+        result['active_alert'] = {
+            "id": row['alert_id'],
+            "message": row['alert_message'],
+            "created_at": row['alert_created_at'].isoformat()
+        }
     return result
+
+
+_LATEST_COLUMNS = """
+    patient_id, heart_rate, inactivity_seconds, status, measured_at,
+    alert_id, alert_message, alert_created_at
+"""
+
+# /patients/status?ids=... ile tek istekte sorgulanabilecek en fazla hasta
+MAX_STATUS_IDS = 500
+
+
+@router.get("/patients/status")
+async def get_patients_status(ids: str = Query(..., description="Virgülle ayrılmış hasta UUID'leri")):
+    """Birden fazla hastanın anlık durumu (tek sorgu, patient_latest)."""
+    try:
+        patient_ids = list(dict.fromkeys(str(uuid.UUID(pid.strip())) for pid in ids.split(",") if pid.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated UUIDs")
+    if not patient_ids:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(patient_ids) > MAX_STATUS_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATUS_IDS} ids per request")
+    
+    rows = await db.fetch_all(
+        f"SELECT {_LATEST_COLUMNS} FROM patient_latest WHERE patient_id = ANY($1::uuid[])",
+        patient_ids
+    )
+    by_id = {str(row['patient_id']): row for row in rows}
+    return [_latest_status(pid, by_id.get(pid)) for pid in patient_ids]
+
+
+@router.get("/patients/{patient_id}/status")
+async def get_patient_status(patient_id: str):
+    """Hastanın anlık durumunu getirir (son ölçüm + son alert)."""
+    row = await db.fetch_one(
+        f"SELECT {_LATEST_COLUMNS} FROM patient_latest WHERE patient_id = $1",
+        patient_id
+    )
+    return _latest_status(patient_id, row)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
+from typing import List
 from shared.database import db
 from shared.models import MeasurementCreate
+from shared.settings_cache import settings_cache
 import socketio
 
 router = APIRouter()
@@ -20,7 +22,7 @@ async def create_measurement(data: MeasurementCreate):
     if not db.pool:
          raise HTTPException(status_code=503, detail="Database not ready")
 
-    service = MeasurementService(db.pool)
+    service = MeasurementService(db.pool, settings_cache=settings_cache)
     
     try:
         # For manual measurements, we assume is_fall=False
@@ -37,3 +39,29 @@ async def create_measurement(data: MeasurementCreate):
         raise HTTPException(status_code=500, detail="Failed to record measurement")
 
 
+@router.post("/measurements/bulk")
+async def create_measurements_bulk(data: List[MeasurementCreate]):
+    from shared.measurement_service import MeasurementService
+    
+    if not db.pool:
+         raise HTTPException(status_code=503, detail="Database not ready")
+    if not data:
+        return {"success": True, "statuses": []}
+
+    service = MeasurementService(db.pool, settings_cache=settings_cache)
+    
+    try:
+        results = await service.process_measurements_bulk([
+            {
+                "patient_id": item.patient_id,
+                "heart_rate": item.heart_rate,
+                "inactivity_seconds": item.inactivity_seconds,
+                "is_fall": False
+            }
+            for item in data
+        ])
+        return {"success": True, "statuses": [r['status'] for r in results]}
+
+    except Exception as e:
+        print(f"Error in create_measurements_bulk: {e}")
+        raise HTTPException(status_code=500, detail="Failed to record measurements")
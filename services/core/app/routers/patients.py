@@ -4,8 +4,17 @@ Patients Router
 Hasta bilgileri, ölçümler ve acil durum loglarını getiren endpoint'ler.
 Android uygulaması ile uyumlu API.
 """
-from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from shared.database import db
+from shared.measurement_service import ROLLUP_BUCKETS
+from shared.settings_cache import settings_cache
+from app.ecg_stream import ECG_MAX_RANGE_HOURS, stream_ecg
+from app.export import FORMATS, exporter
+from app.pagination import fetch_keyset_page
 
 router = APIRouter()
 
@@ -43,16 +52,23 @@ async def get_patient(patient_id: str):
 @router.get("/patients/{patient_id}/measurements")
 async def get_patient_measurements(
     patient_id: str,
+    response: Response,
     limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0)
+    cursor: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    offset: int = Query(default=0, ge=0, deprecated=True)
 ):
     """
-    Hasta ölçümlerini sayfalama destekli olarak getirir.
+    Hasta ölçümlerini cursor tabanlı sayfalama ile getirir (yeniden eskiye).
     
     Args:
         patient_id: Hasta UUID
         limit: Sayfa başına kayıt (max 100)
-        offset: Atlama miktarı
+        cursor: Önceki yanıttaki X-Next-Cursor / X-Prev-Cursor değeri
+        since: Bu zamandan sonraki ölçümler (dahil)
+        until: Bu zamandan önceki ölçümler (hariç)
+        offset: Eski istemciler için (cursor verilmezse uygulanır)
     
     Returns:
         List of measurements with:
@@ -61,15 +77,20 @@ async def get_patient_measurements(
         - inactivity_seconds: Hareketsizlik süresi
         - status: NORMAL/WARNING/CRITICAL
         - measured_at: Ölçüm zamanı
+        Header'lar: X-Next-Cursor (daha eski sayfa), X-Prev-Cursor (daha yeni sayfa)
     """
-    query = """
-        SELECT id, heart_rate, inactivity_seconds, status, measured_at
-        FROM measurements
-        WHERE patient_id = $1
-        ORDER BY measured_at DESC
-        LIMIT $2 OFFSET $3
-    """
-    rows = await db.fetch_all(query, patient_id, limit, offset)
+    rows = await fetch_keyset_page(
+        response,
+        table="measurements",
+        columns="id, heart_rate, inactivity_seconds, status, measured_at",
+        time_column="measured_at",
+        patient_id=patient_id,
+        limit=limit,
+        cursor=cursor,
+        since=since,
+        until=until,
+        offset=offset
+    )
     
     result = []
     for row in rows:
@@ -80,19 +101,100 @@ async def get_patient_measurements(
     return result
 
 
+# Tek istekte dönülebilecek en fazla bucket sayısı (ör. 1m bucket ile ~7 gün)
+MAX_HISTORY_BUCKETS = 10000
+
+
+@router.get("/patients/{patient_id}/history")
+async def get_patient_history(
+    patient_id: str,
+    bucket: Literal["1m", "5m", "1h"] = Query(default="5m"),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None)
+):
+    """
+    Grafikler için zaman bucket'larına bölünmüş ölçüm geçmişi.
+    measurement_rollups tablosundan tek sorguyla okunur (ham ölçümler taranmaz).
+    
+    Args:
+        patient_id: Hasta UUID
+        bucket: Bucket boyutu (1m, 5m, 1h)
+        start: Başlangıç (ISO 8601, varsayılan: end - 24 saat)
+        end: Bitiş (ISO 8601, varsayılan: şimdi)
+    
+    Returns:
+        - buckets: Veri olan bucket'lar (zaman sırasıyla), her biri:
+          bucket_start, sample_count, heart_rate_min/avg/max,
+          worst_status, max_inactivity_seconds
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    bucket_seconds = ROLLUP_BUCKETS[bucket]
+    if (end - start).total_seconds() / bucket_seconds > MAX_HISTORY_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time range too large for {bucket} buckets (max {MAX_HISTORY_BUCKETS}), use a larger bucket"
+        )
+    
+    query = """
+        SELECT bucket_start, sample_count, hr_min, hr_max,
+               round(hr_sum::numeric / sample_count, 1) AS hr_avg,
+               worst_status, max_inactivity
+        FROM measurement_rollups
+        WHERE patient_id = $1 AND bucket_seconds = $2
+          AND bucket_start >= to_timestamp(floor(extract(epoch FROM $3::timestamptz) / $2) * $2)
+          AND bucket_start < $4
+        ORDER BY bucket_start
+    """
+    rows = await db.fetch_all(query, patient_id, bucket_seconds, start, end)
+    
+    return {
+        "patient_id": patient_id,
+        "bucket": bucket,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": [
+            {
+                "bucket_start": row['bucket_start'].isoformat(),
+                "sample_count": row['sample_count'],
+                "heart_rate_min": row['hr_min'],
+                "heart_rate_avg": float(row['hr_avg']),
+                "heart_rate_max": row['hr_max'],
+                "worst_status": row['worst_status'],
+                "max_inactivity_seconds": row['max_inactivity']
+            }
+            for row in rows
+        ]
+    }
+
+
 @router.get("/patients/{patient_id}/emergency-logs")
 async def get_patient_emergency_logs(
     patient_id: str,
+    response: Response,
     limit: int = Query(default=20, ge=1, le=100),
-    offset: int = Query(default=0, ge=0)
+    cursor: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    offset: int = Query(default=0, ge=0, deprecated=True)
 ):
     """
-    Hasta acil durum geçmişini getirir.
+    Hasta acil durum geçmişini cursor tabanlı sayfalama ile getirir (yeniden eskiye).
     
     Args:
         patient_id: Hasta UUID
         limit: Sayfa başına kayıt (max 100)
-        offset: Atlama miktarı
+        cursor: Önceki yanıttaki X-Next-Cursor / X-Prev-Cursor değeri
+        since: Bu zamandan sonraki kayıtlar (dahil)
+        until: Bu zamandan önceki kayıtlar (hariç)
+        offset: Eski istemciler için (cursor verilmezse uygulanır)
     
     Returns:
         List of emergency logs with:
@@ -100,15 +202,20 @@ async def get_patient_emergency_logs(
         - message: Acil durum mesajı
         - is_resolved: Çözüldü mü
         - created_at: Oluşturulma zamanı
+        Header'lar: X-Next-Cursor (daha eski sayfa), X-Prev-Cursor (daha yeni sayfa)
     """
-    query = """
-        SELECT id, message, is_resolved, created_at
-        FROM emergency_logs
-        WHERE patient_id = $1
-        ORDER BY created_at DESC
-        LIMIT $2 OFFSET $3
-    """
-    rows = await db.fetch_all(query, patient_id, limit, offset)
+    rows = await fetch_keyset_page(
+        response,
+        table="emergency_logs",
+        columns="id, message, is_resolved, created_at",
+        time_column="created_at",
+        patient_id=patient_id,
+        limit=limit,
+        cursor=cursor,
+        since=since,
+        until=until,
+        offset=offset
+    )
     
     result = []
     for row in rows:
@@ -123,7 +230,6 @@ async def get_patient_emergency_logs(
 # Mobil app uyumlu endpoint'ler: /api/patients/{id}/settings
 
 from pydantic import BaseModel, Field
-from typing import Optional
 
 
 class PatientSettingsUpdate(BaseModel):
@@ -205,6 +311,10 @@ async def update_patient_settings(patient_id: str, settings: PatientSettingsUpda
     if not row:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    # Processor ve diğer Core instance'larının cache'ini geçersiz kıl
+    settings_cache.invalidate(patient_id)
+    await db.execute("SELECT pg_notify('settings_updates', $1)", str(row["patient_id"]))
+    
     return {
         "patient_id": str(row["patient_id"]),
         "bpm_lower_limit": row["bpm_lower_limit"],
@@ -212,3 +322,76 @@ async def update_patient_settings(patient_id: str, settings: PatientSettingsUpda
         "max_inactivity_seconds": row["max_inactivity_seconds"]
     }
 
+
+@router.get("/patients/{patient_id}/ecg")
+async def get_patient_ecg(
+    patient_id: str,
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    max_points: Optional[int] = Query(default=None, ge=100, le=100000)
+):
+    """
+    Bir zaman aralığındaki EKG örneklerini segmentleri birleştirerek akıtır (NDJSON).
+    Satır formatı için bkz. app/ecg_stream.py.
+    
+    Args:
+        patient_id: Hasta UUID
+        start: Başlangıç (ISO 8601, varsayılan: end - 5 dakika)
+        end: Bitiş (ISO 8601, varsayılan: şimdi)
+        max_points: Verilirse örnekler en fazla bu kadar (min, max) çiftine indirilir
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(minutes=5)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > timedelta(hours=ECG_MAX_RANGE_HOURS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time range too large (max {ECG_MAX_RANGE_HOURS:g} hours)"
+        )
+    
+    return StreamingResponse(
+        stream_ecg(patient_id, start, end, max_points),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/patients/{patient_id}/export")
+async def export_patient_history(
+    patient_id: str,
+    dataset: Literal["measurements", "alerts", "ecg"] = Query(default="measurements"),
+    format: Literal["csv", "ndjson", "columnar"] = Query(default="csv"),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None)
+):
+    """
+    Hastanın tüm geçmişini (veya start/end aralığını) dosya olarak akıtır.
+    Sabit bellekle çalışır; formatlar ve eşzamanlılık sınırı için bkz. app/export.py.
+    
+    Args:
+        patient_id: Hasta UUID
+        dataset: measurements, alerts (acil durum logları) veya ecg
+        format: csv, ndjson veya columnar
+        start: Başlangıç (ISO 8601, opsiyonel)
+        end: Bitiş (ISO 8601, opsiyonel)
+    """
+    if end and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    slot = await exporter.acquire()
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        exporter.stream(slot, dataset, format, patient_id, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{patient_id}_{dataset}.{extension}"'},
+        # Akış hiç başlamazsa da hak bırakılır
+        background=BackgroundTask(slot.release)
+    )
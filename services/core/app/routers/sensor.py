@@ -8,6 +8,8 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from shared.database import db
+from shared.ecg_codec import encode_samples
+from app.ecg_stream import ECG_MAX_SEGMENT_MS
 import json
 
 router = APIRouter()
@@ -79,13 +81,24 @@ async def create_ecg_segment(data: ECGSegmentCreate):
         - started_at: Başlangıç zamanı (ISO format)
         - duration_ms: Süre (ms)
         - samples: ECG değerleri array
+    
+    Örnekler delta + varint ile sıkıştırılarak samples_compressed kolonuna yazılır
+    (bkz. shared/ecg_codec.py); geri okumak için GET /api/patients/{id}/ecg.
     """
     if not db.pool:
         raise HTTPException(status_code=503, detail="Database not ready")
+    if data.sample_rate <= 0:
+        raise HTTPException(status_code=422, detail="sample_rate must be positive")
+    if not 0 < data.duration_ms <= ECG_MAX_SEGMENT_MS:
+        raise HTTPException(status_code=422, detail=f"duration_ms must be between 1 and {ECG_MAX_SEGMENT_MS}")
+    try:
+        compressed = encode_samples(data.samples)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     try:
         query = """
-            INSERT INTO ecg_segments (patient_id, sample_rate, started_at, duration_ms, samples)
+            INSERT INTO ecg_segments (patient_id, sample_rate, started_at, duration_ms, samples_compressed)
             VALUES ($1, $2, $3::timestamptz, $4, $5)
             RETURNING id
         """
@@ -95,7 +108,7 @@ async def create_ecg_segment(data: ECGSegmentCreate):
             data.sample_rate,
             data.started_at,
             data.duration_ms,
-            data.samples
+            compressed
         )
         
         return {"success": True, "message": "ECG segment saved", "id": result['id'] if result else None}
@@ -109,7 +122,8 @@ async def get_live_heart_rates(
     limit: int = Query(default=50, ge=1, le=200)
 ):
     """
-    Canlı nabız verilerini v_live_heart_rates view'dan getirir.
+    Canlı nabız verilerini getirir: hasta başına son ölçüm, en yeniden eskiye
+    (v_live_heart_rates -> patient_latest, measurements taranmaz).
     
     Args:
         limit: Maksimum kayıt sayısı
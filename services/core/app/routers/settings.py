@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional
 from shared.database import db
+from shared.settings_cache import settings_cache
 
 router = APIRouter()
 
@@ -89,6 +90,10 @@ async def update_settings(patient_id: str, settings: SettingsUpdate):
     if not row:
         raise HTTPException(status_code=404, detail="Patient not found")
     
+    # Processor ve diğer Core instance'larının cache'ini geçersiz kıl
+    settings_cache.invalidate(patient_id)
+    await db.execute("SELECT pg_notify('settings_updates', $1)", str(row["patient_id"]))
+    
     return {
         "patient_id": str(row["patient_id"]),
         "bpm_lower_limit": row["bpm_lower_limit"],
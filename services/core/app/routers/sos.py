@@ -7,7 +7,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from shared.database import db
-from app.socket_manager import sio
+from shared.patient_latest import set_active_alerts, refresh_active_alert
+from app.socket_manager import sio, patient_rooms
 import json
 
 router = APIRouter()
@@ -55,6 +56,8 @@ async def trigger_sos(request: SOSRequest):
         row = await db.fetch_one(query, request.patient_id, alert_message)
         
         if row:
+            await set_active_alerts(db, [(row['patient_id'], row['id'], row['message'], row['created_at'])])
+            
             alert_data = dict(row)
             alert_data['patient_id'] = str(alert_data['patient_id'])
             alert_data['created_at'] = alert_data['created_at'].isoformat()
@@ -66,8 +69,8 @@ async def trigger_sos(request: SOSRequest):
                 json.dumps(alert_data)
             )
             
-            # Socket.IO ile direkt emit (Core servis içindeyiz)
-            await sio.emit('sos_alert', alert_data)
+            # Socket.IO ile direkt emit (Core servis içindeyiz), yalnızca hastayı izleyenlere
+            await sio.emit('sos_alert', alert_data, room=patient_rooms(alert_data['patient_id']))
             
             return {
                 "success": True, 
@@ -96,13 +99,16 @@ async def resolve_sos(alert_id: int):
             UPDATE emergency_logs 
             SET is_resolved = TRUE 
             WHERE id = $1
-            RETURNING id
+            RETURNING id, patient_id
         """
         result = await db.fetch_one(query, alert_id)
         
         if result:
             # Bildirim gönder
-            await sio.emit('sos_resolved', {"alert_id": alert_id})
+            patient_id = str(result['patient_id'])
+            await refresh_active_alert(db, result['patient_id'])
+            await sio.emit('sos_resolved', {"alert_id": alert_id, "patient_id": patient_id},
+                           room=patient_rooms(patient_id))
             return {"success": True, "message": "Acil durum çözüldü olarak işaretlendi"}
         else:
             raise HTTPException(status_code=404, detail="Alert bulunamadı")
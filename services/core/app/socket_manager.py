@@ -1,91 +1,212 @@
 import socketio
-import asyncpg
-import os
 import json
 import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import List
+from urllib.parse import parse_qs
+from shared.database import connect_listener, db
+from shared.metrics import gauge, histogram
+from shared.settings_cache import settings_cache
+from shared.tracing import span, tracer
+from app.fanout import (
+    FANOUT_CHANNEL, FANOUT_MODE, LEADER_RETRY_INTERVAL,
+    fanout_manager, publish_ws, try_acquire_leadership
+)
 
 # Socket.IO Server - Management UI için
 sio = socketio.AsyncServer(
     async_mode='asgi', 
+    client_manager=fanout_manager,  # None: tek instance (in-process)
     cors_allowed_origins='*',  # Herhangi bir management client için
     ping_timeout=60,
     ping_interval=25
 )
 
-# Database Config
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "secret")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "cdtp_health")
+# Metrikler (GET /metrics)
+SOCKETIO_CONNECTIONS = gauge("socketio_connections", "Connected Socket.IO clients on this instance")
+FANOUT_EMIT_SECONDS = histogram(
+    "fanout_emit_seconds", "Time to fan out one database notification to Socket.IO and WebSockets", ("channel",)
+)
+FANOUT_DELIVERY_LATENCY = histogram(
+    "fanout_delivery_latency_seconds", "Time from measurement insert (measured_at) to fan-out",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Socket.IO room'ları: her hasta için bir room, ayrıca tüm hastaları izleyen
+# dashboard'lar için ortak bir room (bağlanan istemciler varsayılan olarak buna girer)
+ALL_PATIENTS_ROOM = "patients:all"
+
+
+def patient_room(patient_id) -> str:
+    return f"patient:{patient_id}"
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Reference to main.py's vitals_connections (will be set during startup)
-vitals_connections = None
+def patient_rooms(patient_id) -> list:
+    """Bir hastanın event'lerini alması gereken room'lar."""
+    return [patient_room(patient_id), ALL_PATIENTS_ROOM]
+
+
+def _normalize_patient_ids(values) -> List[str]:
+    """Virgüllü string veya liste olarak gelen patient_id'leri doğrular (UUID)."""
+    if isinstance(values, str):
+        values = [values]
+    patient_ids = []
+    for value in values or []:
+        for item in str(value).split(","):
+            item = item.strip()
+            if item:
+                patient_ids.append(str(uuid.UUID(item)))
+    return patient_ids
+
+
+async def caregiver_patient_ids(caregiver_id: str) -> List[str]:
+    """Bakıcının sorumlu olduğu hastalar."""
+    rows = await db.fetch_all(
+        "SELECT patient_id FROM patient_caregiver WHERE caregiver_id = $1",
+        uuid.UUID(str(caregiver_id))
+    )
+    return [str(row['patient_id']) for row in rows]
+
+
+async def resolve_subscription(data: dict) -> List[str]:
+    """
+    Abonelik isteğini room listesine çevirir:
+    - patient_ids: belirli hastalar
+    - caregiver_id: bakıcının hastaları (abonelik anındaki liste)
+    - all: tüm hastalar (eski dashboard davranışı)
+    Hatalı UUID için ValueError fırlatır.
+    """
+    rooms = [patient_room(pid) for pid in _normalize_patient_ids(data.get('patient_ids'))]
+    if data.get('caregiver_id'):
+        rooms += [patient_room(pid) for pid in await caregiver_patient_ids(data['caregiver_id'])]
+    if data.get('all'):
+        rooms.append(ALL_PATIENTS_ROOM)
+    return rooms
+
+
+async def update_subscription(sid: str, data: dict, join: bool = True) -> dict:
+    """subscribe/unsubscribe event'lerinin ortak gövdesi; ack olarak döner."""
+    try:
+        rooms = await resolve_subscription(data or {})
+    except (ValueError, TypeError) as e:
+        return {"success": False, "error": f"Invalid subscription: {e}"}
+    
+    for room in rooms:
+        if join:
+            await sio.enter_room(sid, room)
+        else:
+            await sio.leave_room(sid, room)
+    
+    subscribed = [room for room in sio.rooms(sid) if room != sid]
+    return {"success": True, "rooms": subscribed}
+
+
+async def join_initial_rooms(sid: str, environ: dict) -> List[str]:
+    """
+    Bağlantı query string'ine göre ilk room'ları belirler:
+    ?patients=<id>,<id> / ?caregiver_id=<id> / ?scope=none (sonra subscribe edilir).
+    Hiçbiri verilmezse istemci eski davranışla tüm hastaları dinler.
+    """
+    query = parse_qs(environ.get('QUERY_STRING', ''))
+    data = {
+        "patient_ids": query.get('patients', []),
+        "caregiver_id": (query.get('caregiver_id') or [None])[0],
+    }
+    scope = (query.get('scope') or [None])[0]
+    if not data["patient_ids"] and not data["caregiver_id"] and scope != 'none':
+        data["all"] = True
+    
+    result = await update_subscription(sid, data, join=True)
+    if not result["success"]:
+        print(f"Client {sid}: {result['error']}")
+        return []
+    return result["rooms"]
 
-def set_vitals_connections(connections):
-    """Called from main.py to share the vitals_connections dict"""
-    global vitals_connections
-    vitals_connections = connections
 
 async def on_notification(conn, pid, channel, payload):
     """Callback for PostgreSQL LISTEN notifications"""
     try:
         data = json.loads(payload)
-        print(f"Core received PostgreSQL notification on {channel}: {data}")
+        patient_id = data.get('patient_id')
+        print(f"Core received PostgreSQL notification on {channel} for patient {patient_id}")
         
-        if channel == "measurement_updates":
-            # Emit to Socket.IO clients (web dashboard)
-            await sio.emit('new_measurement', data)
+        # Her bildirim bir "fanout" trace'i: yavaş olanlar adım adım /debug/traces'te görünür
+        with tracer.trace("fanout", channel=channel, patient_id=patient_id) as trace_attrs:
+            with FANOUT_EMIT_SECONDS.time(channel=channel):
+                if channel == "measurement_updates":
+                    # Emit to Socket.IO clients (web dashboard) watching this patient
+                    with span("socketio_emit"):
+                        await sio.emit('new_measurement', data, room=patient_rooms(patient_id))
+                    
+                    # Also broadcast to WebSocket clients (mobile app), serialized once
+                    if patient_id:
+                        with span("ws_publish") as span_attrs:
+                            span_attrs["subscribers"] = await publish_ws(patient_id, {
+                                "type": "vital_data",
+                                "patient_id": patient_id,
+                                "data": data
+                            })
+                                    
+                elif channel == "alert_updates":
+                    with span("socketio_emit"):
+                        await sio.emit('alert', data, room=patient_rooms(patient_id))
             
-            # Also broadcast to WebSocket clients (mobile app)
-            if vitals_connections is not None:
-                patient_id = data.get('patient_id')
-                if patient_id and patient_id in vitals_connections:
-                    import json as json_module
-                    ws_message = json_module.dumps({
-                        "type": "vital_data",
-                        "patient_id": patient_id,
-                        "data": data
-                    })
-                    for ws in list(vitals_connections[patient_id]):
-                        try:
-                            await ws.send_text(ws_message)
-                        except Exception:
-                            vitals_connections[patient_id].discard(ws)
-                            
-        elif channel == "alert_updates":
-            await sio.emit('alert', data)
+            if channel == "measurement_updates" and data.get('measured_at'):
+                measured_at = datetime.fromisoformat(data['measured_at'])
+                delivery_latency = (datetime.now(timezone.utc) - measured_at).total_seconds()
+                FANOUT_DELIVERY_LATENCY.observe(delivery_latency)
+                # DB'de geçen süre (insert -> NOTIFY teslimi) fan-out'tan ayrı görünsün
+                trace_attrs["delivery_latency_ms"] = round(delivery_latency * 1000, 1)
     except Exception as e:
         print(f"Error handling notification: {e}")
 
 async def pg_listener():
     """
-    Background task to subscribe to PostgreSQL LISTEN channels and emit to Socket.IO
+    Background task to subscribe to PostgreSQL LISTEN channels and emit to Socket.IO.
+    CORE_FANOUT_MODE=postgres ise measurement/alert kanallarını yalnızca lider
+    instance dinler, diğerleri event'leri fan-out kanalından alır (bkz. app/fanout.py).
     """
     while True:
+        conn = None
         try:
-            conn = await asyncpg.connect(DATABASE_URL)
+            conn = await connect_listener("cdtp-core")
             print("Socket Manager: Connected to PostgreSQL")
             
-            await conn.add_listener('measurement_updates', on_notification)
-            await conn.add_listener('alert_updates', on_notification)
+            await settings_cache.listen(conn)
+            if fanout_manager is not None:
+                await conn.add_listener(FANOUT_CHANNEL, fanout_manager.on_notification)
             
-            print("Socket Manager: Subscribed to PostgreSQL channels")
-            
-            # Keep connection alive
+            is_leader = False
             while True:
-                await asyncio.sleep(60)
+                if not is_leader and (fanout_manager is None or await try_acquire_leadership(conn)):
+                    await conn.add_listener('measurement_updates', on_notification)
+                    await conn.add_listener('alert_updates', on_notification)
+                    is_leader = True
+                    print(f"Socket Manager: Subscribed to PostgreSQL channels (fan-out mode: {FANOUT_MODE})")
+                
+                # Keep connection alive, reconnect if it dropped
+                await asyncio.sleep(LEADER_RETRY_INTERVAL)
+                if conn.is_closed():
+                    raise ConnectionError("listener connection closed")
                 
         except Exception as e:
+            # Kaçırılan settings_updates bildirimleri olabilir
+            settings_cache.invalidate()
             print(f"Socket Manager: Connection error - {e}, reconnecting in 5s...")
+            if conn is not None and not conn.is_closed():
+                await conn.close()
             await asyncio.sleep(5)
 
 background_tasks = set()
 
 async def start_background_tasks():
     print("Starting background tasks...")
+    if fanout_manager is not None and not sio.manager_initialized:
+        # Normalde ilk istemci bağlantısında başlar; istemcisi olmayan instance'lar da
+        # fan-out kanalını tüketmeli (aksi halde kuyruk birikir)
+        sio.manager_initialized = True
+        sio.manager.initialize()
     task = asyncio.create_task(pg_listener())
     background_tasks.add(task)
     task.add_done_callback(background_tasks.discard)
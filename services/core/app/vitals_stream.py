@@ -0,0 +1,251 @@
+"""
+Canlı Vital Akışı (Coalescing / Throttling)
+
+/ws/patient/{patient_id} üzerinden gelen her mesaj bakıcılara tek tek iletilmez.
+Mesajlar hasta başına "son durum" sözlüğüne birleştirilir ve belirli bir hızda
+(VITALS_STREAM_HZ, varsayılan 4 Hz) dağıtılır. Aradaki ara değerler atlanır,
+bakıcı her zaman en güncel durumu görür.
+
+- Bakıcılar /ws/vitals/{patient_id}?rate=<Hz> ile kendi güncelleme hızlarını
+  seçebilir (VITALS_MIN_HZ..VITALS_MAX_HZ).
+- ?encoding=delta ile yalnızca değişen alanlar gönderilir ("vital_delta");
+  bağlantının ilk mesajı ve her VITALS_KEYFRAME_EVERY mesajda bir tam durum
+  ("vital_data") gönderilir.
+- Kritik mesajlar (düşme, SOS, CRITICAL durum) beklemeden herkese iletilir. Olay
+  alanları (is_fall, critical, type=sos/fall/...) son duruma yazılmaz; aksi halde
+  sonraki her kare ve snapshot eski olayı hâlâ sürüyormuş gibi gösterirdi.
+- Hasta bağlantısı kapanıp bakıcısı da kalmayınca hastanın durumu silinir.
+- Socket.IO 'vital_data' event'i VITALS_STREAM_HZ hızında tam durum gönderir.
+
+Hız ve delta tercihleri hastanın bağlı olduğu instance'taki bakıcılar için
+geçerlidir; CORE_FANOUT_MODE=postgres modunda diğer instance'lara tam durum
+VITALS_STREAM_HZ hızında iletilir.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from app.broadcaster import ConnectionSender, broadcaster
+from app.fanout import fanout_manager, publish_ws
+from app.socket_manager import patient_rooms, sio
+
+VITALS_STREAM_HZ = float(os.getenv("VITALS_STREAM_HZ", "4"))
+VITALS_MIN_HZ = float(os.getenv("VITALS_MIN_HZ", "0.2"))
+VITALS_MAX_HZ = float(os.getenv("VITALS_MAX_HZ", "10"))
+VITALS_KEYFRAME_EVERY = max(1, int(os.getenv("VITALS_KEYFRAME_EVERY", "20")))
+
+CRITICAL_TYPES = {"sos", "fall", "alert", "emergency"}
+
+# Socket.IO ve diğer instance'lar için kullanılan grup anahtarı
+_BROADCAST_GROUP = ("broadcast", VITALS_STREAM_HZ, False)
+
+_MISSING = object()
+
+# Yalnızca o anki mesajı niteleyen alanlar (son duruma birleştirilmez)
+EVENT_KEYS = ("critical", "is_fall")
+
+
+def is_critical(message: dict) -> bool:
+    """Throttle'ı atlaması gereken mesajlar."""
+    return bool(
+        message.get("critical")
+        or message.get("is_fall")
+        or message.get("status") == "CRITICAL"
+        or str(message.get("type", "")).lower() in CRITICAL_TYPES
+    )
+
+
+def parse_rate(value: Optional[str]) -> float:
+    """?rate= değerini izin verilen aralığa sıkıştırır; geçersizse varsayılan hız."""
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return VITALS_STREAM_HZ
+    if rate != rate:  # NaN
+        return VITALS_STREAM_HZ
+    return min(max(rate, VITALS_MIN_HZ), VITALS_MAX_HZ)
+
+
+def state_fields(message: dict) -> dict:
+    """Mesajın son duruma birleştirilecek alanları (olay alanları hariç)."""
+    fields = {key: value for key, value in message.items() if key not in EVENT_KEYS}
+    if str(fields.get("type", "")).lower() in CRITICAL_TYPES:
+        del fields["type"]
+    return fields
+
+
+class _Group:
+    """Aynı hız ve kodlamayı kullanan bakıcılar için gönderim durumu."""
+
+    __slots__ = ("last_sent", "sent_version", "next_due", "seq")
+
+    def __init__(self):
+        self.last_sent: dict = {}
+        self.sent_version = 0
+        self.next_due = 0.0
+        self.seq = 0
+
+
+class VitalsCoalescer:
+    def __init__(self):
+        self._latest: Dict[str, dict] = {}
+        self._version: Dict[str, int] = {}
+        self._pending: Set[str] = set()
+        self._groups: Dict[str, Dict[Tuple, _Group]] = {}
+        # Bağlantısı kapanmış, durumu henüz silinmemiş hastalar
+        self._closed: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def push(self, patient_id: str, message: dict):
+        """Hastadan gelen mesajı son duruma birleştirir; kritikse hemen yayınlar."""
+        self._closed.discard(patient_id)
+        fields = state_fields(message)
+        if fields:
+            state = self._latest.setdefault(patient_id, {})
+            state.update(fields)
+            self._version[patient_id] = self._version.get(patient_id, 0) + 1
+            self._pending.add(patient_id)
+
+        if is_critical(message):
+            await self._send_critical(patient_id, message)
+
+    def patient_disconnected(self, patient_id: str):
+        """Hasta bağlantısı kapandı: bekleyen durum gönderilince ve bakıcı kalmayınca silinir."""
+        self._closed.add(patient_id)
+        self.prune(patient_id)
+
+    def prune(self, patient_id: str):
+        """Bağlantısı kapanmış, gönderilecek durumu ve bakıcısı kalmamış hastayı unutur."""
+        if (patient_id in self._closed and patient_id not in self._pending
+                and not broadcaster.has_subscribers(patient_id)):
+            self._closed.discard(patient_id)
+            self._latest.pop(patient_id, None)
+            self._version.pop(patient_id, None)
+            self._groups.pop(patient_id, None)
+
+    def snapshot(self, patient_id: str) -> Optional[str]:
+        """Yeni bağlanan bakıcı için son tam durum (yoksa None)."""
+        state = self._latest.get(patient_id)
+        if not state:
+            return None
+        return json.dumps({"type": "vital_data", "patient_id": patient_id, "data": state}, default=str)
+
+    async def _send_critical(self, patient_id: str, message: dict):
+        await publish_ws(patient_id, {
+            "type": "vital_data",
+            "patient_id": patient_id,
+            "data": message,
+            "critical": True
+        })
+        await sio.emit('vital_data', {
+            "patient_id": patient_id,
+            "data": message,
+            "critical": True
+        }, room=patient_rooms(patient_id))
+
+    async def _run(self):
+        tick = 1.0 / max(VITALS_MAX_HZ, VITALS_STREAM_HZ)
+        while True:
+            await asyncio.sleep(tick)
+            try:
+                await self.flush(time.monotonic())
+            except Exception as e:
+                print(f"Vitals stream flush error: {e}")
+
+    async def flush(self, now: float):
+        """Zamanı gelen tüm grupları günceller."""
+        for patient_id in list(self._pending):
+            version = self._version.get(patient_id, 0)
+            state = self._latest.get(patient_id)
+            if state is None:
+                self._pending.discard(patient_id)
+                continue
+
+            groups = self._groups.setdefault(patient_id, {})
+            members: Dict[Tuple, list] = {}
+            for sender in broadcaster.senders(patient_id):
+                key = ("ws", sender.rate or VITALS_STREAM_HZ, sender.delta)
+                members.setdefault(key, []).append(sender)
+            # Ayrılan bakıcıların grupları
+            for key in [key for key in groups if key != _BROADCAST_GROUP and key not in members]:
+                del groups[key]
+
+            behind = False
+            for key in [_BROADCAST_GROUP, *members]:
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = _Group()
+                if group.sent_version >= version:
+                    continue
+                if now < group.next_due:
+                    behind = True
+                    continue
+                if state == group.last_sent:
+                    # Gelen mesajlar durumu değiştirmedi
+                    group.sent_version = version
+                    continue
+
+                if key == _BROADCAST_GROUP:
+                    await self._broadcast(patient_id, state)
+                else:
+                    self._send_group(patient_id, state, group, members[key])
+                group.sent_version = version
+                group.last_sent = dict(state)
+                group.next_due = now + 1.0 / key[1]
+
+            if not behind:
+                self._pending.discard(patient_id)
+                self.prune(patient_id)
+
+    async def _broadcast(self, patient_id: str, state: dict):
+        await sio.emit('vital_data', {
+            "patient_id": patient_id,
+            "data": state
+        }, room=patient_rooms(patient_id))
+        if fanout_manager is not None:
+            await fanout_manager.publish_ws(patient_id, json.dumps({
+                "type": "vital_data",
+                "patient_id": patient_id,
+                "data": state
+            }, default=str))
+
+    def _send_group(self, patient_id: str, state: dict, group: _Group, senders: list):
+        full = None
+        delta = None
+        keyframe = group.seq % VITALS_KEYFRAME_EVERY == 0
+        group.seq += 1
+
+        for sender in senders:
+            sender: ConnectionSender
+            if not sender.delta or keyframe or sender.needs_keyframe:
+                if full is None:
+                    full = json.dumps({
+                        "type": "vital_data",
+                        "patient_id": patient_id,
+                        "seq": group.seq,
+                        "data": state
+                    }, default=str)
+                sender.offer(full)
+                sender.needs_keyframe = False
+            else:
+                if delta is None:
+                    changes = {
+                        key: value for key, value in state.items()
+                        if group.last_sent.get(key, _MISSING) != value
+                    }
+                    delta = json.dumps({
+                        "type": "vital_delta",
+                        "patient_id": patient_id,
+                        "seq": group.seq,
+                        "data": changes
+                    }, default=str)
+                sender.offer(delta)
+
+
+vitals_coalescer = VitalsCoalescer()
@@ -1,25 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
+from pydantic import ValidationError
 from app.schemas import RawSensorData
+from shared.sensor_codec import SENSOR_FRAME_CONTENT_TYPE, parse_header, iter_frames
+from shared.sensor_queue import json_record, frame_record, unknown_patients, enqueue_windows
+from shared.database import create_pool
+from shared.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, acquire, counter, histogram, render
+from typing import Any, Dict, List, Optional, Tuple
 import asyncpg
 import json
 import os
+import time
 
-# Database Config
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "secret")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "cdtp_health")
+# Batch Ingest Limits
+BATCH_MAX_ITEMS = int(os.getenv("INGEST_BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_BYTES = int(os.getenv("INGEST_BATCH_MAX_BYTES", str(5 * 1024 * 1024)))
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Metrikler (GET /metrics)
+REQUEST_SECONDS = histogram("ingest_request_seconds", "Ingest request handling time", ("endpoint",))
+WINDOWS = counter("ingest_windows_total", "Sensor windows received", ("format", "result"))
 
 pool = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global pool
-    pool = await asyncpg.create_pool(DATABASE_URL)
+    pool = await create_pool("main", "cdtp-ingestion")
     print("Ingestion Service: Database connected")
     yield
     await pool.close()
@@ -36,24 +45,218 @@ async def health():
     """Health check endpoint for Docker"""
     return {"status": "healthy"}
 
-@app.post("/api/v1/ingest")
-async def ingest_data(data: RawSensorData):
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (bkz. shared/metrics.py)"""
+    return Response(await render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.middleware("http")
+async def time_ingest_requests(request: Request, call_next):
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    started = time.perf_counter()
     try:
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO sensor_data_queue (patient_id, accelerometer, gyroscope, ppg_raw, timestamp)
-                VALUES ($1, $2, $3, $4, $5)
-            """, 
-                data.patient_id, 
-                json.dumps(data.accelerometer), 
-                json.dumps(data.gyroscope), 
-                data.ppg_raw, 
-                data.timestamp
-            )
+        return await call_next(request)
+    finally:
+        # Route şablonu: bilinmeyen path'ler ayrı seri oluşturmasın
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=route.path if route else "unmatched")
+
+@app.post(
+    "/api/v1/ingest",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": RawSensorData.model_json_schema()},
+                SENSOR_FRAME_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+)
+async def ingest_data(request: Request):
+    """
+    Tek bir sensör penceresini kuyruğa ekler.
+    
+    Content-Type:
+        - application/json: RawSensorData
+        - application/x-cdtp-sensor: Binary frame (bkz. shared/sensor_codec.py),
+          parse edilmeden sensor_data_queue.packed kolonuna yazılır
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    
+    if content_type == SENSOR_FRAME_CONTENT_TYPE:
+        try:
+            header = parse_header(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor frame: {e}")
+        query = """
+            INSERT INTO sensor_data_queue (patient_id, packed, timestamp)
+            VALUES ($1, $2, $3)
+        """
+        args = (header.patient_id, body, header.timestamp)
+        frame_format = "binary"
+    else:
+        try:
+            data = RawSensorData.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        query = """
+            INSERT INTO sensor_data_queue (patient_id, accelerometer, gyroscope, ppg_raw, timestamp)
+            VALUES ($1, $2, $3, $4, $5)
+        """
+        args = (
+            data.patient_id, 
+            json.dumps(data.accelerometer), 
+            json.dumps(data.gyroscope), 
+            data.ppg_raw, 
+            data.timestamp
+        )
+        frame_format = "json"
+    
+    try:
+        async with acquire(pool) as conn:
+            await conn.execute(query, *args)
+        WINDOWS.inc(format=frame_format, result="accepted")
         return {"success": True, "message": "Data queued"}
+    except asyncpg.PostgresError as e:
+        print(f"Database Error: {e}")
+        WINDOWS.inc(format=frame_format, result="error")
+        raise HTTPException(status_code=503, detail="Service Unavailable (Database)")
+    except Exception as e:
+        print(f"Error: {e}")
+        WINDOWS.inc(format=frame_format, result="error")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+async def read_body_limited(request: Request, max_bytes: int) -> bytes:
+    """İstek gövdesini okur; max_bytes aşılırsa 413 döner (Content-Length'e güvenmeden)."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+    
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_batch(content_type: str, body: bytes) -> List[Tuple[Optional[tuple], Optional[str]]]:
+    """
+    Batch gövdesini pencerelere ayırır ve her birini ayrı doğrular.
+    
+    Returns:
+        [(copy_record, None) | (None, hata_mesajı), ...] girdi sırasıyla
+    """
+    items = []
+    
+    if content_type == SENSOR_FRAME_CONTENT_TYPE:
+        # Art arda eklenmiş binary frame'ler
+        view = memoryview(body)
+        try:
+            for offset, header in iter_frames(view):
+                items.append((frame_record(bytes(view[offset:offset + header.size]), header), None))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor frame at item {len(items)}: {e}")
+        return items
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        raw_items = [line for line in body.splitlines() if line.strip()]
+    else:
+        try:
+            raw_items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=400, detail="Batch body must be a JSON array")
+    
+    for raw in raw_items:
+        try:
+            if isinstance(raw, (bytes, str)):
+                data = RawSensorData.model_validate_json(raw)
+            else:
+                data = RawSensorData.model_validate(raw)
+            items.append((json_record(data.patient_id, data.timestamp, data.accelerometer, data.gyroscope, data.ppg_raw), None))
+        except ValidationError as e:
+            items.append((None, "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())))
+        except ValueError as e:
+            items.append((None, f"Invalid patient_id: {e}"))
+    
+    return items
+
+
+@app.post(
+    "/api/v1/ingest/batch",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": RawSensorData.model_json_schema()}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                SENSOR_FRAME_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+)
+async def ingest_batch(request: Request):
+    """
+    Çok sayıda sensör penceresini tek istekte kuyruğa ekler (ör. çevrimdışı
+    biriktirilmiş veriler). Geçerli pencereler tek bir COPY ile yazılır.
+    
+    Content-Type:
+        - application/json: RawSensorData listesi
+        - application/x-ndjson: Satır başına bir RawSensorData
+        - application/x-cdtp-sensor: Art arda eklenmiş binary frame'ler
+    
+    Limitler: INGEST_BATCH_MAX_ITEMS pencere, INGEST_BATCH_MAX_BYTES bayt (aşılırsa 413).
+    
+    Returns:
+        - accepted / rejected: Sayılar
+        - results: [{"index", "success", "error"}] girdi sırasıyla
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await read_body_limited(request, BATCH_MAX_BYTES)
+    items = parse_batch(content_type, body)
+    
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    errors: Dict[int, str] = {i: error for i, (_, error) in enumerate(items) if error}
+    valid = [(i, record) for i, (record, _) in enumerate(items) if record is not None]
+    
+    frame_format = "binary" if content_type == SENSOR_FRAME_CONTENT_TYPE else "json"
+    try:
+        if valid:
+            async with acquire(pool) as conn:
+                # Bilinmeyen hastalar FK yüzünden tüm COPY'yi düşürmesin
+                unknown = await unknown_patients(conn, [record for _, record in valid])
+                for i, record in valid:
+                    if record[0] in unknown:
+                        errors[i] = "Unknown patient_id"
+                await enqueue_windows(conn, [record for i, record in valid if i not in errors])
     except asyncpg.PostgresError as e:
         print(f"Database Error: {e}")
         raise HTTPException(status_code=503, detail="Service Unavailable (Database)")
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+    
+    WINDOWS.inc(len(items) - len(errors), format=frame_format, result="accepted")
+    if errors:
+        WINDOWS.inc(len(errors), format=frame_format, result="rejected")
+    
+    results: List[Dict[str, Any]] = [
+        {"index": i, "success": i not in errors, "error": errors.get(i)}
+        for i in range(len(items))
+    ]
+    return {
+        "success": not errors,
+        "accepted": len(items) - len(errors),
+        "rejected": len(errors),
+        "results": results
+    }
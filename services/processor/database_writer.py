@@ -1,17 +1,15 @@
-import asyncpg
-import os
 import json
 from datetime import datetime
+from shared.database import create_pool
 
 class DatabaseWriter:
     def __init__(self):
-        self.db_url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
         self.pool = None
 
     async def connect(self):
         if not self.pool:
             try:
-                self.pool = await asyncpg.create_pool(self.db_url)
+                self.pool = await create_pool("writer", "cdtp-processor-writer")
                 print("DB Writer Connected")
             except Exception as e:
                 print(f"DB Connection Failed: {e}")
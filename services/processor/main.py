@@ -6,99 +6,279 @@ Sensör verilerini kuyruktan alır, algoritmaları çalıştırır ve sonuçlar
 import asyncio
 import asyncpg
 import json
+import multiprocessing
 import os
-from datetime import datetime, timezone
-from algorithms import detect_fall, calculate_bpm, check_inactivity
+import signal
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from vectorized import (
+    accelerometer_arrays, stack_accelerometer, resolve_inactivity,
+    detect_fall_batch, calculate_bpm_batch, detect_motion_batch
+)
+from shared.database import connect_listener, create_pool
+from shared.metrics import acquire, counter, histogram, serve_metrics, track_queue
+from shared.sensor_codec import parse_header
+from shared.settings_cache import settings_cache
+from shared.tracing import discard, record_stage, stage, tracer
+from state_store import PatientStateStore
+from retention import run_partition_maintenance
+from sharding import WORKERS, Shard, local_shards
 
-# Database Config
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "secret")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "cdtp_health")
+# Batch Config
+# BATCH_SIZE: Tek transaction'da kuyruktan alınacak maksimum satır sayısı (1 = eski tek-paket modu)
+# BATCH_MAX_WAIT: Batch dolmadığında sensor_queue bildirimi gelmezse tekrar kuyruğa bakmadan
+#                 önce beklenecek maksimum süre (saniye). Bildirimler dinlenirken yalnızca yedek poll'dur.
+BATCH_SIZE = max(1, int(os.getenv("PROCESSOR_BATCH_SIZE", "50")))
+BATCH_MAX_WAIT = float(os.getenv("PROCESSOR_BATCH_MAX_WAIT", "5"))
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# LISTEN bağlantısı yokken kullanılan poll aralığı (saniye)
+DISCONNECTED_POLL_INTERVAL = 0.5
 
+# Ölçüm zamanı cihaz timestamp'idir (geç işlenen / offline pencereler kendi zamanlarını korur).
+# Kuyruğa girişten (created_at) sonrasına ya da bu kadar saat öncesine düşen cihaz saati
+# güvenilmez sayılır ve created_at kullanılır.
+MAX_BACKDATE = timedelta(hours=float(os.getenv("PROCESSOR_MAX_BACKDATE_HOURS", "24")))
 
-async def process_data(pool: asyncpg.Pool):
-    """Ana veri işleme döngüsü. Pool dışarıdan geçilir."""
+# /metrics portu (0 = kapalı). Birden fazla worker varsa her biri port + sırasını kullanır
+METRICS_PORT = int(os.getenv("PROCESSOR_METRICS_PORT", "9100"))
+
+WINDOWS_PROCESSED = counter("processor_windows_total", "Queue rows processed")
+MALFORMED_ROWS = counter("processor_malformed_rows_total", "Queue rows skipped because they could not be decoded")
+BATCH_ROWS = histogram(
+    "processor_batch_rows", "Rows claimed per batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+PIPELINE_LATENCY = histogram(
+    "pipeline_latency_seconds", "Time from queue insert to committed measurement",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+# sensor_data_queue'ya yeni satır eklendiğinde (trg_notify_sensor_queue) set edilir
+queue_wakeup = asyncio.Event()
+listener_connected = False
+
+
+def decode_row(row) -> Tuple[np.ndarray, np.ndarray]:
+    """Kuyruk satırındaki pencereyi (3, n) ivmeölçer ve PPG dizilerine çevirir."""
+    if row['packed'] is not None:
+        # Binary frame: bytea üzerinde kopyasız view, float64'e tek seferde çevrilir
+        packed = row['packed']
+        header = parse_header(packed)
+        sections = header.sections()
+        acc = np.empty((3, header.n_acc), dtype=np.float64)
+        for i, axis in enumerate(('x', 'y', 'z')):
+            offset, count = sections[f"acc_{axis}"]
+            acc[i] = np.frombuffer(packed, dtype='<f4', count=count, offset=offset)
+        ppg_offset, ppg_count = sections["ppg"]
+        return acc, np.frombuffer(packed, dtype='<i4', count=ppg_count, offset=ppg_offset)
+    
+    # Parse JSONB data (array format)
+    acc = json.loads(row['accelerometer']) if isinstance(row['accelerometer'], str) else row['accelerometer']
+    return accelerometer_arrays(acc), np.asarray(row['ppg_raw'], dtype=np.int64)
+
+
+def measured_at_for(row) -> datetime:
+    """Kuyruk satırının ölçüm zamanı: makul aralıktaysa cihaz zamanı, değilse created_at."""
+    created_at = row['created_at']
+    try:
+        device_time = datetime.fromtimestamp(row['timestamp'], tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return created_at
+    if created_at - MAX_BACKDATE <= device_time <= created_at:
+        return device_time
+    return created_at
+
+
+def analyze_windows(windows: List[Tuple[np.ndarray, np.ndarray]]) -> List[Dict[str, Any]]:
+    """
+    Algoritmaları tüm batch üzerinde çalıştırır (DB erişimi yok). Aynı uzunluktaki
+    pencereler 2-D yığın halinde tek vektörize çağrıyla değerlendirilir.
+    
+    Returns (girdi sırasıyla):
+        [{"is_fall", "fall_type", "bpm", "is_moving", "samples"}, ...]
+    """
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for i, (acc, ppg) in enumerate(windows):
+        groups.setdefault((acc.shape[1], len(ppg)), []).append(i)
+    
+    results: List[Dict[str, Any]] = [None] * len(windows)
+    for (acc_length, ppg_length), indices in groups.items():
+        x, y, z = stack_accelerometer([windows[i][0] for i in indices])
+        ppg = np.stack([windows[i][1] for i in indices]).reshape(len(indices), ppg_length)
+        
+        # Düşme algılama (3-aşamalı), kalp atışı ve hareket tespiti
+        is_fall, fall_type = detect_fall_batch(x, y, z)
+        bpm = calculate_bpm_batch(ppg)
+        is_moving = detect_motion_batch(x, y, z)
+        
+        for j, i in enumerate(indices):
+            results[i] = {
+                "is_fall": bool(is_fall[j]),
+                "fall_type": str(fall_type[j]),
+                "bpm": int(bpm[j]),
+                "is_moving": bool(is_moving[j]),
+                "samples": acc_length
+            }
+    return results
+
+
+async def process_batch(conn: asyncpg.Connection, service, state_store: PatientStateStore, rows) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Kuyruktan alınmış bir batch'i tek transaction içinde işler.
+    
+    1. Son hareket zamanlarını bellekteki durum deposundan okur
+    2. Algoritmaları tüm batch üzerinde çalıştırır (aynı hastanın paketleri sırayla)
+    3. Ölçümleri ve processed bayraklarını yazar
+    
+    Returns:
+        (results, moved): moved = {patient_id: son hareket timestamp'i}. Durum deposu
+        yalnızca transaction commit edildikten sonra bununla güncellenmelidir.
+    """
+    last_movement = {}
+    for patient_id in {row['patient_id'] for row in rows}:
+        last_movement_at = state_store.get_last_movement(patient_id)
+        if last_movement_at:
+            last_movement[patient_id] = last_movement_at.timestamp()
+    
+    # 1. Run Algorithms over the whole batch
+    with stage("algorithms", rows=len(rows)) as span:
+        decoded = []
+        for row in rows:
+            try:
+                decoded.append((row, decode_row(row)))
+            except Exception as e:
+                # Bozuk paket tüm batch'i kilitlemesin: atla ve processed olarak işaretle
+                MALFORMED_ROWS.inc()
+                print(f"Skipping malformed queue row {row['id']}: {e}")
+        
+        analyses = analyze_windows([window for _, window in decoded])
+        
+        # Hareketsizlik sırayla çözülür: aynı batch'teki sonraki paketler güncel hareket zamanını görmeli
+        analyzed = []
+        moved = {}
+        for (row, _), analysis in zip(decoded, analyses):
+            patient_id = row['patient_id']
+            analysis['inactivity'] = resolve_inactivity(
+                analysis['is_moving'],
+                analysis['samples'],
+                row['timestamp'],
+                last_movement.get(patient_id)
+            )
+            
+            if analysis['is_fall']:
+                print(f"⚠️ DÜŞME TESPİT EDİLDİ! Hasta: {patient_id}, Tip: {analysis['fall_type']}")
+            
+            if analysis['is_moving']:
+                last_movement[patient_id] = row['timestamp']
+                moved[patient_id] = row['timestamp']
+            
+            analyzed.append((row, analysis))
+        
+        span["malformed"] = len(rows) - len(decoded)
+        span["falls"] = sum(1 for _, analysis in analyzed if analysis['is_fall'])
+    
+    # 2. Process Measurements in bulk (Evaluate -> Save -> Notify -> Alert)
+    results = await service.process_measurements_bulk(
+        [
+            {
+                "patient_id": row['patient_id'],
+                "heart_rate": analysis['bpm'],
+                "inactivity_seconds": analysis['inactivity'],
+                "is_fall": analysis['is_fall'],
+                "measured_at": measured_at_for(row)
+            }
+            for row, analysis in analyzed
+        ],
+        conn=conn
+    )
+    
+    # 3. Mark whole batch as processed
+    with stage("mark_processed", rows=len(rows)):
+        await conn.execute(
+            "UPDATE sensor_data_queue SET processed = TRUE WHERE id = ANY($1::bigint[])",
+            [row['id'] for row in rows]
+        )
+    
+    return results, moved
+
+
+async def wait_for_queue():
+    """
+    Kuyruğa yeni veri geldiği bildirilene kadar bekler. Bildirim kaçsa bile
+    BATCH_MAX_WAIT sonra (LISTEN bağlantısı yoksa daha sık) tekrar poll edilir.
+    """
+    timeout = BATCH_MAX_WAIT if listener_connected else min(BATCH_MAX_WAIT, DISCONNECTED_POLL_INTERVAL)
+    try:
+        await asyncio.wait_for(queue_wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def process_data(pool: asyncpg.Pool, state_store: PatientStateStore, shard: Shard):
+    """Ana veri işleme döngüsü. Yalnızca bu worker'ın shard'ındaki hastaları işler."""
     from shared.measurement_service import MeasurementService
-    service = MeasurementService(pool)
+    service = MeasurementService(pool, settings_cache=settings_cache)
     
-    print("Processor Service Ready. Waiting for data...")
+    claim_query = f"""
+        SELECT * FROM sensor_data_queue 
+        WHERE processed = FALSE 
+        AND {shard.predicate()}
+        ORDER BY created_at, id
+        LIMIT $1 
+        FOR UPDATE SKIP LOCKED
+    """
+    
+    print(f"Processor Service Ready [shard {shard}]. Waiting for data... (batch size: {BATCH_SIZE}, max wait: {BATCH_MAX_WAIT}s)")
     
     while True:
         try:
-            async with pool.acquire() as conn:
-                async with conn.transaction():
-                    # 1. Fetch next unprocessed item safely
-                    row = await conn.fetchrow("""
-                        SELECT * FROM sensor_data_queue 
-                        WHERE processed = FALSE 
-                        ORDER BY created_at 
-                        LIMIT 1 
-                        FOR UPDATE SKIP LOCKED
-                    """)
+            results, moved = [], {}
+            # Claim'den önce temizle: işlem sırasında gelen bildirim bir sonraki beklemeyi atlatır
+            queue_wakeup.clear()
+            # Her batch bir trace: adımlar (dequeue, algoritmalar, DB yazımı, notify...) span olarak kaydedilir
+            with tracer.trace("processor_batch", shard=str(shard)) as trace_attrs:
+                async with acquire(pool) as conn:
+                    async with conn.transaction():
+                        # 1. Claim next batch of unprocessed items safely
+                        with stage("dequeue") as span:
+                            rows = await conn.fetch(claim_query, BATCH_SIZE)
+                            span["rows"] = len(rows)
+                    
+                        if rows:
+                            results, moved = await process_batch(conn, service, state_store, rows)
+                            commit_started = time.perf_counter()
                 
-                    if row:
-                        patient_id = row['patient_id']
-                        timestamp = row['timestamp']
-                        
-                        # Parse JSONB data (array format)
-                        acc = json.loads(row['accelerometer']) if isinstance(row['accelerometer'], str) else row['accelerometer']
-                        ppg = row['ppg_raw']
-                        
-                        # 2. Get previous state for inactivity calculation
-                        last_movement_at_dt = await service.get_patient_state(patient_id, conn=conn)
-                        last_movement_ts = last_movement_at_dt.timestamp() if last_movement_at_dt else None
-                        
-                        # 3. Run Algorithms (Updated for array format)
-                        
-                        # Düşme algılama (3-aşamalı)
-                        is_fall, fall_type = detect_fall(acc)
-                        if is_fall:
-                            print(f"⚠️ DÜŞME TESPİT EDİLDİ! Hasta: {patient_id}, Tip: {fall_type}")
-                        
-                        # Kalp atışı hesaplama
-                        bpm = calculate_bpm(ppg)
-                        
-                        # Hareketsizlik kontrolü
-                        inactivity, is_moving = check_inactivity(
-                            acc, 
-                            timestamp, 
-                            last_movement_ts
-                        )
-                        
-                        # 4. Update State if moved
-                        if is_moving:
-                            await service.update_patient_state(
-                                patient_id, 
-                                datetime.fromtimestamp(timestamp, tz=timezone.utc), 
-                                conn=conn
-                            )
-                        
-                        # 5. Process Measurement (Evaluate -> Save -> Notify -> Alert)
-                        result = await service.process_measurement(
-                            patient_id, 
-                            bpm, 
-                            inactivity, 
-                            is_fall,
-                            conn=conn
-                        )
-                        
-                        # 6. Mark as processed
-                        await conn.execute(
-                            "UPDATE sensor_data_queue SET processed = TRUE WHERE id = $1", 
-                            row['id']
-                        )
-                            
-                        status_emoji = "🟢" if result['status'] == "NORMAL" else "🟡" if result['status'] == "WARNING" else "🔴"
-                        print(f"{status_emoji} Processed: {patient_id} | BPM: {bpm} | Status: {result['status']}")
-                    else:
-                        pass
-
-            if not row:
-                await asyncio.sleep(0.5)
+                if rows:
+                    record_stage("commit", time.perf_counter() - commit_started)
+                    BATCH_ROWS.observe(len(rows))
+                    WINDOWS_PROCESSED.inc(len(rows))
+                    now = datetime.now(timezone.utc)
+                    for row in rows:
+                        PIPELINE_LATENCY.observe((now - row['created_at']).total_seconds())
+                    trace_attrs["rows"] = len(rows)
+                    trace_attrs["patients"] = len({row['patient_id'] for row in rows})
+                    # Kuyrukta bekleme: trace'in kendi süresinden önceki gecikme
+                    trace_attrs["queue_wait_ms"] = round(
+                        max((now - row['created_at']).total_seconds() for row in rows) * 1000, 1
+                    )
+                else:
+                    # Boş poll'lar trace tamponunu doldurmasın
+                    discard()
+            
+            # 2. Update in-memory state after commit (flushed to patient_states periodically)
+            for patient_id, timestamp in moved.items():
+                state_store.mark_moved(patient_id, datetime.fromtimestamp(timestamp, tz=timezone.utc))
+            
+            for result in results:
+                status_emoji = "🟢" if result['status'] == "NORMAL" else "🟡" if result['status'] == "WARNING" else "🔴"
+                print(f"{status_emoji} Processed: {result['patient_id']} | BPM: {result['heart_rate']} | Status: {result['status']}")
+            
+            # Batch dolmadıysa kuyruk boşalmış demektir: yeni veri bildirimini bekle
+            if len(rows) < BATCH_SIZE:
+                await wait_for_queue()
                     
         except Exception as e:
             print(f"Error processing data: {e}")
@@ -107,25 +287,26 @@ async def process_data(pool: asyncpg.Pool):
             await asyncio.sleep(1)
 
 
-async def check_inactivity_periodic(pool: asyncpg.Pool):
+async def check_inactivity_periodic(pool: asyncpg.Pool, shard: Shard):
     """
     Periyodik hareketsizlik kontrolü.
-    Her 30 saniyede bir tüm hastaları kontrol eder.
+    Her 30 saniyede bir bu shard'daki tüm hastaları kontrol eder.
     """
     from shared.measurement_service import MeasurementService
-    service = MeasurementService(pool)
+    service = MeasurementService(pool, settings_cache=settings_cache)
     
     while True:
         try:
             await asyncio.sleep(30)  # 30 saniyede bir kontrol
             
-            async with pool.acquire() as conn:
+            async with acquire(pool) as conn:
                 # Aktif hastaların son hareket zamanlarını al
-                rows = await conn.fetch("""
+                rows = await conn.fetch(f"""
                     SELECT ps.patient_id, ps.last_movement_at, pset.max_inactivity_seconds
                     FROM patient_states ps
                     JOIN patient_settings pset ON ps.patient_id = pset.patient_id
                     WHERE ps.last_movement_at IS NOT NULL
+                    AND {shard.predicate('ps.patient_id')}
                 """)
                 
                 now = datetime.now(timezone.utc)
@@ -164,17 +345,138 @@ async def check_inactivity_periodic(pool: asyncpg.Pool):
             await asyncio.sleep(5)
 
 
-async def main():
-    print("Processor Service Starting...")
-    pool = await asyncpg.create_pool(DATABASE_URL)
+async def dump_traces() -> Tuple[str, str]:
+    """Metrics portundaki GET /debug/traces: yavaş ve örneklenmiş trace'ler (bkz. shared/tracing.py)."""
+    return "application/json", tracer.dump_json()
+
+
+def on_queue_notification(conn, pid, channel, payload):
+    """sensor_queue bildirimi: bekleyen işleme döngüsünü uyandırır."""
+    queue_wakeup.set()
+
+
+async def notification_listener():
+    """
+    Tek bir LISTEN bağlantısı üzerinden:
+    - sensor_queue: Kuyruğa yeni veri eklendi -> işleme döngüsünü uyandır
+    - settings_updates: patient_settings değişti -> ayar cache'ini geçersiz kıl
+    Bağlantı koparsa yeniden bağlanır.
+    """
+    global listener_connected
+    
+    while True:
+        conn = None
+        try:
+            conn = await connect_listener("cdtp-processor")
+            await conn.add_listener('sensor_queue', on_queue_notification)
+            await settings_cache.listen(conn)
+            listener_connected = True
+            # Dinlemeye başlamadan önce gelen veriyi kaçırmamak için bir kez uyandır
+            queue_wakeup.set()
+            print("Processor Service: Listening for queue and settings notifications")
+            
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+            print("Processor Service: Listener connection lost, reconnecting...")
+                
+        except Exception as e:
+            print(f"Notification listener error: {e}, reconnecting in 5s...")
+            await asyncio.sleep(5)
+        finally:
+            listener_connected = False
+            # Dinlenmeyen süre boyunca bildirim kaçabilir: cache'e güvenme
+            settings_cache.invalidate()
+            if conn and not conn.is_closed():
+                await conn.close()
+
+
+async def main(shard: Shard):
+    print(f"Processor Service Starting [shard {shard}]...")
+    pool = await create_pool("main", "cdtp-processor")
     print("Processor Service: Database connected")
     
-    # Her iki task'ı da aynı pool ile çalıştır
-    await asyncio.gather(
-        process_data(pool),
-        check_inactivity_periodic(pool)
-    )
+    # Kuyruk derinliği tüm shard'lar için aynıdır: yalnızca ilk shard sorgular
+    if shard.index == 0:
+        track_queue(pool)
+    if METRICS_PORT:
+        # Her worker kendi portunda (container içindeki sırasına göre)
+        port = METRICS_PORT + shard.index % WORKERS
+        await serve_metrics(port, routes={"/debug/traces": dump_traces})
+        print(f"Processor Service: Metrics on :{port}/metrics, traces on :{port}/debug/traces")
+    
+    # SIGTERM (docker stop) geldiğinde task'ları iptal et ki durumlar flush edilsin
+    main_task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    
+    # Son hareket zamanları bellekte tutulur, periyodik olarak DB'ye yazılır
+    state_store = PatientStateStore()
+    await state_store.load(pool, shard)
+    
+    # Tüm task'ları aynı pool ile çalıştır
+    tasks = [
+        process_data(pool, state_store, shard),
+        check_inactivity_periodic(pool, shard),
+        notification_listener(),
+        state_store.run_flusher(pool)
+    ]
+    # Partition bakımını (kuyruk, ölçümler) yalnızca ilk shard yapar
+    if shard.index == 0:
+        tasks.append(run_partition_maintenance(pool))
+    
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Kapanışta bekleyen durumları kaybetme
+        await state_store.flush(pool)
+        await pool.close()
+
+
+def run_worker(shard: Shard):
+    """Worker process giriş noktası."""
+    try:
+        asyncio.run(main(shard))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+def run_workers(shards: List[Shard]):
+    """
+    Her shard için ayrı bir worker process başlatır (CPU-bound algoritmalar
+    tüm çekirdekleri kullanır) ve ölen worker'ları yeniden başlatır.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    processes: Dict[Shard, multiprocessing.Process] = {}
+    
+    def start(shard: Shard):
+        process = ctx.Process(target=run_worker, args=(shard,), name=f"processor-{shard.index}")
+        process.start()
+        processes[shard] = process
+    
+    def stop(*_):
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: worker flush edip kapanır
+        for process in processes.values():
+            process.join(timeout=10)
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    for shard in shards:
+        start(shard)
+    
+    while True:
+        time.sleep(1)
+        for shard, process in list(processes.items()):
+            if not process.is_alive():
+                print(f"Worker {process.name} exited (code {process.exitcode}), restarting...")
+                start(shard)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    shards = local_shards()
+    if len(shards) == 1:
+        run_worker(shards[0])
+    else:
+        run_workers(shards)
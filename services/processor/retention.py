@@ -0,0 +1,85 @@
+"""
+Partition Bakımı ve Saklama (Retention)
+
+Zaman bazlı partition'lanan tablolar (bkz. sql/schema.sql):
+
+- sensor_data_queue: created_at'e göre günlük. İşlenen satırlar silinmek yerine
+  partition'ı ile birlikte toplu halde düşürülür: DELETE/VACUUM yükü oluşmaz,
+  idx_queue_unprocessed ve kuyruk taramaları sabit boyutta kalır. İçinde hâlâ
+  işlenmemiş satır olan partition'lar düşürülmez.
+- measurements: measured_at'e göre aylık. Varsayılan olarak süresiz saklanır;
+  MEASUREMENTS_RETENTION_MONTHS verilirse süresi dolan partition'lar arşiv için
+  ayrılır (DETACH), MEASUREMENTS_DROP_EXPIRED=true ise silinir.
+
+Bakım yalnızca ilk shard'da (bkz. sharding.py) çalışır; ileri tarihli
+partition'ları önceden oluşturur ve saklama süresi dolanları kaldırır.
+"""
+import asyncio
+import os
+
+import asyncpg
+
+from shared.metrics import acquire
+from shared.partitions import PartitionSpec, drop_expired_partitions, ensure_partitions
+
+# İşlenmiş kuyruk verisinin saklanacağı gün sayısı (bugün hariç)
+QUEUE_RETENTION_DAYS = int(os.getenv("QUEUE_RETENTION_DAYS", "2"))
+# Önceden oluşturulacak günlük partition sayısı
+QUEUE_PREMAKE_DAYS = int(os.getenv("QUEUE_PREMAKE_DAYS", "3"))
+# Ölçümler: önceden oluşturulacak aylık partition sayısı ve saklama süresi (0 = süresiz)
+MEASUREMENTS_PREMAKE_MONTHS = int(os.getenv("MEASUREMENTS_PREMAKE_MONTHS", "2"))
+MEASUREMENTS_RETENTION_MONTHS = int(os.getenv("MEASUREMENTS_RETENTION_MONTHS", "0"))
+MEASUREMENTS_DROP_EXPIRED = os.getenv("MEASUREMENTS_DROP_EXPIRED", "false").lower() == "true"
+# Bakım aralığı (saniye)
+MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+QUEUE_PARTITIONS = PartitionSpec(
+    table="sensor_data_queue",
+    column="created_at",
+    interval="day",
+    premake=QUEUE_PREMAKE_DAYS,
+    retention=QUEUE_RETENTION_DAYS,
+    keep_where="processed = FALSE",
+)
+
+MEASUREMENT_PARTITIONS = PartitionSpec(
+    table="measurements",
+    column="measured_at",
+    interval="month",
+    premake=MEASUREMENTS_PREMAKE_MONTHS,
+    retention=MEASUREMENTS_RETENTION_MONTHS,
+    detach_only=not MEASUREMENTS_DROP_EXPIRED,
+)
+
+PARTITIONED_TABLES = [QUEUE_PARTITIONS, MEASUREMENT_PARTITIONS]
+
+
+async def maintain_partitions(pool: asyncpg.Pool):
+    """Tüm partition'lı tablolar için tek bir bakım turu."""
+    async with acquire(pool) as conn:
+        for spec in PARTITIONED_TABLES:
+            if not await conn.fetchval(
+                "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", spec.table
+            ):
+                print(f"⚠️ {spec.table} is not partitioned, skipping maintenance (see sql/migrations)")
+                continue
+            try:
+                created = await ensure_partitions(conn, spec)
+                removed = await drop_expired_partitions(conn, spec)
+            except Exception as e:
+                # Bir tablodaki hata diğerlerinin bakımını engellemesin
+                print(f"Partition maintenance error on {spec.table}: {e}")
+                continue
+            if created or removed:
+                action = "detached" if spec.detach_only else "dropped"
+                print(f"🗂️ {spec.table}: created {created or '-'}, {action} {removed or '-'}")
+
+
+async def run_partition_maintenance(pool: asyncpg.Pool):
+    """Periyodik partition bakım döngüsü (başlangıçta hemen çalışır)."""
+    while True:
+        try:
+            await maintain_partitions(pool)
+        except Exception as e:
+            print(f"Partition maintenance error: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
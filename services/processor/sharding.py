@@ -0,0 +1,41 @@
+"""
+Hasta Bazlı Sharding
+
+Her processor worker'ı yalnızca patient_id hash'i kendi shard'ına düşen
+satırları işler. Böylece bir hastanın paketleri her zaman aynı worker'da,
+sırayla işlenir (hareketsizlik durumu tek bir yerde tutulur) ve birden fazla
+worker/container aynı satırlar için yarışmaz.
+
+Toplam shard sayısı = PROCESSOR_SHARD_COUNT (container sayısı) x PROCESSOR_WORKERS.
+Container i, [i * WORKERS, (i + 1) * WORKERS) aralığındaki shard'ları çalıştırır;
+bu yüzden tüm container'lar aynı PROCESSOR_WORKERS değerini kullanmalıdır.
+"""
+import os
+from typing import List, NamedTuple
+
+WORKERS = max(1, int(os.getenv("PROCESSOR_WORKERS", "1")))
+SHARD_COUNT = max(1, int(os.getenv("PROCESSOR_SHARD_COUNT", "1")))
+SHARD_INDEX = int(os.getenv("PROCESSOR_SHARD_INDEX", "0"))
+
+
+class Shard(NamedTuple):
+    index: int
+    count: int
+
+    def predicate(self, column: str = "patient_id") -> str:
+        """
+        Satırın bu shard'a ait olup olmadığını test eden SQL ifadesi.
+        hashtext() int4 döner; negatif değerler için işaret biti maskelenir.
+        """
+        return f"(hashtext({column}::text) & 2147483647) % {self.count:d} = {self.index:d}"
+
+    def __str__(self) -> str:
+        return f"{self.index + 1}/{self.count}"
+
+
+def local_shards() -> List[Shard]:
+    """Bu container'ın çalıştıracağı shard'lar (worker başına bir tane)."""
+    if not 0 <= SHARD_INDEX < SHARD_COUNT:
+        raise ValueError(f"PROCESSOR_SHARD_INDEX must be in [0, {SHARD_COUNT}), got {SHARD_INDEX}")
+    total = SHARD_COUNT * WORKERS
+    return [Shard(SHARD_INDEX * WORKERS + i, total) for i in range(WORKERS)]
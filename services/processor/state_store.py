@@ -0,0 +1,88 @@
+"""
+Hasta Durum Deposu (In-Memory)
+
+patient_states.last_movement_at değerini processor içinde tutar. Her pakette
+DB'ye okuma/yazma yapmak yerine başlangıçta yüklenir, değişen kayıtlar
+periyodik olarak toplu halde (write-behind) patient_states tablosuna yazılır.
+Hastalar worker'lar arasında shard'landığı için (bkz. sharding.py) her hastanın
+durumu tek bir worker'a aittir; worker'lar aynı satırlar için yarışmaz.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+import asyncpg
+
+from shared.metrics import acquire
+from sharding import Shard
+
+# Değişen durumların DB'ye yazılma aralığı (saniye)
+FLUSH_INTERVAL = float(os.getenv("PROCESSOR_STATE_FLUSH_INTERVAL", "5"))
+
+
+class PatientStateStore:
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._last_movement: Dict[str, datetime] = {}
+        self._dirty: Set[str] = set()
+
+    async def load(self, pool: asyncpg.Pool, shard: Optional[Shard] = None):
+        """Mevcut patient_states kayıtlarını (verilirse yalnızca shard'a ait olanları) belleğe yükler."""
+        query = "SELECT patient_id, last_movement_at FROM patient_states"
+        if shard:
+            query += f" WHERE {shard.predicate()}"
+        async with acquire(pool) as conn:
+            rows = await conn.fetch(query)
+        for row in rows:
+            if row['last_movement_at']:
+                self._last_movement[str(row['patient_id'])] = row['last_movement_at']
+        print(f"Patient state store loaded: {len(self._last_movement)} patients")
+
+    def get_last_movement(self, patient_id) -> Optional[datetime]:
+        return self._last_movement.get(str(patient_id))
+
+    def mark_moved(self, patient_id, moved_at: datetime):
+        """Son hareket zamanını günceller (daha eski bir zaman mevcut değeri ezmez)."""
+        key = str(patient_id)
+        current = self._last_movement.get(key)
+        if current is None or moved_at > current:
+            self._last_movement[key] = moved_at
+            self._dirty.add(key)
+
+    async def flush(self, pool: asyncpg.Pool) -> int:
+        """Değişen durumları tek bir toplu upsert ile patient_states'e yazar."""
+        if not self._dirty:
+            return 0
+
+        dirty = self._dirty
+        self._dirty = set()
+        patient_ids = list(dirty)
+        moved_at = [self._last_movement[pid] for pid in patient_ids]
+
+        try:
+            async with acquire(pool) as conn:
+                await conn.execute("""
+                    INSERT INTO patient_states (patient_id, last_movement_at, updated_at)
+                    SELECT u.patient_id, u.last_movement_at, NOW()
+                    FROM unnest($1::uuid[], $2::timestamptz[]) AS u(patient_id, last_movement_at)
+                    ON CONFLICT (patient_id)
+                    DO UPDATE SET last_movement_at = EXCLUDED.last_movement_at, updated_at = NOW()
+                    WHERE patient_states.last_movement_at IS NULL
+                       OR patient_states.last_movement_at < EXCLUDED.last_movement_at
+                """, patient_ids, moved_at)
+        except Exception:
+            # Yazılamayanlar bir sonraki flush'ta tekrar denenir
+            self._dirty |= dirty
+            raise
+
+        return len(patient_ids)
+
+    async def run_flusher(self, pool: asyncpg.Pool):
+        """Periyodik write-behind döngüsü."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(pool)
+            except Exception as e:
+                print(f"Patient state flush error: {e}")
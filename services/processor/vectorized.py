@@ -0,0 +1,176 @@
+"""
+Vektörize Sağlık Algoritmaları (NumPy)
+
+algorithms.py'deki düşme, nabız ve hareketsizlik algoritmalarının NumPy
+karşılıkları. Pencereler liste yerine contiguous float dizileri olarak alınır;
+tek bir pencere (1-D) veya aynı uzunlukta pencerelerden oluşan bir yığın (2-D,
+satır başına bir pencere) tek çağrıda işlenebilir.
+
+Sınıflandırmalar algorithms.py ile birebir aynıdır (bkz.
+scripts/verify_vectorized_algorithms.py). Eşiklerle karşılaştırılan toplamlar
+Python'un soldan sağa toplama sırasını korumak için cumsum ile hesaplanır;
+NumPy'nin pairwise toplaması son bitte farklı sonuç verip sınır durumlarında
+farklı sınıflandırmaya yol açabilirdi.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+FALL_TYPES = np.array([
+    "NONE", "INSUFFICIENT_DATA", "IMPACT_ONLY", "SEVERE_IMPACT",
+    "IMPACT_STILLNESS", "FREEFALL_IMPACT", "FULL_PATTERN"
+])
+
+
+def _as_2d(values) -> np.ndarray:
+    return np.atleast_2d(np.asarray(values, dtype=np.float64))
+
+
+def _sequential_sum(values: np.ndarray) -> np.ndarray:
+    """Satır toplamları, Python sum() ile aynı toplama sırasında."""
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0], dtype=np.float64)
+    return np.cumsum(values, axis=1)[:, -1]
+
+
+def accelerometer_arrays(acc: Dict[str, Sequence[float]]) -> np.ndarray:
+    """
+    {"x": [...], "y": [...], "z": [...]} formatını (3, n) float64 dizisine çevirir.
+    algorithms.calculate_smv_array gibi en kısa eksene göre kırpar.
+    """
+    axes = [np.asarray(acc.get(axis, []), dtype=np.float64) for axis in ('x', 'y', 'z')]
+    length = min(len(a) for a in axes)
+    return np.stack([a[:length] for a in axes])
+
+
+def stack_accelerometer(windows: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Aynı uzunluktaki (3, n) pencereleri (k, n) boyutlu x, y, z yığınlarına çevirir."""
+    stacked = np.stack(windows, axis=1)
+    return stacked[0], stacked[1], stacked[2]
+
+
+def calculate_smv(x, y, z) -> np.ndarray:
+    """Signal Magnitude Vector; 1-D veya 2-D dizilerle çalışır."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def detect_fall_batch(x, y, z,
+                      impact_threshold: float = 2.5,
+                      freefall_threshold: float = 0.5,
+                      stillness_threshold: float = 1.08,
+                      stillness_samples: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    algorithms.detect_fall'ın yığın versiyonu.
+
+    Returns:
+        (is_fall: bool[k], fall_type: str[k])
+    """
+    smv = calculate_smv(_as_2d(x), _as_2d(y), _as_2d(z))
+    count, length = smv.shape
+    fall_type = np.zeros(count, dtype=np.int8)  # FALL_TYPES indeksi
+
+    if length < 3:
+        fall_type[:] = 1
+        return np.zeros(count, dtype=bool), FALL_TYPES[fall_type]
+
+    freefall = (smv < freefall_threshold).any(axis=1)
+    impact_mask = smv > impact_threshold
+    impact = impact_mask.any(axis=1)
+    # Son impact indeksi (scalar versiyon son eşleşmeyi tutar)
+    impact_index = length - 1 - np.argmax(impact_mask[:, ::-1], axis=1)
+
+    # Impact sonrası stillness kontrolü
+    stillness = np.zeros(count, dtype=bool)
+    if stillness_samples > 0:
+        has_window = impact & (impact_index + stillness_samples < length)
+        offsets = impact_index[:, None] + 1 + np.arange(stillness_samples)
+        post_impact = np.take_along_axis(smv, np.minimum(offsets, length - 1), axis=1)
+        avg_post_impact = _sequential_sum(post_impact) / stillness_samples
+        stillness = has_window & (0.85 < avg_post_impact) & (avg_post_impact < stillness_threshold)
+
+    severe = smv.max(axis=1) > 4.0
+
+    fall_type[impact] = 2                               # IMPACT_ONLY
+    fall_type[impact & severe] = 3                      # SEVERE_IMPACT
+    fall_type[impact & stillness] = 4                   # IMPACT_STILLNESS
+    fall_type[impact & freefall] = 5                    # FREEFALL_IMPACT
+    fall_type[impact & freefall & stillness] = 6        # FULL_PATTERN
+
+    is_fall = fall_type >= 3
+    return is_fall, FALL_TYPES[fall_type]
+
+
+def calculate_bpm_batch(ppg_raw, sampling_rate: int = 25) -> np.ndarray:
+    """algorithms.calculate_bpm'in yığın versiyonu. Returns: int64[k]"""
+    ppg = np.atleast_2d(np.asarray(ppg_raw, dtype=np.int64))
+    count, length = ppg.shape
+
+    if length < 2:
+        return np.zeros(count, dtype=np.int64)
+
+    threshold = ppg.sum(axis=1) / length  # Average as threshold
+    mid = ppg[:, 1:-1]
+    peaks = ((mid > threshold[:, None]) & (mid > ppg[:, :-2]) & (mid > ppg[:, 2:])).sum(axis=1)
+
+    duration_sec = length / sampling_rate
+    bpm = (peaks / duration_sec) * 60
+    return np.clip(bpm.astype(np.int64), 20, 250)  # Clamp between 20-250
+
+
+def detect_motion_batch(x, y, z, stillness_threshold: float = 1.1) -> np.ndarray:
+    """
+    algorithms.check_inactivity'deki hareket tespiti. Returns: is_moving bool[k]
+    Boş pencereler hareketsiz sayılır.
+    """
+    smv = calculate_smv(_as_2d(x), _as_2d(y), _as_2d(z))
+    count, length = smv.shape
+    if length == 0:
+        return np.zeros(count, dtype=bool)
+
+    avg_smv = _sequential_sum(smv) / length
+    deviation = smv - avg_smv[:, None]
+    std_dev = np.sqrt(_sequential_sum(deviation * deviation) / length)
+
+    return (std_dev > 0.1) | ~((0.9 < avg_smv) & (avg_smv < stillness_threshold))
+
+
+def resolve_inactivity(is_moving: bool, samples: int, current_timestamp: float, last_known_movement_at=None) -> int:
+    """
+    Hareket bilgisi hesaplanmış tek bir pencere için hareketsizlik süresi
+    (check_inactivity ile aynı kural). Aynı hastanın ardışık pencereleri
+    sırayla işlenirken kullanılır. samples: penceredeki ivmeölçer örneği sayısı;
+    boş pencere hareketsizlik süresine eklenmez.
+    """
+    if is_moving or samples == 0:
+        return 0
+    if last_known_movement_at:
+        return int(max(0, current_timestamp - last_known_movement_at))
+    return 0
+
+
+def check_inactivity_batch(x, y, z,
+                           current_timestamps,
+                           last_known_movement_at,
+                           stillness_threshold: float = 1.1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    algorithms.check_inactivity'nin yığın versiyonu. Her pencere birbirinden
+    bağımsız değerlendirilir; son hareket zamanı bilinmiyorsa NaN verilir.
+
+    Returns:
+        (inactivity_seconds: int64[k], is_moving: bool[k])
+    """
+    is_moving = detect_motion_batch(x, y, z, stillness_threshold)
+    current = np.atleast_1d(np.asarray(current_timestamps, dtype=np.float64))
+    last = np.atleast_1d(np.asarray(last_known_movement_at, dtype=np.float64))
+
+    known = ~np.isnan(last) & (last != 0)
+    delta = np.where(known, current - np.where(known, last, 0.0), 0.0)
+    inactivity = np.maximum(0.0, delta).astype(np.int64)
+    inactivity[is_moving] = 0
+
+    if np.asarray(x).shape[-1] == 0:
+        inactivity[:] = 0
+    return inactivity, is_moving
@@ -0,0 +1,137 @@
+"""
+Simülasyon Senaryoları
+
+Sensör penceresi üreteçleri (mobil uygulama formatında, array). Simulator
+(main.py) ve yük testi (scripts/load_test.py) tarafından kullanılır.
+"""
+import time
+import random
+import math
+
+# Simulation window size (number of samples per packet)
+WINDOW_SIZE = 25  # 25 sample = 1 saniye @ 25Hz
+
+# Senaryo döngüsü uzunluğu (paket)
+CYCLE_LENGTH = 200
+
+
+def generate_normal_data(time_offset, patient_id):
+    """Normal durum: ~1g yerçekimi, düşük hareket"""
+    return {
+        "patient_id": patient_id,
+        "timestamp": time.time(),
+        "accelerometer": {
+            "x": [0.05 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)],
+            "y": [0.10 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)],
+            "z": [0.98 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)]
+        },
+        "gyroscope": {
+            "x": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)],
+            "y": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)],
+            "z": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)]
+        },
+        "ppg_raw": [2000 + int(200 * math.sin((time_offset + i) / 5)) for i in range(WINDOW_SIZE)]
+    }
+
+
+def generate_fall_data(time_offset, patient_id):
+    """
+    Düşme senaryosu: 
+    - İlk 5 sample: free-fall (SMV < 0.5g)
+    - Sonraki 5 sample: impact (SMV > 3g)
+    - Kalan samplelar: stillness (SMV ~ 1g)
+    """
+    acc_x, acc_y, acc_z = [], [], []
+    
+    # Phase 1: Free-fall (5 samples)
+    for _ in range(5):
+        acc_x.append(random.uniform(0.0, 0.2))
+        acc_y.append(random.uniform(0.0, 0.2))
+        acc_z.append(random.uniform(0.0, 0.3))  # Total SMV < 0.5
+    
+    # Phase 2: Impact (5 samples)
+    for _ in range(5):
+        acc_x.append(random.uniform(2.0, 3.0))
+        acc_y.append(random.uniform(1.5, 2.5))
+        acc_z.append(random.uniform(1.0, 2.0))  # Total SMV > 3g
+    
+    # Phase 3: Stillness (remaining samples)
+    for _ in range(WINDOW_SIZE - 10):
+        acc_x.append(random.uniform(0.0, 0.1))
+        acc_y.append(random.uniform(0.0, 0.1))
+        acc_z.append(random.uniform(0.95, 1.05))  # ~1g
+    
+    return {
+        "patient_id": patient_id,
+        "timestamp": time.time(),
+        "accelerometer": {"x": acc_x, "y": acc_y, "z": acc_z},
+        "gyroscope": {
+            "x": [random.uniform(1.0, 3.0) for _ in range(WINDOW_SIZE)],
+            "y": [random.uniform(1.0, 3.0) for _ in range(WINDOW_SIZE)],
+            "z": [random.uniform(1.0, 3.0) for _ in range(WINDOW_SIZE)]
+        },
+        "ppg_raw": [2000 + int(200 * math.sin((time_offset + i) / 5)) for i in range(WINDOW_SIZE)]
+    }
+
+
+def generate_tachycardia_data(time_offset, patient_id):
+    """Yüksek kalp atışı senaryosu: Daha hızlı PPG dalgası"""
+    return {
+        "patient_id": patient_id,
+        "timestamp": time.time(),
+        "accelerometer": {
+            "x": [0.05 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)],
+            "y": [0.10 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)],
+            "z": [0.98 + random.uniform(-0.02, 0.02) for _ in range(WINDOW_SIZE)]
+        },
+        "gyroscope": {
+            "x": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)],
+            "y": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)],
+            "z": [0.01 + random.uniform(-0.01, 0.01) for _ in range(WINDOW_SIZE)]
+        },
+        # Faster wave = higher BPM
+        "ppg_raw": [2000 + int(200 * math.sin((time_offset + i) / 2)) for i in range(WINDOW_SIZE)]
+    }
+
+
+def generate_inactivity_data(time_offset, patient_id):
+    """Hareketsizlik senaryosu: Tamamen sabit ~1g"""
+    return {
+        "patient_id": patient_id,
+        "timestamp": time.time(),
+        "accelerometer": {
+            "x": [0.0 for _ in range(WINDOW_SIZE)],
+            "y": [0.0 for _ in range(WINDOW_SIZE)],
+            "z": [1.0 for _ in range(WINDOW_SIZE)]  # Pure 1g downward
+        },
+        "gyroscope": {
+            "x": [0.0 for _ in range(WINDOW_SIZE)],
+            "y": [0.0 for _ in range(WINDOW_SIZE)],
+            "z": [0.0 for _ in range(WINDOW_SIZE)]
+        },
+        "ppg_raw": [2000 + int(200 * math.sin((time_offset + i) / 5)) for i in range(WINDOW_SIZE)]
+    }
+
+
+GENERATORS = {
+    "NORMAL": generate_normal_data,
+    "FALL": generate_fall_data,
+    "TACHYCARDIA": generate_tachycardia_data,
+    "INACTIVITY": generate_inactivity_data,
+}
+
+
+def scenario_for(counter):
+    """Paket sırasına göre senaryo: 200 paketlik döngüde taşikardi, hareketsizlik ve düşme."""
+    cycle = counter % CYCLE_LENGTH
+    if 150 < cycle < 160:
+        return "TACHYCARDIA"
+    elif cycle == 190:
+        return "FALL"
+    elif 180 < cycle < 190:
+        return "INACTIVITY"
+    return "NORMAL"
+
+
+def generate(mode, counter, patient_id):
+    return GENERATORS[mode](counter, patient_id)
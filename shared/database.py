@@ -1,10 +1,136 @@
+"""
+Database access shared by every service.
+
+create_pool() is the single place asyncpg pools are built. Sizing, timeouts and the
+statement cache come from the environment (override per call where a pool has a
+different role, e.g. the core export pool):
+
+- DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE: connections kept open / upper bound (per process)
+- DB_COMMAND_TIMEOUT: default timeout in seconds for a single query (0 = none)
+- DB_MAX_INACTIVE_LIFETIME: idle connections are closed after this many seconds
+- DB_STATEMENT_CACHE_SIZE: prepared statements kept per connection. asyncpg prepares
+  every fetch/execute once per connection and reuses it while the query text is the
+  same, so hot queries (queue claim, bulk measurement writes, ...) must keep constant
+  SQL text and pass values as parameters. Set to 0 behind PgBouncer in transaction mode.
+- DB_HEALTH_CHECK_IDLE: a connection idle longer than this many seconds is pinged
+  before it is handed out; a dead one is replaced transparently (0 = off)
+- DB_JIT: PostgreSQL JIT for this session; off by default since it only adds planning
+  time to the short queries this system runs
+
+Every pool reports its metrics (shared/metrics.py: track_pool) under its name.
+connect_listener() opens the dedicated LISTEN connection with the same settings:
+LISTEN is session state, so it cannot live on a pooled connection.
+"""
 import os
+import time
+from typing import Dict, Optional
+
 import asyncpg
 from dotenv import load_dotenv
 
+from shared.metrics import acquire, track_pool
+
 load_dotenv()
 
-DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "secret")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME", "cdtp_health")
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = max(1, int(os.getenv("DB_POOL_MAX_SIZE", "10")))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "200"))
+DB_HEALTH_CHECK_IDLE = float(os.getenv("DB_HEALTH_CHECK_IDLE", "30"))
+DB_JIT = os.getenv("DB_JIT", "off")
+
+
+class StaleConnectionError(ConnectionError):
+    """Raised by the pool health check; shared.metrics.acquire retries once on it."""
+
+
+def _server_settings(application: str) -> Dict[str, str]:
+    return {"application_name": application, "jit": DB_JIT}
+
+
+def _health_check(idle_seconds: float):
+    """
+    Pool init/setup/reset callbacks: setup pings connections that sat idle (since their
+    last release) longer than idle_seconds. Idle time is tracked per backend PID, which
+    is unique among live connections.
+    """
+    released_at: Dict[int, float] = {}
+
+    async def init(conn: asyncpg.Connection):
+        pid = conn.get_server_pid()
+        released_at[pid] = time.monotonic()
+        conn.add_termination_listener(lambda _conn: released_at.pop(pid, None))
+
+    async def setup(conn):
+        now = time.monotonic()
+        idle = now - released_at.get(conn.get_server_pid(), now)
+        if idle > idle_seconds:
+            try:
+                await conn.fetchval("SELECT 1", timeout=5)
+            except Exception as e:
+                # asyncpg closes a connection whose setup failed
+                raise StaleConnectionError(f"connection idle for {idle:.0f}s failed health check: {e}") from e
+
+    async def reset(conn):
+        # Replaces asyncpg's default reset, so keep doing it
+        await conn.reset()
+        released_at[conn.get_server_pid()] = time.monotonic()
+
+    return init, setup, reset
+
+
+async def create_pool(name: str = "main", application: str = "cdtp",
+                      min_size: Optional[int] = None, max_size: Optional[int] = None,
+                      command_timeout: Optional[float] = None, dsn: str = DATABASE_URL) -> asyncpg.Pool:
+    """
+    Creates a pool with the shared settings and registers its metrics.
+
+    Args:
+        name: pool label in the db_pool_* metrics
+        application: application_name shown in pg_stat_activity (e.g. "cdtp-processor")
+        min_size, max_size, command_timeout: override the DB_* defaults for this pool
+            (command_timeout=0 disables the timeout)
+    """
+    max_size = max_size if max_size is not None else DB_POOL_MAX_SIZE
+    min_size = min(min_size if min_size is not None else DB_POOL_MIN_SIZE, max_size)
+
+    init = setup = reset = None
+    if DB_HEALTH_CHECK_IDLE > 0:
+        init, setup, reset = _health_check(DB_HEALTH_CHECK_IDLE)
+
+    pool = await asyncpg.create_pool(
+        dsn,
+        min_size=min_size,
+        max_size=max_size,
+        command_timeout=(command_timeout if command_timeout is not None else DB_COMMAND_TIMEOUT) or None,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        server_settings=_server_settings(application),
+        init=init,
+        setup=setup,
+        reset=reset,
+    )
+    track_pool(pool, name)
+    return pool
+
+
+async def connect_listener(application: str = "cdtp", dsn: str = DATABASE_URL) -> asyncpg.Connection:
+    """Dedicated connection for LISTEN/NOTIFY (no command timeout: it idles by design)."""
+    return await asyncpg.connect(
+        dsn,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        server_settings=_server_settings(f"{application}-listener"),
+    )
+
 
 class Database:
     def __init__(self):
@@ -13,7 +139,7 @@ class Database:
     async def connect(self):
         if not self.pool:
             try:
-                self.pool = await asyncpg.create_pool(DATABASE_URL)
+                self.pool = await create_pool("main", "cdtp-core")
                 print("Connected to database")
             except Exception as e:
                 print(f"Database connection failed: {e}")
@@ -24,15 +150,15 @@ class Database:
             print("Disconnected from database")
 
     async def fetch_one(self, query, *args):
-        async with self.pool.acquire() as connection:
+        async with acquire(self.pool) as connection:
             return await connection.fetchrow(query, *args)
 
     async def fetch_all(self, query, *args):
-        async with self.pool.acquire() as connection:
+        async with acquire(self.pool) as connection:
             return await connection.fetch(query, *args)
 
     async def execute(self, query, *args):
-        async with self.pool.acquire() as connection:
+        async with acquire(self.pool) as connection:
             return await connection.execute(query, *args)
 
 db = Database()
@@ -0,0 +1,110 @@
+"""
+Lossless ECG sample codec (ecg_segments.samples_compressed).
+
+ECG changes little from one sample to the next, so each sample is stored as the
+difference to the previous one, zigzag-mapped to an unsigned integer and written as a
+LEB128 varint. Most 250 Hz deltas fit into one byte (vs. two bytes per SMALLINT plus
+array overhead).
+
+Layout:
+
+    offset  size        field
+    0       1           version (1)
+    1       varint      sample count
+    ...     varint      zigzag(samples[0])
+    ...     varint      zigzag(samples[i] - samples[i-1])   for i = 1..count-1
+"""
+from typing import Iterable, List, Sequence, Tuple
+
+VERSION = 1
+
+# SMALLINT range of the legacy samples column
+SAMPLE_MIN = -32768
+SAMPLE_MAX = 32767
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, offset: int) -> Tuple[int, int]:
+    """Returns (value, next offset)."""
+    value = 0
+    shift = 0
+    while True:
+        try:
+            byte = buf[offset]
+        except IndexError:
+            raise ValueError("Truncated ECG payload")
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_samples(samples: Iterable[int]) -> bytes:
+    """Compresses integer samples. Raises ValueError for samples outside SMALLINT range."""
+    samples = list(samples)
+    out = bytearray((VERSION,))
+    _write_varint(out, len(samples))
+    previous = 0
+    for sample in samples:
+        if not SAMPLE_MIN <= sample <= SAMPLE_MAX:
+            raise ValueError(f"ECG sample out of range: {sample}")
+        delta = sample - previous
+        previous = sample
+        _write_varint(out, (delta << 1) if delta >= 0 else ((-delta << 1) - 1))
+    return bytes(out)
+
+
+def sample_count(buf) -> int:
+    """Reads the sample count without decoding the samples."""
+    if not buf or buf[0] != VERSION:
+        raise ValueError("Unsupported ECG payload version")
+    return _read_varint(buf, 1)[0]
+
+
+def decode_samples(buf) -> List[int]:
+    """Decompresses a payload produced by encode_samples."""
+    count = sample_count(buf)
+    offset = _read_varint(buf, 1)[1]
+    samples = [0] * count
+    previous = 0
+    for i in range(count):
+        # Inlined _read_varint: this loop runs once per sample
+        value = 0
+        shift = 0
+        while True:
+            try:
+                byte = buf[offset]
+            except IndexError:
+                raise ValueError("Truncated ECG payload")
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        previous += (value >> 1) if not value & 1 else -((value + 1) >> 1)
+        samples[i] = previous
+    if offset != len(buf):
+        raise ValueError("Trailing bytes in ECG payload")
+    return samples
+
+
+def decimate_min_max(samples: Sequence[int], step: int) -> Tuple[List[int], List[int]]:
+    """
+    Reduces samples to one (min, max) pair per `step` samples. Unlike taking every
+    n-th sample this keeps QRS peaks visible in overview plots. A trailing partial
+    bucket is included.
+    """
+    lows = []
+    highs = []
+    for start in range(0, len(samples), step):
+        bucket = samples[start:start + step]
+        lows.append(min(bucket))
+        highs.append(max(bucket))
+    return lows, highs
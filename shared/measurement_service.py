@@ -1,12 +1,43 @@
 import json
 from datetime import datetime
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 import asyncpg
 from shared.business_logic import evaluate_measurement
+from shared.metrics import acquire
+from shared.tracing import stage, tracer
+from shared.settings_cache import SettingsCache, MISSING
+from shared.patient_latest import set_active_alerts
+
+# measurement_rollups bucket sizes (label -> seconds)
+ROLLUP_BUCKETS = {"1m": 60, "5m": 300, "1h": 3600}
+
+# Body of the `latest` CTE that copies the newest `inserted` row per patient into patient_latest
+_UPSERT_LATEST_MEASUREMENT = """
+    INSERT INTO patient_latest (
+        patient_id, measurement_id, heart_rate, inactivity_seconds, status, measured_at, updated_at
+    )
+    SELECT DISTINCT ON (patient_id)
+        patient_id, id, heart_rate, inactivity_seconds, status, measured_at, NOW()
+    FROM inserted
+    ORDER BY patient_id, measured_at DESC, id DESC
+    ON CONFLICT (patient_id) DO UPDATE SET
+        measurement_id = EXCLUDED.measurement_id,
+        heart_rate = EXCLUDED.heart_rate,
+        inactivity_seconds = EXCLUDED.inactivity_seconds,
+        status = EXCLUDED.status,
+        measured_at = EXCLUDED.measured_at,
+        updated_at = NOW()
+    WHERE patient_latest.measurement_id IS NULL
+       OR patient_latest.measured_at IS NULL
+       -- Backfilled (older) windows must not replace a newer latest measurement
+       OR (patient_latest.measured_at, patient_latest.measurement_id)
+          < (EXCLUDED.measured_at, EXCLUDED.measurement_id)
+"""
 
 class MeasurementService:
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(self, pool: asyncpg.Pool, settings_cache: Optional[SettingsCache] = None):
         self.pool = pool
+        self.settings_cache = settings_cache
 
     async def process_measurement(
         self, 
@@ -19,27 +50,34 @@ class MeasurementService:
         """
         Full pipeline: Get settings -> Evaluate -> Save -> Alert -> Notify
         Returns the processed measurement data including status.
+        Each step is recorded as a span of the current trace (or of a new "measurement" trace).
         """
-        if conn:
-            return await self._execute_pipeline(conn, patient_id, heart_rate, inactivity_seconds, is_fall)
-        else:
-            async with self.pool.acquire() as new_conn:
-                return await self._execute_pipeline(new_conn, patient_id, heart_rate, inactivity_seconds, is_fall)
+        with tracer.trace("measurement", patient_id=str(patient_id)):
+            if conn:
+                return await self._execute_pipeline(conn, patient_id, heart_rate, inactivity_seconds, is_fall)
+            else:
+                async with acquire(self.pool) as new_conn:
+                    return await self._execute_pipeline(new_conn, patient_id, heart_rate, inactivity_seconds, is_fall)
 
     async def _execute_pipeline(self, conn, patient_id, heart_rate, inactivity_seconds, is_fall):
         # 1. Get Settings
-        settings = await self._get_settings(conn, patient_id)
+        with stage("settings"):
+            settings = await self._get_settings(conn, patient_id)
         
         # 2. Evaluate
-        status, alert_msg = evaluate_measurement(
-            heart_rate, 
-            inactivity_seconds, 
-            settings, 
-            is_fall
-        )
+        with stage("evaluate"):
+            status, alert_msg = evaluate_measurement(
+                heart_rate, 
+                inactivity_seconds, 
+                settings, 
+                is_fall
+            )
         
         # 3. Save Measurement
-        measured_at = await self._save_measurement(conn, patient_id, heart_rate, inactivity_seconds, status)
+        with stage("db_write", rows=1):
+            measured_at = await self._save_measurement(conn, patient_id, heart_rate, inactivity_seconds, status)
+        with stage("rollups", rows=1):
+            await self._update_rollups(conn, [(str(patient_id), heart_rate, inactivity_seconds, status)], [measured_at])
         
         result = {
             "patient_id": str(patient_id),
@@ -50,17 +88,95 @@ class MeasurementService:
         }
         
         # 4. Notify (Real-time update)
-        await conn.execute(
-            "SELECT pg_notify('measurement_updates', $1)", 
-            json.dumps(result)
-        )
+        with stage("notify", rows=1):
+            await conn.execute(
+                "SELECT pg_notify('measurement_updates', $1)", 
+                json.dumps(result)
+            )
         
         # 5. Handle Alert
         if alert_msg:
-            await self._create_alert(conn, patient_id, alert_msg)
+            with stage("alerts", rows=1):
+                await self._create_alert(conn, patient_id, alert_msg)
             
         return result
 
+    async def process_measurements_bulk(
+        self,
+        items: List[Dict[str, Any]],
+        conn: asyncpg.Connection = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Bulk pipeline for many measurements at once (e.g. a processor batch or a replayed burst).
+        Every step runs as a single set-based statement instead of one round trip per item.
+
+        Args:
+            items: [{"patient_id", "heart_rate", "inactivity_seconds",
+                     "is_fall" (optional), "measured_at" (optional datetime, default NOW())}, ...]
+            conn: Optional connection. The caller owns the transaction when it is given,
+                  otherwise the whole batch is written in its own transaction.
+
+        Returns the processed measurements in input order.
+        """
+        if not items:
+            return []
+        with tracer.trace("measurement_bulk", rows=len(items)):
+            if conn:
+                return await self._execute_bulk_pipeline(conn, items)
+            else:
+                async with acquire(self.pool) as new_conn:
+                    async with new_conn.transaction():
+                        return await self._execute_bulk_pipeline(new_conn, items)
+
+    async def _execute_bulk_pipeline(self, conn, items):
+        # 1. Get Settings (one query for every patient in the batch)
+        with stage("settings", patients=len({str(item['patient_id']) for item in items})):
+            settings_map = await self._get_settings_many(conn, [item['patient_id'] for item in items])
+
+        # 2. Evaluate
+        with stage("evaluate", rows=len(items)):
+            evaluated = []
+            for item in items:
+                patient_id = str(item['patient_id'])
+                status, alert_msg = evaluate_measurement(
+                    item['heart_rate'],
+                    item['inactivity_seconds'],
+                    settings_map.get(patient_id),
+                    item.get('is_fall', False)
+                )
+                evaluated.append((patient_id, item['heart_rate'], item['inactivity_seconds'], status, alert_msg))
+
+        # 3. Save Measurements
+        # Each item keeps its own time (e.g. a backlog of windows being caught up)
+        with stage("db_write", rows=len(evaluated)):
+            now = await self._save_measurements_bulk(conn, evaluated, [item.get('measured_at') for item in items])
+        measured_at = [item.get('measured_at') or now for item in items]
+        with stage("rollups", rows=len(evaluated)):
+            await self._update_rollups(conn, evaluated, measured_at)
+
+        results = [
+            {
+                "patient_id": patient_id,
+                "heart_rate": heart_rate,
+                "inactivity_seconds": inactivity_seconds,
+                "status": status,
+                "measured_at": at.isoformat()
+            }
+            for (patient_id, heart_rate, inactivity_seconds, status, _), at in zip(evaluated, measured_at)
+        ]
+
+        # 4. Notify (Real-time update)
+        with stage("notify", rows=len(results)):
+            await self._notify_many(conn, 'measurement_updates', [json.dumps(r) for r in results])
+
+        # 5. Handle Alerts
+        alerts = [(patient_id, alert_msg) for patient_id, _, _, _, alert_msg in evaluated if alert_msg]
+        if alerts:
+            with stage("alerts", rows=len(alerts)):
+                await self._create_alerts_bulk(conn, alerts)
+
+        return results
+
     async def update_patient_state(self, patient_id: str, last_movement_at: datetime, conn: asyncpg.Connection = None):
         """Updates the last movement timestamp for inactivity tracking."""
         query = """
@@ -72,7 +188,7 @@ class MeasurementService:
         if conn:
              await conn.execute(query, patient_id, last_movement_at)
         else:
-             async with self.pool.acquire() as new_conn:
+             async with acquire(self.pool) as new_conn:
                  await new_conn.execute(query, patient_id, last_movement_at)
 
     async def get_patient_state(self, patient_id: str, conn: asyncpg.Connection = None) -> Optional[datetime]:
@@ -81,18 +197,56 @@ class MeasurementService:
         if conn:
             return await conn.fetchval(query, patient_id)
         else:
-            async with self.pool.acquire() as new_conn:
+            async with acquire(self.pool) as new_conn:
                 return await new_conn.fetchval(query, patient_id)
 
     async def _get_settings(self, conn, patient_id: str) -> Optional[Dict[str, Any]]:
+        if self.settings_cache:
+            cached = self.settings_cache.get(patient_id)
+            if cached is not MISSING:
+                return cached
+            generation = self.settings_cache.generation()
         row = await conn.fetchrow("SELECT * FROM patient_settings WHERE patient_id = $1", patient_id)
-        return dict(row) if row else None
+        settings = dict(row) if row else None
+        if self.settings_cache:
+            # An invalidation during the fetch means the row may predate the update
+            self.settings_cache.set(patient_id, settings, generation)
+        return settings
+
+    async def _get_settings_many(self, conn, patient_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        unique_ids = {str(pid) for pid in patient_ids}
+        result = {}
+        if self.settings_cache:
+            for pid in list(unique_ids):
+                cached = self.settings_cache.get(pid)
+                if cached is not MISSING:
+                    if cached is not None:
+                        result[pid] = cached
+                    unique_ids.discard(pid)
+        if not unique_ids:
+            return result
+
+        generation = self.settings_cache.generation() if self.settings_cache else None
+        rows = await conn.fetch(
+            "SELECT * FROM patient_settings WHERE patient_id = ANY($1::uuid[])",
+            list(unique_ids)
+        )
+        for row in rows:
+            result[str(row['patient_id'])] = dict(row)
+        if self.settings_cache:
+            for pid in unique_ids:
+                self.settings_cache.set(pid, result.get(pid), generation)
+        return result
 
     async def _save_measurement(self, conn, patient_id: str, hr: int, inactivity: int, status: str) -> datetime:
-        query = """
-            INSERT INTO measurements (patient_id, heart_rate, inactivity_seconds, status, measured_at)
-            VALUES ($1, $2, $3, $4, NOW())
-            RETURNING measured_at
+        query = f"""
+            WITH inserted AS (
+                INSERT INTO measurements (patient_id, heart_rate, inactivity_seconds, status, measured_at)
+                VALUES ($1, $2, $3, $4, NOW())
+                RETURNING id, patient_id, heart_rate, inactivity_seconds, status, measured_at
+            ),
+            latest AS ({_UPSERT_LATEST_MEASUREMENT})
+            SELECT measured_at FROM inserted
         """
         return await conn.fetchval(query, patient_id, hr, inactivity, status)
 
@@ -104,6 +258,7 @@ class MeasurementService:
         """
         row = await conn.fetchrow(query, patient_id, message)
         if row:
+            await set_active_alerts(conn, [(row['patient_id'], row['id'], row['message'], row['created_at'])])
             alert_data = dict(row)
             alert_data['patient_id'] = str(alert_data['patient_id'])
             alert_data['created_at'] = alert_data['created_at'].isoformat()
@@ -111,3 +266,102 @@ class MeasurementService:
                 "SELECT pg_notify('alert_updates', $1)", 
                 json.dumps(alert_data)
             )
+
+    async def _save_measurements_bulk(self, conn, evaluated: List[Tuple], measured_at: List[Optional[datetime]]) -> datetime:
+        """
+        Inserts the rows with their own measured_at; rows without one get the statement's NOW(),
+        which is returned so the caller can fill them in.
+        """
+        query = f"""
+            WITH inserted AS (
+                INSERT INTO measurements (patient_id, heart_rate, inactivity_seconds, status, measured_at)
+                SELECT u.patient_id, u.heart_rate, u.inactivity_seconds, u.status::measurement_status,
+                       COALESCE(u.measured_at, NOW())
+                FROM unnest($1::uuid[], $2::int[], $3::int[], $4::text[], $5::timestamptz[])
+                    AS u(patient_id, heart_rate, inactivity_seconds, status, measured_at)
+                RETURNING id, patient_id, heart_rate, inactivity_seconds, status, measured_at
+            ),
+            latest AS ({_UPSERT_LATEST_MEASUREMENT})
+            SELECT NOW()
+        """
+        return await conn.fetchval(
+            query,
+            [e[0] for e in evaluated],
+            [e[1] for e in evaluated],
+            [e[2] for e in evaluated],
+            [e[3] for e in evaluated],
+            measured_at
+        )
+
+    async def _update_rollups(self, conn, evaluated: List[Tuple], measured_at: List[datetime]):
+        """
+        Folds the saved measurements into their 1m/5m/1h buckets in measurement_rollups.
+        The bucket is computed per row from its own measured_at, so a batch spanning
+        several buckets (e.g. a caught-up backlog) updates each of them.
+        Rows are upserted in key order to avoid deadlocks between concurrent writers.
+        """
+        query = """
+            INSERT INTO measurement_rollups (
+                patient_id, bucket_seconds, bucket_start, sample_count,
+                hr_min, hr_max, hr_sum, worst_status, max_inactivity
+            )
+            SELECT
+                u.patient_id,
+                b.seconds,
+                to_timestamp(floor(extract(epoch FROM u.measured_at) / b.seconds) * b.seconds) AS bucket_start,
+                count(*),
+                min(u.heart_rate),
+                max(u.heart_rate),
+                sum(u.heart_rate),
+                max(u.status::measurement_status),
+                max(u.inactivity_seconds)
+            FROM unnest($1::uuid[], $2::int[], $3::int[], $4::text[], $5::timestamptz[])
+                AS u(patient_id, heart_rate, inactivity_seconds, status, measured_at)
+            CROSS JOIN unnest($6::int[]) AS b(seconds)
+            GROUP BY u.patient_id, b.seconds, bucket_start
+            ORDER BY u.patient_id, b.seconds, bucket_start
+            ON CONFLICT (patient_id, bucket_seconds, bucket_start) DO UPDATE SET
+                sample_count = measurement_rollups.sample_count + EXCLUDED.sample_count,
+                hr_min = LEAST(measurement_rollups.hr_min, EXCLUDED.hr_min),
+                hr_max = GREATEST(measurement_rollups.hr_max, EXCLUDED.hr_max),
+                hr_sum = measurement_rollups.hr_sum + EXCLUDED.hr_sum,
+                worst_status = GREATEST(measurement_rollups.worst_status, EXCLUDED.worst_status),
+                max_inactivity = GREATEST(measurement_rollups.max_inactivity, EXCLUDED.max_inactivity)
+        """
+        await conn.execute(
+            query,
+            [e[0] for e in evaluated],
+            [e[1] for e in evaluated],
+            [e[2] for e in evaluated],
+            [e[3] for e in evaluated],
+            measured_at,
+            list(ROLLUP_BUCKETS.values())
+        )
+
+    async def _create_alerts_bulk(self, conn, alerts: List[Tuple[str, str]]):
+        query = """
+            INSERT INTO emergency_logs (patient_id, message, created_at)
+            SELECT u.patient_id, u.message, NOW()
+            FROM unnest($1::uuid[], $2::text[]) AS u(patient_id, message)
+            RETURNING id, patient_id, message, created_at
+        """
+        rows = await conn.fetch(query, [a[0] for a in alerts], [a[1] for a in alerts])
+        await set_active_alerts(conn, [
+            (row['patient_id'], row['id'], row['message'], row['created_at']) for row in rows
+        ])
+        payloads = []
+        for row in rows:
+            alert_data = dict(row)
+            alert_data['patient_id'] = str(alert_data['patient_id'])
+            alert_data['created_at'] = alert_data['created_at'].isoformat()
+            payloads.append(json.dumps(alert_data))
+        await self._notify_many(conn, 'alert_updates', payloads)
+
+    async def _notify_many(self, conn, channel: str, payloads: List[str]):
+        if not payloads:
+            return
+        await conn.execute(
+            "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+            channel,
+            payloads
+        )
@@ -0,0 +1,289 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4), no client library needed.
+
+Metrics are process-wide and registered once at import time:
+
+    REQUESTS = counter("ingest_windows_total", "Windows queued", ("format",))
+    REQUESTS.inc(format="json")
+
+    with PIPELINE_STAGE_SECONDS.time(stage="notify"):
+        ...
+
+Values that are cheaper to read at scrape time (pool sizes, queue depth, connection
+counts) are provided by collectors: plain or async callables that run before every
+render() and usually set gauges. A failing collector is logged and skipped.
+
+Each service exposes render() on GET /metrics; the processor has no HTTP app and uses
+serve_metrics() instead (which can serve a few extra debug paths, e.g. /debug/traces).
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds (1 ms .. 10 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def clear(self):
+        self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [count per bucket..., +Inf], sum
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, key, value) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Modules imported twice (e.g. as "main" and by name) share the metric
+            if type(existing) is not type(metric) or existing.labels != metric.labels:
+                raise ValueError(f"Metric {metric.name} already registered with a different type or labels")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable):
+        self._collectors.append(collector)
+
+    async def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                result = collector()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labels))
+
+
+def histogram(name: str, documentation: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labels, buckets))
+
+
+async def render() -> str:
+    return await registry.render()
+
+
+# ---------------------------------------------------------------------------
+# Shared metrics
+# ---------------------------------------------------------------------------
+
+PIPELINE_STAGE_SECONDS = histogram(
+    "pipeline_stage_seconds",
+    "Time spent per measurement pipeline stage (per batch or packet)",
+    ("stage",)
+)
+
+POOL_ACQUIRE_SECONDS = histogram(
+    "db_pool_acquire_seconds", "Time waited for a database connection", ("pool",)
+)
+POOL_SIZE = gauge("db_pool_connections", "Open connections in the database pool", ("pool",))
+POOL_IDLE = gauge("db_pool_idle_connections", "Idle connections in the database pool", ("pool",))
+POOL_MAX = gauge("db_pool_max_connections", "Maximum size of the database pool", ("pool",))
+
+QUEUE_DEPTH = gauge("sensor_queue_depth", "Unprocessed rows in sensor_data_queue")
+QUEUE_OLDEST_AGE = gauge(
+    "sensor_queue_oldest_age_seconds", "Age of the oldest unprocessed sensor_data_queue row"
+)
+
+
+@asynccontextmanager
+async def acquire(pool, name: str = "main"):
+    """
+    pool.acquire() that records the wait in db_pool_acquire_seconds. A connection that
+    fails the pool health check (shared/database.py) is dropped and replaced once.
+    """
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire()
+    except ConnectionError as e:
+        print(f"Replacing stale database connection: {e}")
+        conn = await pool.acquire()
+    POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started, pool=name)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def track_pool(pool, name: str = "main"):
+    """Reports the pool's size and idle connections at scrape time."""
+    def collect():
+        POOL_SIZE.set(pool.get_size(), pool=name)
+        POOL_IDLE.set(pool.get_idle_size(), pool=name)
+        POOL_MAX.set(pool.get_max_size(), pool=name)
+    registry.add_collector(collect)
+
+
+def track_queue(pool):
+    """Reads queue depth and the age of the oldest unprocessed row at scrape time."""
+    async def collect():
+        row = await pool.fetchrow("""
+            SELECT COUNT(*) AS depth,
+                   COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(created_at)), 0)::float AS oldest_age
+            FROM sensor_data_queue
+            WHERE processed = FALSE
+        """)
+        QUEUE_DEPTH.set(row['depth'])
+        QUEUE_OLDEST_AGE.set(row['oldest_age'])
+    registry.add_collector(collect)
+
+
+async def serve_metrics(port: int, host: str = "0.0.0.0",
+                        routes: Optional[Dict[str, Callable[[], Awaitable[Tuple[str, str]]]]] = None
+                        ) -> asyncio.AbstractServer:
+    """
+    Minimal HTTP server answering GET /metrics (for services without a web app).
+    routes: extra GET paths -> async callable returning (content type, body).
+    """
+    routes = routes or {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Drain headers
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) >= 2 and parts[0] == "GET" else None
+            if path == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, (await render()).encode()
+            elif path in routes:
+                content_type, text = await routes[path]()
+                status, body = "200 OK", text.encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,155 @@
+"""
+Range partition management for time-partitioned tables.
+
+Tables are declared in sql/schema.sql as `PARTITION BY RANGE (<time column>)` with a
+`<table>_default` partition so inserts never fail. This module pre-creates the daily or
+monthly partitions `<table>_pYYYYMMDD` / `<table>_pYYYYMM` ahead of time and drops
+(or detaches) partitions that fall out of the retention window.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+import asyncpg
+
+
+class PartitionSpec(NamedTuple):
+    table: str
+    column: str
+    interval: str                     # "day" | "month"
+    premake: int                      # Future partitions to keep created
+    retention: int                    # Past partitions to keep (0 = keep forever)
+    keep_where: Optional[str] = None  # Rows matching this block dropping their partition
+    detach_only: bool = False         # Detach expired partitions instead of dropping them
+
+    @property
+    def default_partition(self) -> str:
+        return f"{self.table}_default"
+
+
+def floor_bound(ts: datetime, interval: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    if interval == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "month":
+        return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported partition interval: {interval}")
+
+
+def shift_bound(start: datetime, interval: str, steps: int = 1) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=steps)
+    month_index = start.year * 12 + (start.month - 1) + steps
+    return start.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(spec: PartitionSpec, start: datetime) -> str:
+    suffix = start.strftime("%Y%m%d" if spec.interval == "day" else "%Y%m")
+    return f"{spec.table}_p{suffix}"
+
+
+def _literal(ts: datetime) -> str:
+    return "'" + ts.isoformat() + "'"
+
+
+async def list_partitions(conn: asyncpg.Connection, spec: PartitionSpec) -> List[Tuple[str, datetime]]:
+    """Managed partitions of spec.table as (name, lower bound), oldest first."""
+    rows = await conn.fetch("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+    """, spec.table)
+    pattern = re.compile(rf"^{re.escape(spec.table)}_p(\d{{8}}|\d{{6}})$")
+    result = []
+    for row in rows:
+        match = pattern.match(row['relname'])
+        if match:
+            fmt = "%Y%m%d" if len(match.group(1)) == 8 else "%Y%m"
+            start = datetime.strptime(match.group(1), fmt).replace(tzinfo=timezone.utc)
+            result.append((row['relname'], start))
+    return sorted(result, key=lambda item: item[1])
+
+
+async def _create_partition(conn: asyncpg.Connection, spec: PartitionSpec, start: datetime) -> bool:
+    name = partition_name(spec, start)
+    end = shift_bound(start, spec.interval)
+    bounds = f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+
+    try:
+        async with conn.transaction():
+            # Several processors may run maintenance at the same time
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", spec.table)
+            if await conn.fetchval("SELECT to_regclass($1)", name):
+                return False
+
+            has_default = await conn.fetchval("SELECT to_regclass($1)", spec.default_partition)
+            in_default = has_default and await conn.fetchval(
+                f"SELECT EXISTS (SELECT 1 FROM {spec.default_partition} WHERE {spec.column} >= $1 AND {spec.column} < $2)",
+                start, end
+            )
+            if in_default:
+                # Maintenance lagged and rows for this range landed in the default partition:
+                # move them into the new partition (Postgres refuses the CREATE otherwise)
+                await conn.execute(f"ALTER TABLE {spec.table} DETACH PARTITION {spec.default_partition}")
+                await conn.execute(f"CREATE TABLE {name} PARTITION OF {spec.table} {bounds}")
+                await conn.execute(
+                    f"INSERT INTO {spec.table} SELECT * FROM {spec.default_partition} "
+                    f"WHERE {spec.column} >= $1 AND {spec.column} < $2",
+                    start, end
+                )
+                await conn.execute(
+                    f"DELETE FROM {spec.default_partition} WHERE {spec.column} >= $1 AND {spec.column} < $2",
+                    start, end
+                )
+                await conn.execute(f"ALTER TABLE {spec.table} ATTACH PARTITION {spec.default_partition} DEFAULT")
+            else:
+                await conn.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {spec.table} {bounds}")
+    except asyncpg.InvalidObjectDefinitionError:
+        # The range already belongs to another partition (e.g. a migrated legacy table)
+        return False
+    return True
+
+
+async def ensure_partitions(conn: asyncpg.Connection, spec: PartitionSpec, now: datetime = None) -> List[str]:
+    """Creates the current partition and `premake` future ones. Returns the created names."""
+    current = floor_bound(now or datetime.now(timezone.utc), spec.interval)
+    created = []
+    for step in range(spec.premake + 1):
+        start = shift_bound(current, spec.interval, step)
+        if await _create_partition(conn, spec, start):
+            created.append(partition_name(spec, start))
+    return created
+
+
+async def drop_expired_partitions(conn: asyncpg.Connection, spec: PartitionSpec, now: datetime = None) -> List[str]:
+    """
+    Drops (or detaches) partitions that ended before the retention window and purges
+    expired rows from the default partition (not with detach_only). Partitions still holding rows that match
+    spec.keep_where are left alone. Returns the removed partition names.
+    """
+    if spec.retention <= 0:
+        return []
+
+    cutoff = shift_bound(floor_bound(now or datetime.now(timezone.utc), spec.interval), spec.interval, -spec.retention)
+    removed = []
+    for name, start in await list_partitions(conn, spec):
+        if shift_bound(start, spec.interval) > cutoff:
+            break
+        if spec.keep_where and await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE {spec.keep_where})"):
+            print(f"Partition {name} is past retention but still has rows to keep, skipping")
+            continue
+        async with conn.transaction():
+            await conn.execute(f"ALTER TABLE {spec.table} DETACH PARTITION {name}")
+            if not spec.detach_only:
+                await conn.execute(f"DROP TABLE {name}")
+        removed.append(name)
+
+    # Detached partitions are kept for archival, so expired default rows are kept too
+    if not spec.detach_only and await conn.fetchval("SELECT to_regclass($1)", spec.default_partition):
+        condition = f"{spec.column} < $1"
+        if spec.keep_where:
+            condition += f" AND NOT ({spec.keep_where})"
+        await conn.execute(f"DELETE FROM {spec.default_partition} WHERE {condition}", cutoff)
+
+    return removed
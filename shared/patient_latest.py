@@ -0,0 +1,56 @@
+"""
+patient_latest: one row per patient with the last measurement and the active alert.
+
+Status endpoints and dashboards read this table instead of sorting measurements /
+emergency_logs. Measurements are recorded by MeasurementService in the same statement
+that inserts them; alerts go through the helpers below.
+
+`conn` may be an asyncpg connection or shared.database.db (same execute signature).
+"""
+from typing import Iterable, Tuple
+
+_UPSERT_ALERTS = """
+    INSERT INTO patient_latest (patient_id, alert_id, alert_message, alert_created_at, updated_at)
+    SELECT DISTINCT ON (u.patient_id) u.patient_id, u.alert_id, u.message, u.created_at, NOW()
+    FROM unnest($1::uuid[], $2::bigint[], $3::text[], $4::timestamptz[])
+        AS u(patient_id, alert_id, message, created_at)
+    ORDER BY u.patient_id, u.alert_id DESC
+    ON CONFLICT (patient_id) DO UPDATE SET
+        alert_id = EXCLUDED.alert_id,
+        alert_message = EXCLUDED.alert_message,
+        alert_created_at = EXCLUDED.alert_created_at,
+        updated_at = NOW()
+    WHERE patient_latest.alert_id IS NULL OR patient_latest.alert_id < EXCLUDED.alert_id
+"""
+
+_REFRESH_ALERT = """
+    UPDATE patient_latest pl
+    SET (alert_id, alert_message, alert_created_at) = (
+            SELECT e.id, e.message, e.created_at
+            FROM emergency_logs e
+            WHERE e.patient_id = pl.patient_id AND e.is_resolved = FALSE
+            ORDER BY e.created_at DESC
+            LIMIT 1
+        ),
+        updated_at = NOW()
+    WHERE pl.patient_id = $1
+"""
+
+
+async def set_active_alerts(conn, alerts: Iterable[Tuple]):
+    """Records new alerts as (patient_id, alert_id, message, created_at)."""
+    alerts = list(alerts)
+    if not alerts:
+        return
+    await conn.execute(
+        _UPSERT_ALERTS,
+        [a[0] for a in alerts],
+        [a[1] for a in alerts],
+        [a[2] for a in alerts],
+        [a[3] for a in alerts]
+    )
+
+
+async def refresh_active_alert(conn, patient_id):
+    """Re-reads the newest unresolved alert of a patient (after an alert is resolved)."""
+    await conn.execute(_REFRESH_ALERT, patient_id)
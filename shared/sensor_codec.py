@@ -0,0 +1,135 @@
+"""
+Binary sensor frame codec (content type: application/x-cdtp-sensor).
+
+A compact alternative to the JSON payload of POST /api/v1/ingest. One frame holds one
+sensor window as packed little-endian arrays, so it can be stored as-is in
+sensor_data_queue.packed and read back without parsing (e.g. numpy.frombuffer).
+
+Layout (little-endian):
+
+    offset  size        field
+    0       4           magic b"CDTP"
+    4       1           version (1)
+    5       1           flags (reserved, 0)
+    6       2           n_acc   uint16  samples per accelerometer axis
+    8       2           n_gyro  uint16  samples per gyroscope axis
+    10      2           n_ppg   uint16  PPG samples
+    12      4           reserved (0)
+    16      8           timestamp float64 (unix epoch)
+    24      16          patient_id (UUID bytes)
+    40      4*n_acc*3   accelerometer x, y, z  float32
+    ...     4*n_gyro*3  gyroscope x, y, z      float32
+    ...     4*n_ppg     ppg_raw                int32
+
+PPG samples are int32 because MAX3010x readings do not fit into int16.
+"""
+import struct
+import uuid
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+SENSOR_FRAME_CONTENT_TYPE = "application/x-cdtp-sensor"
+
+MAGIC = b"CDTP"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBHHHI d16s")
+HEADER_SIZE = _HEADER.size  # 40
+
+AXES = ("x", "y", "z")
+
+
+class FrameHeader(NamedTuple):
+    version: int
+    n_acc: int
+    n_gyro: int
+    n_ppg: int
+    timestamp: float
+    patient_id: str
+    size: int  # Total frame size in bytes (header + arrays)
+
+    def sections(self) -> Dict[str, Tuple[int, int]]:
+        """Byte offset and item count of every array in the frame."""
+        result = {}
+        offset = HEADER_SIZE
+        for axis in AXES:
+            result[f"acc_{axis}"] = (offset, self.n_acc)
+            offset += 4 * self.n_acc
+        for axis in AXES:
+            result[f"gyro_{axis}"] = (offset, self.n_gyro)
+            offset += 4 * self.n_gyro
+        result["ppg"] = (offset, self.n_ppg)
+        return result
+
+
+def _frame_size(n_acc: int, n_gyro: int, n_ppg: int) -> int:
+    return HEADER_SIZE + 12 * n_acc + 12 * n_gyro + 4 * n_ppg
+
+
+def parse_header(buf, offset: int = 0, exact: bool = True) -> FrameHeader:
+    """
+    Validates and parses the frame header at `offset`.
+    With exact=True the buffer must contain exactly one frame.
+    Raises ValueError on malformed input.
+    """
+    if len(buf) - offset < HEADER_SIZE:
+        raise ValueError("Frame too short")
+    magic, version, _flags, n_acc, n_gyro, n_ppg, _reserved, timestamp, pid = _HEADER.unpack_from(buf, offset)
+    if magic != MAGIC:
+        raise ValueError("Invalid frame magic")
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame version: {version}")
+
+    size = _frame_size(n_acc, n_gyro, n_ppg)
+    available = len(buf) - offset
+    if available < size or (exact and available != size):
+        raise ValueError(f"Frame size mismatch: expected {size} bytes, got {available}")
+
+    return FrameHeader(version, n_acc, n_gyro, n_ppg, timestamp, str(uuid.UUID(bytes=bytes(pid))), size)
+
+
+def iter_frames(buf) -> Iterator[Tuple[int, FrameHeader]]:
+    """Yields (offset, header) for a buffer of concatenated frames."""
+    offset = 0
+    while offset < len(buf):
+        header = parse_header(buf, offset, exact=False)
+        yield offset, header
+        offset += header.size
+
+
+def encode_frame(patient_id: str, timestamp: float,
+                 accelerometer: Dict[str, List[float]],
+                 gyroscope: Dict[str, List[float]],
+                 ppg_raw: List[int]) -> bytes:
+    """Encodes one window (same shape as the JSON payload) into a binary frame."""
+    n_acc = min(len(accelerometer.get(axis, [])) for axis in AXES)
+    n_gyro = min(len(gyroscope.get(axis, [])) for axis in AXES)
+    n_ppg = len(ppg_raw)
+
+    parts = [_HEADER.pack(MAGIC, VERSION, 0, n_acc, n_gyro, n_ppg, 0, timestamp, uuid.UUID(str(patient_id)).bytes)]
+    for axis in AXES:
+        parts.append(struct.pack(f"<{n_acc}f", *accelerometer[axis][:n_acc]))
+    for axis in AXES:
+        parts.append(struct.pack(f"<{n_gyro}f", *gyroscope[axis][:n_gyro]))
+    parts.append(struct.pack(f"<{n_ppg}i", *ppg_raw))
+    return b"".join(parts)
+
+
+def decode_frame(buf, offset: int = 0) -> Dict:
+    """
+    Decodes a frame back into the JSON payload shape (lists).
+    Use header.sections() with numpy.frombuffer for a zero-copy view instead.
+    """
+    header = parse_header(buf, offset, exact=False)
+    sections = header.sections()
+
+    def floats(name):
+        start, count = sections[name]
+        return list(struct.unpack_from(f"<{count}f", buf, offset + start))
+
+    ppg_start, ppg_count = sections["ppg"]
+    return {
+        "patient_id": header.patient_id,
+        "timestamp": header.timestamp,
+        "accelerometer": {axis: floats(f"acc_{axis}") for axis in AXES},
+        "gyroscope": {axis: floats(f"gyro_{axis}") for axis in AXES},
+        "ppg_raw": list(struct.unpack_from(f"<{ppg_count}i", buf, offset + ppg_start)),
+    }
@@ -0,0 +1,50 @@
+"""
+Bulk writer for sensor_data_queue.
+
+Windows are written with a single COPY (asyncpg copy_records_to_table) instead of one
+INSERT per window. Records carry either the JSON columns or a binary frame in `packed`.
+"""
+import json
+import uuid
+from typing import Dict, List, Tuple
+
+import asyncpg
+
+from shared.sensor_codec import FrameHeader
+
+QUEUE_COLUMNS = ("patient_id", "accelerometer", "gyroscope", "ppg_raw", "packed", "timestamp")
+
+
+def json_record(patient_id: str, timestamp: float,
+                accelerometer: Dict[str, List[float]],
+                gyroscope: Dict[str, List[float]],
+                ppg_raw: List[int]) -> Tuple:
+    """Builds a COPY record for a JSON window. Raises ValueError for a malformed patient_id."""
+    return (
+        uuid.UUID(str(patient_id)),
+        json.dumps(accelerometer),
+        json.dumps(gyroscope),
+        ppg_raw,
+        None,
+        timestamp
+    )
+
+
+def frame_record(frame: bytes, header: FrameHeader) -> Tuple:
+    """Builds a COPY record for a binary frame (stored as-is)."""
+    return (uuid.UUID(header.patient_id), None, None, None, frame, header.timestamp)
+
+
+async def unknown_patients(conn: asyncpg.Connection, records: List[Tuple]) -> set:
+    """Returns the patient ids in `records` that have no patients row (COPY would fail on the FK)."""
+    patient_ids = list({record[0] for record in records})
+    rows = await conn.fetch("SELECT id FROM patients WHERE id = ANY($1::uuid[])", patient_ids)
+    return set(patient_ids) - {row['id'] for row in rows}
+
+
+async def enqueue_windows(conn: asyncpg.Connection, records: List[Tuple]) -> int:
+    """COPYs records (in QUEUE_COLUMNS order) into sensor_data_queue. Returns the row count."""
+    if not records:
+        return 0
+    await conn.copy_records_to_table("sensor_data_queue", records=records, columns=QUEUE_COLUMNS)
+    return len(records)
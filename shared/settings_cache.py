@@ -0,0 +1,83 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+SETTINGS_CHANNEL = "settings_updates"
+
+# Sentinel returned on a cache miss (None is a valid cached value: "patient has no settings row")
+MISSING = object()
+
+
+class SettingsCache:
+    """
+    In-process cache for patient_settings rows.
+
+    Entries expire after a TTL and the cache is bounded (least recently used entries are
+    evicted first). Writers fire NOTIFY settings_updates with the patient_id as payload;
+    every service listening on that channel drops the entry so the next read hits the database.
+
+    A NOTIFY is only delivered after the writer commits, so a read that started before the
+    commit can return the old row after the invalidation has already run. Readers therefore
+    take generation() before querying and pass it to set(); any invalidation in between
+    bumps the generation and the stale result is not cached.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_size: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+        self.max_size = max_size if max_size is not None else int(os.getenv("SETTINGS_CACHE_MAX_SIZE", "10000"))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generation = 0
+
+    def get(self, patient_id) -> Any:
+        """Returns the cached settings dict (or None), or MISSING if absent/expired."""
+        key = str(patient_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, settings = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return settings
+
+    def generation(self) -> int:
+        """Token to take before a database read whose result will be passed to set()."""
+        return self._generation
+
+    def set(self, patient_id, settings: Optional[Dict[str, Any]], generation: Optional[int] = None):
+        """Caches settings, unless an invalidation happened since `generation` was taken."""
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        if generation is not None and generation != self._generation:
+            return
+        key = str(patient_id)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, settings)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, patient_id=None):
+        """Drops one patient's entry, or every entry when patient_id is None."""
+        # Global, not per patient: in-flight reads are short, an extra miss is cheap
+        self._generation += 1
+        if patient_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(patient_id), None)
+
+    def on_notification(self, conn, pid, channel, payload):
+        """asyncpg listener callback for the settings_updates channel."""
+        self.invalidate(payload or None)
+
+    async def listen(self, conn):
+        """
+        Subscribes the given (dedicated) connection to settings_updates.
+        Notifications sent while we were not listening are lost, so start from an empty cache.
+        """
+        self.invalidate()
+        await conn.add_listener(SETTINGS_CHANNEL, self.on_notification)
+
+
+settings_cache = SettingsCache()
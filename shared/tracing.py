@@ -0,0 +1,254 @@
+"""
+Lightweight in-process tracing for the measurement pipeline (no collector needed).
+
+A trace covers one unit of work (a processor batch, a single measurement, a fan-out
+notification) and is split into spans, one per step:
+
+    with tracer.trace("processor_batch", rows=len(rows)):
+        with stage("dequeue") as attrs:
+            rows = ...
+            attrs["rows"] = len(rows)
+
+The current trace is kept in a context variable, so code deeper in the call stack
+(e.g. MeasurementService) adds spans without passing anything around; outside a
+trace span() and stage() only time their block. stage() additionally records the
+step in the pipeline_stage_seconds histogram (shared/metrics.py).
+
+Finished traces are kept in two in-memory ring buffers:
+- slow: every trace slower than TRACE_SLOW_MS (or that raised), with all spans and
+  their attributes. Also appended as JSON lines to TRACE_FILE when set, by a writer
+  thread fed through a bounded queue (traces are dropped rather than blocking the loop).
+- recent: a TRACE_SAMPLE_RATE sample of all traces, summarized per step.
+
+Both are returned by tracer.dump() (core: GET /debug/traces, processor: the same path
+on its metrics port). Extra sinks can be plugged in with tracer.add_sink().
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from shared.metrics import PIPELINE_STAGE_SECONDS, counter
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+TRACE_BUFFER_SIZE = max(1, int(os.getenv("TRACE_BUFFER_SIZE", "200")))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "250"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Slow traces waiting for the TRACE_FILE writer thread; more are dropped, never waited on
+TRACE_FILE_QUEUE_SIZE = max(1, int(os.getenv("TRACE_FILE_QUEUE_SIZE", "1000")))
+
+TRACE_FILE_DROPPED = counter(
+    "trace_file_dropped_total", "Slow traces not written to TRACE_FILE because the writer fell behind"
+)
+
+
+class Span:
+    __slots__ = ("name", "offset", "duration", "attrs")
+
+    def __init__(self, name: str, offset: float, attrs: Dict):
+        self.name = name
+        self.offset = offset
+        self.duration = 0.0
+        self.attrs = attrs
+
+
+class Trace:
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc)
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.discarded = False
+        self.spans: List[Span] = []
+        self._t0 = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def stages(self) -> Dict[str, float]:
+        """Total milliseconds per span name."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration * 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def to_dict(self, full: bool = True) -> Dict:
+        result = {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attrs": self.attrs,
+            "stages": self.stages(),
+        }
+        if self.error:
+            result["error"] = self.error
+        if full:
+            result["spans"] = [
+                {
+                    "name": span.name,
+                    "offset_ms": round(span.offset * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    **span.attrs,
+                }
+                for span in sorted(self.spans, key=lambda s: s.offset)
+            ]
+        return result
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def discard():
+    """Drops the current trace when it finishes (e.g. a poll that found no work)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.discarded = True
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACE_ENABLED, buffer_size: int = TRACE_BUFFER_SIZE,
+                 slow_ms: float = TRACE_SLOW_MS, sample_rate: float = TRACE_SAMPLE_RATE,
+                 path: str = TRACE_FILE):
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.slow = deque(maxlen=buffer_size)
+        self.recent = deque(maxlen=buffer_size)
+        self._sinks: List[Callable[[Trace, bool], None]] = []
+        if path:
+            self.add_sink(self._file_sink(path))
+
+    def add_sink(self, sink: Callable[[Trace, bool], None]):
+        """sink(trace, is_slow) is called for every kept trace."""
+        self._sinks.append(sink)
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """
+        Starts a trace and yields its attribute dict. Inside an existing trace this is
+        just a nested span, so callers do not need to know whether they are the root.
+        """
+        if not self.enabled or _current.get() is not None:
+            with span(name, **attrs) as span_attrs:
+                yield span_attrs
+            return
+
+        trace = Trace(name, attrs)
+        token = _current.set(trace)
+        try:
+            yield trace.attrs
+        except BaseException as e:
+            trace.error = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            trace.duration = trace.elapsed()
+            self._finish(trace)
+
+    def _finish(self, trace: Trace):
+        if trace.discarded:
+            return
+        is_slow = trace.duration >= self.slow_seconds or trace.error is not None
+        if is_slow:
+            self.slow.append(trace)
+        elif random.random() < self.sample_rate:
+            self.recent.append(trace)
+        else:
+            return
+        for sink in self._sinks:
+            try:
+                sink(trace, is_slow)
+            except Exception as e:
+                print(f"Trace sink error: {e}")
+
+    @staticmethod
+    def _file_sink(path: str) -> Callable[[Trace, bool], None]:
+        """
+        Appends slow traces to `path` from a background thread: the event loop only does a
+        non-blocking put, and drops the trace if the writer is behind (disk slow or full).
+        """
+        pending: "queue.Queue[Trace]" = queue.Queue(maxsize=TRACE_FILE_QUEUE_SIZE)
+
+        def writer():
+            with open(path, "a", buffering=1) as f:
+                while True:
+                    trace = pending.get()
+                    try:
+                        f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+                    except Exception as e:
+                        print(f"Trace file write error: {e}")
+
+        threading.Thread(target=writer, name="trace-file-writer", daemon=True).start()
+
+        def write(trace: Trace, is_slow: bool):
+            if is_slow:
+                try:
+                    pending.put_nowait(trace)
+                except queue.Full:
+                    TRACE_FILE_DROPPED.inc()
+        return write
+
+    def dump_json(self, limit: int = 50) -> str:
+        return json.dumps(self.dump(limit), default=str)
+
+    def dump(self, limit: int = 50) -> Dict:
+        """Newest first: slow traces in full, sampled traces summarized."""
+        return {
+            "slow_threshold_ms": self.slow_seconds * 1000,
+            "sample_rate": self.sample_rate,
+            "slow": [trace.to_dict(full=True) for trace in list(self.slow)[::-1][:limit]],
+            "recent": [trace.to_dict(full=False) for trace in list(self.recent)[::-1][:limit]],
+        }
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a step of the current trace; yields its attribute dict (e.g. to add rows)."""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    record = Span(name, trace.elapsed(), attrs)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record.duration = time.perf_counter() - started
+        trace.spans.append(record)
+
+
+def record_stage(name: str, seconds: float, **attrs):
+    """Records a step that was timed by hand (e.g. a commit on leaving `async with`)."""
+    PIPELINE_STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current.get()
+    if trace is not None:
+        record = Span(name, max(0.0, trace.elapsed() - seconds), attrs)
+        record.duration = seconds
+        trace.spans.append(record)
+
+
+@contextmanager
+def stage(name: str, **attrs):
+    """span() that is also recorded in pipeline_stage_seconds{stage=name}."""
+    started = time.perf_counter()
+    try:
+        with span(name, **attrs) as span_attrs:
+            yield span_attrs
+    finally:
+        PIPELINE_STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+tracer = Tracer()
@@ -0,0 +1,65 @@
+-- sensor_data_queue'yu created_at'e göre günlük partition'lı tabloya dönüştürür.
+-- Yeni kurulumlar için gerekmez (sql/schema.sql zaten partition'lı oluşturur).
+--
+-- Yalnızca işlenmemiş satırlar taşınır; işlenmiş kuyruk verisi eski tabloyla birlikte silinir.
+-- Çalıştırmadan önce ingestion'ı durdurun (tablo kilitlenir):
+--   psql "$DATABASE_URL" -f sql/migrations/010_partition_sensor_data_queue.sql
+
+BEGIN;
+
+ALTER TABLE sensor_data_queue RENAME TO sensor_data_queue_legacy;
+ALTER TABLE sensor_data_queue_legacy RENAME CONSTRAINT sensor_data_queue_pkey TO sensor_data_queue_legacy_pkey;
+ALTER INDEX IF EXISTS idx_queue_unprocessed RENAME TO idx_queue_unprocessed_legacy;
+DROP TRIGGER IF EXISTS trg_notify_sensor_queue ON sensor_data_queue_legacy;
+
+CREATE TABLE sensor_data_queue (
+    id              BIGINT NOT NULL DEFAULT nextval('sensor_data_queue_id_seq'),
+    patient_id      UUID NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+    accelerometer   JSONB,
+    gyroscope       JSONB,
+    ppg_raw         INTEGER[],
+    packed          BYTEA,
+    timestamp       DOUBLE PRECISION NOT NULL,
+    processed       BOOLEAN DEFAULT FALSE,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT chk_queue_payload CHECK (
+        packed IS NOT NULL
+        OR (accelerometer IS NOT NULL AND gyroscope IS NOT NULL AND ppg_raw IS NOT NULL)
+    )
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE sensor_data_queue_default PARTITION OF sensor_data_queue DEFAULT;
+
+-- Bugün ve sonraki 3 gün (sonrasını processor oluşturur, bkz. services/processor/retention.py)
+DO $$
+DECLARE
+    day DATE;
+BEGIN
+    FOR day IN SELECT generate_series((NOW() AT TIME ZONE 'UTC')::date, (NOW() AT TIME ZONE 'UTC')::date + 3, '1 day')::date LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF sensor_data_queue FOR VALUES FROM (%L) TO (%L)',
+            'sensor_data_queue_p' || to_char(day, 'YYYYMMDD'),
+            day::timestamp AT TIME ZONE 'UTC',
+            (day + 1)::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+
+CREATE INDEX idx_queue_unprocessed ON sensor_data_queue (processed, created_at) WHERE processed = FALSE;
+
+-- Bekleyen iş kaybolmasın
+INSERT INTO sensor_data_queue (id, patient_id, accelerometer, gyroscope, ppg_raw, packed, timestamp, processed, created_at)
+SELECT id, patient_id, accelerometer, gyroscope, ppg_raw, packed, timestamp, processed, created_at
+FROM sensor_data_queue_legacy
+WHERE processed = FALSE;
+
+ALTER SEQUENCE sensor_data_queue_id_seq OWNED BY sensor_data_queue.id;
+
+CREATE TRIGGER trg_notify_sensor_queue
+AFTER INSERT ON sensor_data_queue
+FOR EACH STATEMENT EXECUTE FUNCTION notify_sensor_queue();
+
+DROP TABLE sensor_data_queue_legacy;
+
+COMMIT;
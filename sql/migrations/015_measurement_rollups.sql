@@ -0,0 +1,43 @@
+-- measurement_rollups tablosunu oluşturur ve mevcut ölçümlerden doldurur.
+-- Yeni kurulumlar için gerekmez (sql/schema.sql tabloyu oluşturur, veri yoktur).
+--   psql "$DATABASE_URL" -f sql/migrations/015_measurement_rollups.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS measurement_rollups (
+    patient_id      UUID NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+    bucket_seconds  INT NOT NULL,
+    bucket_start    TIMESTAMPTZ NOT NULL,
+    sample_count    INT NOT NULL,
+    hr_min          INT NOT NULL,
+    hr_max          INT NOT NULL,
+    hr_sum          BIGINT NOT NULL,
+    worst_status    measurement_status NOT NULL,
+    max_inactivity  INT NOT NULL,
+    PRIMARY KEY (patient_id, bucket_seconds, bucket_start)
+);
+
+-- Backfill sırasında gelen yeni ölçümler çift sayılmasın
+LOCK TABLE measurements IN SHARE MODE;
+TRUNCATE measurement_rollups;
+
+INSERT INTO measurement_rollups (
+    patient_id, bucket_seconds, bucket_start, sample_count,
+    hr_min, hr_max, hr_sum, worst_status, max_inactivity
+)
+SELECT
+    m.patient_id,
+    b.seconds,
+    to_timestamp(floor(extract(epoch FROM m.measured_at) / b.seconds) * b.seconds) AS bucket_start,
+    count(*),
+    min(m.heart_rate),
+    max(m.heart_rate),
+    sum(m.heart_rate),
+    max(m.status),
+    max(m.inactivity_seconds)
+FROM measurements m
+CROSS JOIN (VALUES (60), (300), (3600)) AS b(seconds)
+WHERE m.patient_id IS NOT NULL
+GROUP BY m.patient_id, b.seconds, bucket_start;
+
+COMMIT;
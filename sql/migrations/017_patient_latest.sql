@@ -0,0 +1,60 @@
+-- patient_latest tablosunu oluşturur, mevcut ölçüm/alert'lerden doldurur ve
+-- v_live_heart_rates view'ını bu tabloya taşır.
+--   psql "$DATABASE_URL" -f sql/migrations/017_patient_latest.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS patient_latest (
+    patient_id          UUID PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
+    measurement_id      BIGINT,
+    heart_rate          INT,
+    inactivity_seconds  INT,
+    status              measurement_status,
+    measured_at         TIMESTAMPTZ,
+    alert_id            BIGINT,
+    alert_message       TEXT,
+    alert_created_at    TIMESTAMPTZ,
+    updated_at          TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_patient_latest_measured ON patient_latest (measured_at DESC);
+
+-- Backfill sırasında yazılan yeni ölçümler kaçmasın
+LOCK TABLE measurements, emergency_logs IN SHARE MODE;
+
+INSERT INTO patient_latest (patient_id, measurement_id, heart_rate, inactivity_seconds, status, measured_at)
+SELECT DISTINCT ON (patient_id) patient_id, id, heart_rate, inactivity_seconds, status, measured_at
+FROM measurements
+WHERE patient_id IS NOT NULL
+ORDER BY patient_id, measured_at DESC, id DESC
+ON CONFLICT (patient_id) DO UPDATE SET
+    measurement_id = EXCLUDED.measurement_id,
+    heart_rate = EXCLUDED.heart_rate,
+    inactivity_seconds = EXCLUDED.inactivity_seconds,
+    status = EXCLUDED.status,
+    measured_at = EXCLUDED.measured_at,
+    updated_at = NOW();
+
+INSERT INTO patient_latest (patient_id, alert_id, alert_message, alert_created_at)
+SELECT DISTINCT ON (patient_id) patient_id, id, message, created_at
+FROM emergency_logs
+WHERE patient_id IS NOT NULL AND is_resolved = FALSE
+ORDER BY patient_id, created_at DESC, id DESC
+ON CONFLICT (patient_id) DO UPDATE SET
+    alert_id = EXCLUDED.alert_id,
+    alert_message = EXCLUDED.alert_message,
+    alert_created_at = EXCLUDED.alert_created_at,
+    updated_at = NOW();
+
+CREATE OR REPLACE VIEW v_live_heart_rates AS
+SELECT 
+    pl.measurement_id AS id,
+    p.name AS patient_name,
+    pl.heart_rate,
+    pl.status,
+    pl.measured_at
+FROM patient_latest pl
+JOIN patients p ON pl.patient_id = p.id
+WHERE pl.measurement_id IS NOT NULL
+ORDER BY pl.measured_at DESC;
+
+COMMIT;
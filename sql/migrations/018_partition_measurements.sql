@@ -0,0 +1,55 @@
+-- measurements'ı measured_at'e göre aylık partition'lı tabloya dönüştürür.
+-- Yeni kurulumlar için gerekmez (sql/schema.sql zaten partition'lı oluşturur).
+--
+-- Veri kopyalanmaz: mevcut tablo measurements_legacy adıyla, bu ayın sonuna kadarki
+-- aralığı kapsayan tek bir partition olarak bağlanır. Sonraki aylar measurements_pYYYYMM
+-- partition'larına yazılır (processor önceden oluşturur, bkz. services/processor/retention.py).
+-- Bağlama sırasında tablo bir kez taranır ve (id, measured_at) primary key index'i oluşturulur;
+-- bu sürede ölçüm yazımı bekler. Processor'ı durdurup çalıştırın:
+--   psql "$DATABASE_URL" -f sql/migrations/018_partition_measurements.sql
+--
+-- measurements_legacy otomatik saklama kapsamında değildir; gerektiğinde elle ayrılabilir:
+--   ALTER TABLE measurements DETACH PARTITION measurements_legacy;
+
+BEGIN;
+
+ALTER TABLE measurements RENAME TO measurements_legacy;
+ALTER TABLE measurements_legacy RENAME CONSTRAINT measurements_pkey TO measurements_legacy_pkey;
+ALTER INDEX idx_measurements_patient_time RENAME TO idx_measurements_legacy_patient_time;
+
+CREATE TABLE measurements (
+    id                  BIGINT NOT NULL DEFAULT nextval('measurements_id_seq'),
+    patient_id          UUID REFERENCES patients(id) ON DELETE CASCADE,
+    heart_rate          INT NOT NULL CHECK (heart_rate BETWEEN 20 AND 300),
+    inactivity_seconds  INT NOT NULL CHECK (inactivity_seconds >= 0),
+    status              measurement_status NOT NULL,
+    measured_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, measured_at)
+) PARTITION BY RANGE (measured_at);
+CREATE INDEX idx_measurements_patient_time ON measurements (patient_id, measured_at DESC);
+
+ALTER SEQUENCE measurements_id_seq OWNED BY measurements.id;
+
+-- Eski tablo: en eski kayıttan bu ayın sonuna kadar; sonraki 2 ay için boş partition'lar
+DO $$
+DECLARE
+    month_start DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::date;
+    i INT;
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE measurements ATTACH PARTITION measurements_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+    );
+    FOR i IN 1..2 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF measurements FOR VALUES FROM (%L) TO (%L)',
+            'measurements_p' || to_char(month_start + make_interval(months => i), 'YYYYMM'),
+            (month_start + make_interval(months => i))::timestamp AT TIME ZONE 'UTC',
+            (month_start + make_interval(months => i + 1))::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+
+CREATE TABLE measurements_default PARTITION OF measurements DEFAULT;
+
+COMMIT;
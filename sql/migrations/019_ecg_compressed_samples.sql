@@ -0,0 +1,15 @@
+-- ecg_segments'e sıkıştırılmış örnek kolonu ekler (bkz. shared/ecg_codec.py).
+-- Yeni kurulumlar için gerekmez (sql/schema.sql zaten içerir).
+--
+-- Mevcut SMALLINT[] kayıtlar yerinde kalır ve GET /api/patients/{id}/ecg tarafından
+-- okunmaya devam eder; yeni segmentler yalnızca samples_compressed'e yazılır.
+--   psql "$DATABASE_URL" -f sql/migrations/019_ecg_compressed_samples.sql
+
+BEGIN;
+
+ALTER TABLE ecg_segments ADD COLUMN IF NOT EXISTS samples_compressed BYTEA;
+ALTER TABLE ecg_segments ALTER COLUMN samples DROP NOT NULL;
+ALTER TABLE ecg_segments ADD CONSTRAINT ecg_segments_samples_present
+    CHECK (samples IS NOT NULL OR samples_compressed IS NOT NULL) NOT VALID;
+
+COMMIT;
@@ -77,16 +77,44 @@ AFTER INSERT ON patients
 FOR EACH ROW EXECUTE FUNCTION create_default_settings();
 
 -- 7. Measurements (Ölçümler)
+-- measured_at'e göre aylık partition'lanır (measurements_pYYYYMM). Partition'lar processor
+-- tarafından önceden oluşturulur (services/processor/retention.py); zaman aralıklı sorgular
+-- yalnızca ilgili ayları tarar. Mevcut kurulumlar: sql/migrations/018_partition_measurements.sql
 CREATE TABLE IF NOT EXISTS measurements (
-    id                  BIGSERIAL PRIMARY KEY,
+    id                  BIGSERIAL,
     patient_id          UUID REFERENCES patients(id) ON DELETE CASCADE,
     heart_rate          INT NOT NULL CHECK (heart_rate BETWEEN 20 AND 300),
     inactivity_seconds  INT NOT NULL CHECK (inactivity_seconds >= 0),
     status              measurement_status NOT NULL,
-    measured_at         TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    measured_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, measured_at)
+) PARTITION BY RANGE (measured_at);
 CREATE INDEX IF NOT EXISTS idx_measurements_patient_time ON measurements (patient_id, measured_at DESC);
 
+-- Henüz partition'ı oluşturulmamış bir aya düşen ölçümler için
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = 'measurements'::regclass AND relkind = 'p') THEN
+        CREATE TABLE IF NOT EXISTS measurements_default PARTITION OF measurements DEFAULT;
+    END IF;
+END $$;
+
+-- 7b. Measurement Rollups (Grafikler için önceden hesaplanmış zaman bucket'ları)
+-- MeasurementService her kayıtta 60/300/3600 saniyelik bucket'ları artımlı günceller.
+-- Ortalama nabız = hr_sum / sample_count. Mevcut veriler için: sql/migrations/015_measurement_rollups.sql
+CREATE TABLE IF NOT EXISTS measurement_rollups (
+    patient_id      UUID NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
+    bucket_seconds  INT NOT NULL,
+    bucket_start    TIMESTAMPTZ NOT NULL,
+    sample_count    INT NOT NULL,
+    hr_min          INT NOT NULL,
+    hr_max          INT NOT NULL,
+    hr_sum          BIGINT NOT NULL,
+    worst_status    measurement_status NOT NULL,
+    max_inactivity  INT NOT NULL,
+    PRIMARY KEY (patient_id, bucket_seconds, bucket_start)
+);
+
 -- 8. Emergency Logs (Acil Durum)
 CREATE TABLE IF NOT EXISTS emergency_logs (
     id              BIGSERIAL PRIMARY KEY,
@@ -97,31 +125,72 @@ CREATE TABLE IF NOT EXISTS emergency_logs (
 );
 CREATE INDEX IF NOT EXISTS idx_emergency_patient_time ON emergency_logs (patient_id, created_at DESC);
 
--- 9. ECG Segments (EKG - Array Yapısı)
+-- 9. ECG Segments (EKG - Sıkıştırılmış)
+-- Yeni segmentler samples_compressed'e (delta + varint, bkz. shared/ecg_codec.py) yazılır;
+-- samples yalnızca eski kayıtlarda doludur. Mevcut kurulumlar: sql/migrations/019_ecg_compressed_samples.sql
 CREATE TABLE IF NOT EXISTS ecg_segments (
-    id              BIGSERIAL PRIMARY KEY,
-    patient_id      UUID REFERENCES patients(id) ON DELETE CASCADE,
-    sample_rate     INT NOT NULL DEFAULT 250,
-    started_at      TIMESTAMPTZ NOT NULL,
-    duration_ms     INT NOT NULL,
-    samples         SMALLINT[] NOT NULL, -- Binary Array (Optimize edildi)
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    id                  BIGSERIAL PRIMARY KEY,
+    patient_id          UUID REFERENCES patients(id) ON DELETE CASCADE,
+    sample_rate         INT NOT NULL DEFAULT 250,
+    started_at          TIMESTAMPTZ NOT NULL,
+    duration_ms         INT NOT NULL,
+    samples             SMALLINT[],
+    samples_compressed  BYTEA,
+    created_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT ecg_segments_samples_present CHECK (samples IS NOT NULL OR samples_compressed IS NOT NULL)
 );
 CREATE INDEX IF NOT EXISTS idx_ecg_patient_time ON ecg_segments (patient_id, started_at DESC);
 
 -- 10. Sensor Data Queue (Redis yerine PostgreSQL Queue)
+-- Pencere ya JSON kolonlarında ya da binary frame olarak packed kolonunda tutulur
+-- created_at'e göre günlük partition'lanır (sensor_data_queue_pYYYYMMDD). Partition'lar
+-- processor tarafından önceden oluşturulur ve saklama süresi dolunca düşürülür
+-- (services/processor/retention.py). Mevcut kurulumlar: sql/migrations/010_partition_sensor_data_queue.sql
 CREATE TABLE IF NOT EXISTS sensor_data_queue (
-    id              BIGSERIAL PRIMARY KEY,
+    id              BIGSERIAL,
     patient_id      UUID NOT NULL REFERENCES patients(id) ON DELETE CASCADE,
-    accelerometer   JSONB NOT NULL,
-    gyroscope       JSONB NOT NULL,
-    ppg_raw         INTEGER[] NOT NULL,
+    accelerometer   JSONB,
+    gyroscope       JSONB,
+    ppg_raw         INTEGER[],
+    packed          BYTEA, -- application/x-cdtp-sensor frame (shared/sensor_codec.py)
     timestamp       DOUBLE PRECISION NOT NULL,
     processed       BOOLEAN DEFAULT FALSE,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT chk_queue_payload CHECK (
+        packed IS NOT NULL
+        OR (accelerometer IS NOT NULL AND gyroscope IS NOT NULL AND ppg_raw IS NOT NULL)
+    )
+) PARTITION BY RANGE (created_at);
+
+-- Henüz partition'ı oluşturulmamış bir güne düşen satırlar için (INSERT asla hata vermez)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = 'sensor_data_queue'::regclass AND relkind = 'p') THEN
+        CREATE TABLE IF NOT EXISTS sensor_data_queue_default PARTITION OF sensor_data_queue DEFAULT;
+    END IF;
+END $$;
+-- Mevcut kurulumlar için (binary frame desteği)
+ALTER TABLE sensor_data_queue ADD COLUMN IF NOT EXISTS packed BYTEA;
+ALTER TABLE sensor_data_queue ALTER COLUMN accelerometer DROP NOT NULL;
+ALTER TABLE sensor_data_queue ALTER COLUMN gyroscope DROP NOT NULL;
+ALTER TABLE sensor_data_queue ALTER COLUMN ppg_raw DROP NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_queue_unprocessed ON sensor_data_queue (processed, created_at) WHERE processed = FALSE;
 
+-- Yeni veri eklendiğinde processor'ı uyandır (INSERT ve COPY; statement başına tek bildirim)
+CREATE OR REPLACE FUNCTION notify_sensor_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('sensor_queue', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_sensor_queue ON sensor_data_queue;
+CREATE TRIGGER trg_notify_sensor_queue
+AFTER INSERT ON sensor_data_queue
+FOR EACH STATEMENT EXECUTE FUNCTION notify_sensor_queue();
+
 -- 11. Patient States (Real-time Durum Takibi)
 CREATE TABLE IF NOT EXISTS patient_states (
     patient_id      UUID PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
@@ -129,6 +198,24 @@ CREATE TABLE IF NOT EXISTS patient_states (
     updated_at      TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 11b. Patient Latest (Hasta başına son ölçüm + aktif alert)
+-- MeasurementService her kayıtta, alert'ler oluşturulurken/çözülürken günceller.
+-- Durum endpoint'leri ve dashboard'lar measurements'ı sıralamak yerine buradan okur.
+-- Mevcut veriler için: sql/migrations/017_patient_latest.sql
+CREATE TABLE IF NOT EXISTS patient_latest (
+    patient_id          UUID PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,
+    measurement_id      BIGINT,
+    heart_rate          INT,
+    inactivity_seconds  INT,
+    status              measurement_status,
+    measured_at         TIMESTAMPTZ,
+    alert_id            BIGINT,
+    alert_message       TEXT,
+    alert_created_at    TIMESTAMPTZ,
+    updated_at          TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_patient_latest_measured ON patient_latest (measured_at DESC);
+
 -- 12. Seed Data (Demo için)
 DO $$
 DECLARE
@@ -169,13 +256,15 @@ BEGIN
 END $$;
 
 -- 13. Reporting Views
+-- Hasta başına son ölçüm (patient_latest üzerinden, measurements taranmaz)
 CREATE OR REPLACE VIEW v_live_heart_rates AS
 SELECT 
-    m.id,
+    pl.measurement_id AS id,
     p.name AS patient_name,
-    m.heart_rate,
-    m.status,
-    m.measured_at
-FROM measurements m
-JOIN patients p ON m.patient_id = p.id
-ORDER BY m.measured_at DESC;
\ No newline at end of file
+    pl.heart_rate,
+    pl.status,
+    pl.measured_at
+FROM patient_latest pl
+JOIN patients p ON pl.patient_id = p.id
+WHERE pl.measurement_id IS NOT NULL
+ORDER BY pl.measured_at DESC;
\ No newline at end of file